@@ -1,105 +1,429 @@
 import os
 import json
+import time
 import logging
-from typing import List, Dict, Any
-from dotenv import load_dotenv
-from openai import OpenAI
-
-load_dotenv()
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Iterator, Optional, Tuple
+from json_stream import IncrementalJSONParser
+from response_cache import cache_key, get_cached, put_cached
+from compactor import compact_articles, shard_articles, restore_links, estimate_tokens, MAX_DESCRIPTION_CHARS, TOKEN_BUDGET
+import metrics
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Initialize OpenAI client pointed to DeepSeek API
-api_key = os.getenv("DEEPSEEK_API_KEY")
-if not api_key or api_key == "your_deepseek_api_key_here":
-    logging.warning("DEEPSEEK_API_KEY is not set or is using the default placeholder.")
+MODEL_NAME = "deepseek-chat"
+TEMPERATURE = 0.3
 
-client = OpenAI(
-    api_key=api_key if api_key else "dummy_key_for_testing",
-    base_url="https://api.deepseek.com/v1"
-)
+# Sharded (map-reduce) analysis for large article volumes
+SHARD_TOKENS = 4000             # Token bound for the article payload of one map request
+MAX_CONCURRENT_REQUESTS = 4     # Map requests in flight at the same time
+SHORTLIST_PER_SHARD = 10        # Candidates each map request may nominate
+MAX_RETRIES = 3                 # Extra attempts for a failed request
+RETRY_BACKOFF = 2.0             # Seconds before the first retry, doubled after each failure
+DEEPSEEK_BASE_URL = "https://api.deepseek.com/v1"
+# Keep-alive connections held by the shared client; enough for the concurrent map and lesson requests
+CLIENT_POOL_SIZE = 8
 
-MODEL_NAME = "deepseek-chat"
+_client = None
+_client_lock = threading.Lock()
 
-def analyze_news(articles: List[Dict[str, str]]) -> Dict[str, Any]:
-    """
-    Uses DeepSeek to:
-    1. Select the top 10 most impactful cyber attacks from the article list.
-    2. Generate a teaching lesson for the top 2 attacks.
-    """
-    if not articles:
-        return {"top_10_attacks": [], "lessons": []}
-        
-    logging.info(f"Sending {len(articles)} articles to DeepSeek for analysis...")
-    
-    # Prepare the prompt
-    articles_json = json.dumps(articles, indent=2)
-    
-    system_prompt = """
+LLM_SECONDS = metrics.histogram("llm_request_seconds", "DeepSeek request time, until the last streamed token")
+LLM_FIRST_ITEM_SECONDS = metrics.histogram("llm_first_item_seconds", "Time until a streamed answer yields its first complete item")
+LLM_REQUESTS = metrics.counter("llm_requests", "DeepSeek requests by mode (chat, stream) and outcome (ok, error)")
+LLM_CACHE = metrics.counter("llm_cache_lookups", "Response cache lookups by result (hit, miss)")
+LLM_PROMPT_TOKENS = metrics.counter("llm_prompt_tokens_estimated", "Estimated prompt tokens sent to DeepSeek")
+LLM_USAGE_TOKENS = metrics.counter("llm_usage_tokens", "Tokens DeepSeek reported as used, by kind (prompt, completion)")
+LLM_PARSE_FAILURES = metrics.counter("llm_parse_failures", "Answers that were not valid (or not complete) JSON")
+
+SYSTEM_PROMPT = """
 You are an expert cybersecurity professor and analyst.
-You will be provided with a daily feed of cybersecurity news articles in JSON format.
+You will be provided with a daily feed of cybersecurity news articles, one compact JSON object per line.
+Each article has the keys "id" (article id), "t" (title), "s" (comma-separated sources) and "d" (description).
 Your task is to analyze these articles and output a strictly formatted JSON response.
 
 Instructions:
-1. Review all the provided articles.
-2. Select the "Top 10" most impactful, severe, or notable cyber attacks/threats from the list.
-3. For the top 2 out of those 10, generate a brief teaching lesson suitable for university students.
+1. Review all the provided articles. Stories covered by several outlets are sent once and list every outlet in "s"; wide coverage is a signal of impact.
+2. Select the "Top 10" most impactful, severe, or notable cyber attacks/threats from the list, most impactful first.
 
 The output MUST be valid JSON matching this exact structure:
 {
   "top_10_attacks": [
     {
       "rank": 1,
+      "id": "a1",
       "title": "Title of the attack/article",
       "source": "Source Name",
-      "link": "https://...",
       "summary": "1-2 sentence summary of why this is impactful"
     },
     ...
-  ],
-  "lessons": [
-    {
-      "rank": 1,
-      "title": "Title of the attack",
-      "learning_objectives": ["Objective 1", "Objective 2"],
-      "real_world_impact": "Explanation of the impact.",
-      "mitigation_strategies": ["Strategy 1", "Strategy 2"],
-      "discussion_questions": ["Question 1", "Question 2"]
-    },
-    {
-      "rank": 2,
-      ...
-    }
   ]
 }
 Return ONLY the raw JSON format, without markdown blocks, preambles, or postscripts.
 """
-    
+
+MAP_PROMPT = """
+You are an expert cybersecurity analyst.
+You will be provided with one batch of a larger daily feed of cybersecurity news articles, one compact JSON object per line.
+Each article has the keys "id" (article id), "t" (title), "s" (comma-separated sources) and "d" (description).
+
+Nominate at most {limit} articles from this batch that are the most impactful, severe, or notable cyber attacks/threats,
+and score each from 1 (minor) to 10 (critical).
+
+The output MUST be valid JSON matching this exact structure:
+{{
+  "candidates": [
+    {{"id": "a1", "score": 9}},
+    ...
+  ]
+}}
+Return ONLY the raw JSON format, without markdown blocks, preambles, or postscripts.
+"""
+
+
+def get_client():
+    """
+    Returns the process-wide DeepSeek client, creating it on first use.
+
+    Importing openai and building the client costs most of this module's
+    startup, so it is deferred until a request is actually made. The client
+    keeps a pool of keep-alive connections that every request and thread
+    shares. DEEPSEEK_BASE_URL points it at another OpenAI-compatible server
+    (e.g. the offline benchmark's).
+    """
+    global _client
+    if _client is not None:
+        return _client
+    with _client_lock:
+        if _client is None:
+            import httpx
+            from dotenv import load_dotenv
+            from openai import OpenAI, DefaultHttpxClient
+
+            load_dotenv()
+            api_key = os.getenv("DEEPSEEK_API_KEY")
+            if not api_key or api_key == "your_deepseek_api_key_here":
+                logging.warning("DEEPSEEK_API_KEY is not set or is using the default placeholder.")
+            _client = OpenAI(
+                api_key=api_key if api_key else "dummy_key_for_testing",
+                base_url=os.getenv("DEEPSEEK_BASE_URL", DEEPSEEK_BASE_URL),
+                # DefaultHttpxClient keeps the SDK's own timeouts and redirect handling
+                http_client=DefaultHttpxClient(limits=httpx.Limits(max_connections=CLIENT_POOL_SIZE,
+                                                                   max_keepalive_connections=CLIENT_POOL_SIZE)),
+            )
+    return _client
+
+
+def _parse_reply(reply_text: str) -> Dict[str, Any]:
+    """Parses the model's JSON answer, tolerating a surrounding markdown fence."""
+    reply_text = reply_text.strip()
+
+    # Strip potential markdown formatting if the model still includes it
+    if reply_text.startswith("```json"):
+        reply_text = reply_text[7:]
+    if reply_text.endswith("```"):
+        reply_text = reply_text[:-3]
+
+    return json.loads(reply_text.strip())
+
+
+def _record_usage(response):
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        LLM_USAGE_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, kind="prompt")
+        LLM_USAGE_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, kind="completion")
+
+
+def chat_json(system_prompt: str, user_content: str, retries: int = MAX_RETRIES,
+              use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Sends one chat completion and parses its JSON answer, retrying with exponential backoff.
+
+    Parsed answers are cached on disk, keyed by model, prompt, temperature and
+    payload, so an identical request is answered without calling the API.
+    """
+    key = cache_key(MODEL_NAME, system_prompt, TEMPERATURE, user_content)
+    if use_cache:
+        cached = get_cached(key)
+        LLM_CACHE.inc(result="miss" if cached is None else "hit")
+        if cached is not None:
+            return cached
+
+    # Built (and openai imported) outside the timed region
+    client = get_client()
+    delay = RETRY_BACKOFF
+    for attempt in range(retries + 1):
+        try:
+            LLM_PROMPT_TOKENS.inc(estimate_tokens(system_prompt) + estimate_tokens(user_content))
+            with LLM_SECONDS.time(mode="chat"):
+                response = client.chat.completions.create(
+                    model=MODEL_NAME,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_content}
+                    ],
+                    temperature=TEMPERATURE,
+                )
+            _record_usage(response)
+            try:
+                result = _parse_reply(response.choices[0].message.content)
+            except ValueError:
+                LLM_PARSE_FAILURES.inc(mode="chat")
+                raise
+            LLM_REQUESTS.inc(mode="chat", outcome="ok")
+            break
+        except Exception as e:
+            LLM_REQUESTS.inc(mode="chat", outcome="error")
+            if attempt == retries:
+                raise
+            logging.warning(f"DeepSeek request failed ({e}), retrying in {delay:g}s "
+                            f"(attempt {attempt + 1}/{retries})")
+            time.sleep(delay)
+            delay *= 2
+
+    if use_cache:
+        try:
+            put_cached(key, result)
+        except OSError as e:
+            logging.warning(f"Could not write response cache: {e}")
+    return result
+
+
+
+def _stream_chat_json(system_prompt: str, user_content: str, retries: int = MAX_RETRIES,
+                      use_cache: bool = True) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Streams one chat completion through the incremental JSON parser.
+
+    Yields (array_key, item) for every "top_10_attacks"/"lessons" entry as soon
+    as it is complete, then ("result", answer). Requests are retried with
+    exponential backoff only while nothing has been yielded yet; if the
+    connection drops later, the items completed so far are kept as a partial
+    answer (which is not cached).
+    """
+    key = cache_key(MODEL_NAME, system_prompt, TEMPERATURE, user_content)
+    if use_cache:
+        cached = get_cached(key)
+        LLM_CACHE.inc(result="miss" if cached is None else "hit")
+        if cached is not None:
+            for array_key in ("top_10_attacks", "lessons"):
+                for item in cached.get(array_key, []):
+                    yield array_key, item
+            yield "result", cached
+            return
+
+    client = get_client()
+    delay = RETRY_BACKOFF
+    for attempt in range(retries + 1):
+        parser = IncrementalJSONParser()
+        emitted = 0
+        started = time.perf_counter()
+        try:
+            LLM_PROMPT_TOKENS.inc(estimate_tokens(system_prompt) + estimate_tokens(user_content))
+            stream = client.chat.completions.create(
+                model=MODEL_NAME,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_content}
+                ],
+                temperature=TEMPERATURE,
+                stream=True,
+            )
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                for array_key, item in parser.feed(chunk.choices[0].delta.content or ""):
+                    if not emitted:
+                        LLM_FIRST_ITEM_SECONDS.observe(time.perf_counter() - started)
+                    emitted += 1
+                    yield array_key, item
+            LLM_SECONDS.observe(time.perf_counter() - started, mode="stream")
+            LLM_REQUESTS.inc(mode="stream", outcome="ok")
+            break
+        except Exception as e:
+            LLM_SECONDS.observe(time.perf_counter() - started, mode="stream")
+            LLM_REQUESTS.inc(mode="stream", outcome="error")
+            if emitted:
+                logging.warning(f"DeepSeek stream interrupted after {emitted} items ({e}); keeping partial answer")
+                yield "result", parser.result()
+                return
+            if attempt == retries:
+                raise
+            logging.warning(f"DeepSeek request failed ({e}), retrying in {delay:g}s "
+                            f"(attempt {attempt + 1}/{retries})")
+            time.sleep(delay)
+            delay *= 2
+
+    result = parser.result()
+    if not parser.complete:
+        LLM_PARSE_FAILURES.inc(mode="stream")
+        logging.warning("DeepSeek stream ended before the JSON answer was complete; keeping partial answer")
+    elif use_cache:
+        try:
+            put_cached(key, result)
+        except OSError as e:
+            logging.warning(f"Could not write response cache: {e}")
+    yield "result", result
+
+def analyze_news(articles: List[Dict[str, str]],
+                 max_description_chars: int = MAX_DESCRIPTION_CHARS,
+                 token_budget: int = TOKEN_BUDGET,
+                 sharded: bool = False,
+                 use_cache: bool = True,
+                 stream: bool = True,
+                 on_attack: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 on_compacted: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Uses DeepSeek to select the top 10 most impactful cyber attacks from the article list.
+
+    Teaching lessons are a separate stage (see lessons.generate_lessons), so
+    "lessons" is returned empty.
+
+    Articles are compacted first (markup stripped, descriptions truncated to
+    max_description_chars, short field ids) and capped at token_budget.
+    With sharded, the selection runs as a map-reduce over token-bounded
+    shards (see analyze_news_sharded). use_cache=False bypasses the on-disk
+    response cache. With stream, on_attack is called with each ranked attack
+    as soon as it arrives. on_compacted receives the compaction stats of the
+    final request (see compactor.compact_articles), per-article token counts
+    included.
+    """
+    if not articles:
+        return {"top_10_attacks": [], "lessons": []}
+
+    if sharded:
+        return analyze_news_sharded(articles, max_description_chars=max_description_chars,
+                                    token_budget=token_budget, use_cache=use_cache,
+                                    stream=stream, on_attack=on_attack, on_compacted=on_compacted)
+
+    if stream:
+        result_data = {"top_10_attacks": [], "lessons": []}
+        for kind, item in analyze_news_stream(articles, max_description_chars, token_budget, use_cache,
+                                              on_compacted):
+            if kind == "attack" and on_attack:
+                on_attack(item)
+            elif kind == "result":
+                result_data = item
+        return result_data
+
+    # Prepare the prompt
+    articles_payload, id_map, stats = compact_articles(articles, max_description_chars, token_budget)
+    if on_compacted:
+        on_compacted(stats)
+    logging.info(f"Sending {len(id_map)} articles to DeepSeek for analysis...")
+
     try:
-        response = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Daily News Feed:\n{articles_json}"}
-            ],
-            temperature=0.3,
-        )
-        
-        reply_text = response.choices[0].message.content.strip()
-        
-        # Strip potential markdown formatting if the model still includes it
-        if reply_text.startswith("```json"):
-            reply_text = reply_text[7:]
-        if reply_text.endswith("```"):
-            reply_text = reply_text[:-3]
-            
-        result_data = json.loads(reply_text.strip())
+        result_data = chat_json(SYSTEM_PROMPT, f"Daily News Feed:\n{articles_payload}", use_cache=use_cache)
+        result_data["lessons"] = []
+        # Map the short article ids back to the original links
+        result_data["top_10_attacks"] = restore_links(result_data.get("top_10_attacks", []), id_map)
+        if on_attack:
+            for attack in result_data["top_10_attacks"]:
+                on_attack(attack)
         return result_data
-        
+
+    except Exception as e:
+        logging.error(f"Error communicating with DeepSeek API or parsing response: {e}")
+        return {"top_10_attacks": [], "lessons": []}
+
+
+def analyze_news_stream(articles: List[Dict[str, str]],
+                        max_description_chars: int = MAX_DESCRIPTION_CHARS,
+                        token_budget: int = TOKEN_BUDGET,
+                        use_cache: bool = True,
+                        on_compacted: Optional[Callable[[Dict[str, Any]], None]] = None
+                        ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Streaming variant of the single-request analysis.
+
+    Yields ("attack", attack) for each ranked attack (links already restored)
+    as soon as it is complete, then ("result", result) with the full answer in
+    the usual schema. A stream
+    that breaks off still ends with a result holding the completed items.
+    """
+    if not articles:
+        yield "result", {"top_10_attacks": [], "lessons": []}
+        return
+
+    articles_payload, id_map, stats = compact_articles(articles, max_description_chars, token_budget)
+    if on_compacted:
+        on_compacted(stats)
+    logging.info(f"Streaming {len(id_map)} articles to DeepSeek for analysis...")
+
+    result_data = {"top_10_attacks": [], "lessons": []}
+    try:
+        for array_key, item in _stream_chat_json(SYSTEM_PROMPT, f"Daily News Feed:\n{articles_payload}",
+                                                 use_cache=use_cache):
+            if array_key == "top_10_attacks":
+                yield "attack", restore_links([item], id_map)[0]
+            elif array_key == "result":
+                result_data = item
     except Exception as e:
         logging.error(f"Error communicating with DeepSeek API or parsing response: {e}")
+
+    result_data["lessons"] = []
+    # Map the short article ids back to the original links
+    result_data["top_10_attacks"] = restore_links(result_data.get("top_10_attacks", []), id_map)
+    yield "result", result_data
+
+
+def _shortlist_shard(payload: str, id_map: Dict[str, Dict[str, Any]], limit: int,
+                     use_cache: bool = True) -> List[Dict[str, Any]]:
+    """Map step: asks the model to nominate and score the strongest articles of one shard."""
+    reply = chat_json(MAP_PROMPT.format(limit=limit), f"News Batch:\n{payload}", use_cache=use_cache)
+    shortlist = []
+    for candidate in reply.get("candidates", [])[:limit]:
+        article = id_map.get(str(candidate.get("id", "")))
+        if article:
+            try:
+                score = float(candidate.get("score", 0))
+            except (TypeError, ValueError):
+                score = 0.0
+            shortlist.append({**article, "score": score})
+    return shortlist
+
+
+def analyze_news_sharded(articles: List[Dict[str, str]],
+                         shard_tokens: int = SHARD_TOKENS,
+                         max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+                         shortlist_per_shard: int = SHORTLIST_PER_SHARD,
+                         max_description_chars: int = MAX_DESCRIPTION_CHARS,
+                         token_budget: int = TOKEN_BUDGET,
+                         use_cache: bool = True,
+                         stream: bool = True,
+                         on_attack: Optional[Callable[[Dict[str, Any]], None]] = None,
+                         on_compacted: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Map-reduce analysis for large article volumes.
+
+    Map: the articles are split into shards of at most shard_tokens and each
+    shard is shortlisted by its own request, max_concurrency at a time.
+    Reduce: the merged shortlists go through the regular single-request
+    analysis, which produces top_10_attacks in the usual schema.
+    A shard whose request keeps failing is skipped rather than failing the run.
+    """
+    shards = shard_articles(articles, shard_tokens, max_description_chars)
+    logging.info(f"Sharded analysis: {len(shards)} map requests, {max_concurrency} at a time")
+
+    shortlisted = []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(shards)))) as executor:
+        futures = [executor.submit(_shortlist_shard, payload, id_map, shortlist_per_shard, use_cache)
+                   for payload, id_map in shards]
+        for idx, future in enumerate(futures):
+            try:
+                shortlisted.extend(future.result())
+            except Exception as e:
+                logging.error(f"Map request for shard {idx + 1}/{len(shards)} failed: {e}")
+
+    if not shortlisted:
+        logging.error("No shard produced a shortlist.")
         return {"top_10_attacks": [], "lessons": []}
 
+    shortlisted.sort(key=lambda a: a["score"], reverse=True)
+    logging.info(f"Reducing {len(shortlisted)} shortlisted articles from {len(shards)} shards")
+    return analyze_news(shortlisted, max_description_chars=max_description_chars, token_budget=token_budget,
+                        use_cache=use_cache, stream=stream, on_attack=on_attack, on_compacted=on_compacted)
+
 if __name__ == "__main__":
     # Simple mock test
     # We won't actually call the API here because it requires a valid key, 
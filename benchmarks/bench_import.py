@@ -0,0 +1,102 @@
+"""
+Import-time benchmark for the entry points and their heaviest modules.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter per
+module and reports the cumulative import time (best of --repeat runs) plus the
+most expensive imports pulled in directly by it. Also times the wall clock of
+`python main.py --help`, the startup cost a short cron invocation pays before
+doing any work.
+
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --modules main,server --json import-times.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from typing import List, Dict, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ["main", "server", "analyzer", "fetcher", "ingest", "notifier", "outbox"]
+
+
+def import_times(module: str) -> Tuple[int, List[Tuple[str, int]]]:
+    """
+    Imports module in a new interpreter under -X importtime.
+
+    Returns its cumulative time and the (name, cumulative) of its direct
+    imports, in microseconds.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    total = 0
+    children = []
+    pending = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        # Children are printed before their parent; a depth-0 line closes the pending subtree
+        if depth == 0:
+            if name == module:
+                total = int(cumulative)
+                children = pending
+            pending = []
+        elif depth == 1:
+            pending.append((name, int(cumulative)))
+    return total, sorted(children, key=lambda child: child[1], reverse=True)
+
+
+def cli_startup(repeat: int) -> float:
+    """Best wall time in milliseconds of `python main.py --help`."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "main.py", "--help"], cwd=ROOT, capture_output=True, check=True)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", default=",".join(MODULES), help="Comma-separated modules to import")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per module; the fastest counts")
+    parser.add_argument("--top", type=int, default=5, help="Heaviest direct imports to list per module")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    modules = [name.strip() for name in args.modules.split(",") if name.strip()]
+    # One throwaway run so bytecode compilation is not timed
+    for module in modules:
+        import_times(module)
+
+    results: Dict[str, Dict] = {}
+    for module in modules:
+        runs = [import_times(module) for _ in range(args.repeat)]
+        total, children = min(runs, key=lambda run: run[0])
+        results[module] = {"cumulative_ms": round(total / 1000, 2),
+                           "heaviest": [{"module": name, "ms": round(us / 1000, 2)} for name, us in children[:args.top]]}
+    startup = cli_startup(args.repeat)
+
+    print(f"{'module':12} {'import ms':>10}  heaviest direct imports")
+    for module, row in results.items():
+        heaviest = ", ".join(f"{child['module']} {child['ms']:.1f}" for child in row["heaviest"])
+        print(f"{module:12} {row['cumulative_ms']:>10.1f}  {heaviest}")
+    print(f"\npython main.py --help: {startup:.1f} ms wall time (interpreter start included)")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "modules": results,
+                       "main_help_ms": round(startup, 2)}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
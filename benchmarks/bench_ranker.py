@@ -0,0 +1,92 @@
+"""
+Benchmark for the local pre-ranking stage (ranker.py).
+
+Measures how long scoring takes and how many of the LLM's top-10 picks in a
+saved report survive the local shortlist at several cut-offs.
+
+    python benchmarks/bench_ranker.py --articles articles.json --report last_report.json
+    python benchmarks/bench_ranker.py --synthetic 10000
+
+Without --articles, the articles are read from the ingestion daemon's store
+(cache/articles.db). --synthetic only measures scoring speed.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ranker import shortlist, score_articles  # noqa: E402
+from dedup import normalize_text  # noqa: E402
+
+CUTOFFS = [10, 20, 30, 40, 60]
+
+
+def _synthetic_articles(count: int):
+    words = ("cloud patch update report vendor users network attack security firm research "
+             "ransomware zero-day critical breach botnet phishing lockbit exploited backdoor").split()
+    rng = random.Random(42)
+    return [
+        {
+            "title": " ".join(rng.choices(words, k=8)),
+            "description": " ".join(rng.choices(words, k=60)) + (f" CVE-2024-{rng.randint(1000, 9999)}" if i % 7 == 0 else ""),
+            "link": f"https://example.com/{i}",
+            "source": f"Feed {i % 50}",
+            "date": "2026-10-17T00:00:00+00:00",
+        }
+        for i in range(count)
+    ]
+
+
+def _keys(article):
+    return {article.get("link") or "", normalize_text(article.get("title", ""))} - {""}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", help="JSON list of fetched articles")
+    parser.add_argument("--report", help="Saved analysis report whose top_10_attacks are the LLM's picks")
+    parser.add_argument("--synthetic", type=int, help="Score this many synthetic articles instead")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        articles = _synthetic_articles(args.synthetic)
+    elif args.articles:
+        with open(args.articles, "r", encoding="utf-8") as f:
+            articles = json.load(f)
+    else:
+        from ingest import load_recent_articles
+        articles = load_recent_articles(hours=24)
+
+    if not articles:
+        sys.exit("No articles to rank.")
+
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        score_articles(articles)
+        timings.append(time.perf_counter() - started)
+    result = {"articles": len(articles), "score_seconds_best": min(timings),
+              "score_seconds_median": sorted(timings)[len(timings) // 2]}
+
+    if args.report:
+        with open(args.report, "r", encoding="utf-8") as f:
+            picks = json.load(f).get("top_10_attacks", [])
+        ranked = shortlist(articles, top_n=len(articles))
+        overlap = {}
+        for cutoff in CUTOFFS:
+            kept = set().union(*(_keys(a) for a in ranked[:cutoff]))
+            hits = sum(1 for p in picks if _keys(p) & kept)
+            overlap[str(cutoff)] = round(hits / len(picks), 3) if picks else None
+        result["llm_picks"] = len(picks)
+        result["recall_at_cutoff"] = overlap
+
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark for report rendering (renderer.py).
+
+Compares the original string-concatenation email builder against the
+precompiled templates: once for a single email, and for personalized emails
+to many recipients, where the report is normalized once and only the
+recipient changes. Also times rendering all four formats of one report.
+
+    python benchmarks/bench_render.py --recipients 500
+    python benchmarks/bench_render.py --report last_report.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from typing import Dict, Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from renderer import report_context, render_report, render_emails  # noqa: E402
+
+
+def baseline_html_report(data: Dict[str, Any]) -> str:
+    """generate_html_report as it was before the templates: repeated += and no escaping."""
+    if not data or not data.get("top_10_attacks"):
+        return "<p>No significant cyber attacks were found in today's news.</p>"
+
+    html = "<html><body>"
+    html += "<h2>Daily Top 10 Cyber Attacks Report</h2>"
+    html += "<table border='1' cellpadding='5' cellspacing='0'>"
+    html += "<tr style='background-color:#f2f2f2'><th>Rank</th><th>Title</th><th>Source</th><th>Summary</th></tr>"
+    for attack in data.get("top_10_attacks", []):
+        html += f"<tr>"
+        html += f"<td>{attack.get('rank', '-')}</td>"
+        html += f"<td><a href='{attack.get('link', '#')}'>{attack.get('title', 'N/A')}</a></td>"
+        html += f"<td>{attack.get('source', 'N/A')}</td>"
+        html += f"<td>{attack.get('summary', 'N/A')}</td>"
+        html += f"</tr>"
+    html += "</table><br><br>"
+    html += "<h2>Teaching Lessons for Top 2 Attacks</h2>"
+    for lesson in data.get("lessons", []):
+        html += f"<div style='border:1px solid #ccc; padding:10px; margin-bottom:15px;'>"
+        html += f"<h3>Rank #{lesson.get('rank', '-')} - {lesson.get('title', 'N/A')}</h3>"
+        html += "<h4>Learning Objectives:</h4><ul>"
+        for obj in lesson.get("learning_objectives", []):
+            html += f"<li>{obj}</li>"
+        html += "</ul>"
+        html += f"<h4>Real-World Impact:</h4><p>{lesson.get('real_world_impact', 'N/A')}</p>"
+        html += "<h4>Mitigation Strategies:</h4><ul>"
+        for strategy in lesson.get("mitigation_strategies", []):
+            html += f"<li>{strategy}</li>"
+        html += "</ul>"
+        html += "<h4>Discussion Questions:</h4><ul>"
+        for qs in lesson.get("discussion_questions", []):
+            html += f"<li>{qs}</li>"
+        html += "</ul>"
+        html += "</div>"
+    html += "</body></html>"
+    return html
+
+
+def synthetic_report() -> Dict[str, Any]:
+    return {
+        "top_10_attacks": [
+            {"rank": r, "title": f"Attack {r} on <Vendor> & partners", "source": "Synthetic Feed",
+             "link": f"https://example.com/{r}", "summary": "Attackers exploited CVE-2024-3400 in the wild. " * 4}
+            for r in range(1, 11)
+        ],
+        "lessons": [
+            {"rank": r, "title": f"Lesson {r}", "learning_objectives": ["Objective"] * 4,
+             "real_world_impact": "Impact text. " * 30, "mitigation_strategies": ["Strategy"] * 5,
+             "discussion_questions": ["Question?"] * 4}
+            for r in (1, 2)
+        ],
+    }
+
+
+def timed(fn, repeat: int) -> float:
+    """Best wall time in milliseconds over repeat runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--report", help="Saved analysis report to render (default: a synthetic one)")
+    parser.add_argument("--recipients", type=int, default=500, help="Personalized emails to render")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions")
+    args = parser.parse_args()
+
+    if args.report:
+        with open(args.report, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    else:
+        data = synthetic_report()
+    recipients = [f"analyst{i}@example.com" for i in range(args.recipients)]
+
+    # Warm the template cache so compilation is not timed
+    render_report(data)
+
+    single_before = timed(lambda: baseline_html_report(data), args.repeat * 20)
+    single_after = timed(lambda: render_emails(report_context(data), recipients[:1]), args.repeat * 20)
+    many_before = timed(lambda: [baseline_html_report(data) for _ in recipients], args.repeat)
+    many_after = timed(lambda: render_emails(report_context(data), recipients), args.repeat)
+    all_formats = timed(lambda: render_report(data), args.repeat * 20)
+
+    print(f"{'scenario':44} {'before ms':>10} {'after ms':>10}")
+    print(f"{'one email (after: html + text)':44} {single_before:>10.3f} {single_after:>10.3f}")
+    print(f"{f'{args.recipients} personalized emails (after: html + text)':44} {many_before:>10.1f} {many_after:>10.1f}")
+    print(f"{'all four formats of one report':44} {'-':>10} {all_formats:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,638 @@
+"""
+Offline end-to-end benchmark: the pipeline against local stand-ins for every external service.
+
+Starts, on loopback ports:
+  - an RSS server with --feeds synthetic feeds of --items-per-feed entries each,
+    answering after --feed-latency-ms and honouring If-None-Match (304)
+  - a fake OpenAI-compatible /v1/chat/completions endpoint (DEEPSEEK_BASE_URL)
+    that ranks the articles it is sent, with --llm-latency-ms before the first
+    byte and --llm-chunk-delay-ms between streamed chunks; it also answers
+    Telegram's sendMessage
+  - an SMTP sink that accepts every message
+
+and then drives fetch_daily_news, dedupe + shortlist, analyze_news (streamed,
+non-streamed and sharded over every article), the lesson stage, the outbox
+with the notifier's senders, report ingestion for --report-days days of
+history and the server.py endpoints. Everything runs in a temporary working
+directory, so the repository's caches and reports are left alone.
+
+Per scenario it reports throughput, p50/p99 latency per operation, the peak
+traced Python memory of one untimed warm-up pass, and p50/p99 of the timers
+the code records itself (per feed, per DeepSeek request, per message; see
+metrics.py). Results are written as JSON so runs can be compared across
+commits:
+
+    python benchmarks/e2e.py --output e2e-before.json
+    python benchmarks/e2e.py --output e2e-after.json --compare e2e-before.json
+    python benchmarks/e2e.py --scenarios fetch_cold,analyze_stream --feeds 20
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import tracemalloc
+import socketserver
+import email.utils
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from load_test_server import serve  # noqa: E402
+
+SCENARIOS = ["fetch_cold", "fetch_conditional", "select", "analyze_stream", "analyze_chat", "analyze_sharded",
+             "lessons", "notify", "report_ingest", "server"]
+
+SERVER_ENDPOINTS = [
+    ("/api/latest", lambda dates, rng: "/api/latest"),
+    ("/api/reports/{date}", lambda dates, rng: f"/api/reports/{rng.choice(dates)}"),
+    ("/api/reports?limit=50", lambda dates, rng: "/api/reports?limit=50"),
+    ("/api/search", lambda dates, rng: f"/api/search?q={rng.choice(['ransomware', 'lockbit', 'zero-day', 'CVE*'])}"),
+    ("/api/trends?granularity=week", lambda dates, rng: "/api/trends?granularity=week"),
+    ("/metrics", lambda dates, rng: "/metrics"),
+]
+
+_WORDS = ("cloud patch update report vendor users network attack security firm research ransomware zero-day "
+          "critical breach botnet phishing exploited backdoor supply-chain credential wiper espionage router "
+          "firmware healthcare bank telecom government hospital airline retailer university").split()
+_ACTORS = ["LockBit", "Lazarus", "APT29", "Scattered Spider", "Volt Typhoon", "BlackCat", "Cl0p", "Sandworm"]
+_VENDORS = ["Ivanti", "Fortinet", "Cisco", "Citrix", "Microsoft", "VMware", "Atlassian", "Palo Alto Networks"]
+
+
+# --- Synthetic content ---------------------------------------------------------------------------
+
+def _headline(rng: random.Random) -> str:
+    words = rng.choices(_WORDS, k=6)
+    return f"{rng.choice(_ACTORS)} {' '.join(words[:3])} {rng.choice(_VENDORS)} {' '.join(words[3:])}"
+
+
+def _description(rng: random.Random) -> str:
+    text = " ".join(rng.choices(_WORDS, k=rng.randint(40, 90)))
+    if rng.random() < 0.3:
+        text += f" Tracked as CVE-{rng.randint(2023, 2026)}-{rng.randint(1000, 49999)}."
+    return f"<p>{text}</p>"
+
+
+def build_feed(index: int, items: int, now: datetime) -> bytes:
+    rng = random.Random(index)
+    entries = []
+    for item in range(items):
+        published = email.utils.format_datetime(now - timedelta(minutes=rng.randint(1, 23 * 60)))
+        entries.append(
+            f"<item><title>{_headline(rng)}</title>"
+            f"<link>https://feed{index}.example.com/{item}</link>"
+            f"<description><![CDATA[{_description(rng)}]]></description>"
+            f"<pubDate>{published}</pubDate></item>"
+        )
+    return (f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+            f"<title>Synthetic Feed {index}</title><link>https://feed{index}.example.com/</link>"
+            f"<description>Synthetic feed</description>{''.join(entries)}</channel></rss>").encode("utf-8")
+
+
+def synthetic_report(day: int) -> Dict[str, Any]:
+    rng = random.Random(day)
+    return {
+        "top_10_attacks": [
+            {"rank": rank, "title": _headline(rng), "source": f"Synthetic Feed {rng.randint(0, 99)}",
+             "link": f"https://example.com/{day}/{rank}", "summary": _description(rng)[3:-4][:300]}
+            for rank in range(1, 11)
+        ],
+        "lessons": [
+            {"rank": rank, "title": f"Lesson {rank}", "learning_objectives": ["Objective"] * 3,
+             "real_world_impact": "Impact text. " * 20, "mitigation_strategies": ["Strategy"] * 4,
+             "discussion_questions": ["Question?"] * 3}
+            for rank in (1, 2)
+        ],
+    }
+
+
+# --- Local stand-ins -----------------------------------------------------------------------------
+
+def _ignore_hangups(server, request, client_address):
+    # Clients that hang up mid-response (abandoned feeds, closed pools) are expected here
+    if not isinstance(sys.exc_info()[1], ConnectionError):
+        socketserver.BaseServer.handle_error(server, request, client_address)
+
+
+def _start(server) -> Tuple[Any, int]:
+    server.daemon_threads = True
+    server.handle_error = lambda request, client_address: _ignore_hangups(server, request, client_address)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server.server_address[1]
+
+
+def start_feed_server(feeds: int, items: int, latency: float):
+    now = datetime.now(timezone.utc)
+    bodies = [build_feed(index, items, now) for index in range(feeds)]
+
+    class FeedHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            match = re.fullmatch(r"/feeds/(\d+)\.xml", self.path)
+            if not match or int(match.group(1)) >= feeds:
+                self.send_error(404)
+                return
+            index = int(match.group(1))
+            time.sleep(latency)
+            etag = f'"feed-{index}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/rss+xml")
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(bodies[index])))
+            self.end_headers()
+            self.wfile.write(bodies[index])
+
+        def log_message(self, *args):
+            pass
+
+    server, port = _start(ThreadingHTTPServer(("127.0.0.1", 0), FeedHandler))
+    return server, [f"http://127.0.0.1:{port}/feeds/{index}.xml" for index in range(feeds)]
+
+
+def fake_answer(system_prompt: str, user_content: str) -> Dict[str, Any]:
+    """A well-formed answer to whichever prompt (selection, shard shortlist or lesson) was sent."""
+    articles = []
+    for line in user_content.splitlines():
+        if line.startswith("{"):
+            try:
+                articles.append(json.loads(line))
+            except ValueError:
+                pass
+    if '"candidates"' in system_prompt:
+        return {"candidates": [{"id": a.get("id"), "score": 10 - i % 10} for i, a in enumerate(articles[:10])]}
+    if '"learning_objectives"' in system_prompt:
+        attack = json.loads(user_content.split("\n", 1)[1]) if "\n" in user_content else {}
+        return {"title": attack.get("title", "Attack"), "learning_objectives": ["Objective 1", "Objective 2"],
+                "real_world_impact": "Explanation of the impact. " * 5,
+                "mitigation_strategies": ["Strategy 1", "Strategy 2"], "discussion_questions": ["Question 1"]}
+    return {"top_10_attacks": [
+        {"rank": rank, "id": a.get("id"), "title": a.get("t", ""), "source": a.get("s", ""),
+         "summary": "Synthetic summary of why this attack matters to defenders this week."}
+        for rank, a in enumerate(articles[:10], start=1)
+    ]}
+
+
+def start_api_server(latency: float, chunk_delay: float, chunk_chars: int):
+    """Fake DeepSeek (OpenAI chat completions, streamed or not) plus Telegram's sendMessage."""
+    telegram_messages = []
+
+    class APIHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _json(self, status: int, payload: Dict[str, Any]):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _chunk(self, data: bytes):
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if self.path.endswith("/sendMessage"):
+                telegram_messages.append(request.get("chat_id"))
+                self._json(200, {"ok": True, "result": {}})
+                return
+            if not self.path.endswith("/chat/completions"):
+                self._json(404, {"error": {"message": "not found"}})
+                return
+
+            messages = request.get("messages", [])
+            system_prompt = messages[0]["content"] if messages else ""
+            user_content = messages[-1]["content"] if messages else ""
+            text = json.dumps(fake_answer(system_prompt, user_content), indent=1)
+            time.sleep(latency)
+
+            if not request.get("stream"):
+                self._json(200, {
+                    "id": "bench", "object": "chat.completion", "created": int(time.time()),
+                    "model": request.get("model", ""),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                                 "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": len(system_prompt + user_content) // 4,
+                              "completion_tokens": len(text) // 4,
+                              "total_tokens": len(system_prompt + user_content + text) // 4},
+                })
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for start in range(0, len(text), chunk_chars):
+                chunk = {"id": "bench", "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": request.get("model", ""),
+                         "choices": [{"index": 0, "delta": {"content": text[start:start + chunk_chars]},
+                                      "finish_reason": None}]}
+                self._chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                if chunk_delay:
+                    time.sleep(chunk_delay)
+            self._chunk(b"data: [DONE]\n\n")
+            self._chunk(b"")
+
+        def log_message(self, *args):
+            pass
+
+    server, port = _start(ThreadingHTTPServer(("127.0.0.1", 0), APIHandler))
+    return server, f"http://127.0.0.1:{port}", telegram_messages
+
+
+def start_smtp_sink():
+    """Minimal SMTP server (no TLS, no auth) that accepts and counts every message."""
+    received = []
+
+    class SMTPHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            def reply(line: str):
+                self.wfile.write(f"{line}\r\n".encode("ascii"))
+
+            reply("220 bench sink")
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    return
+                command = line.decode("utf-8", "replace").strip().upper()
+                if command == "DATA":
+                    reply("354 end with <CRLF>.<CRLF>")
+                    size = 0
+                    for data in iter(self.rfile.readline, b""):
+                        if data == b".\r\n":
+                            break
+                        size += len(data)
+                    received.append(size)
+                    reply("250 queued")
+                elif command == "QUIT":
+                    reply("221 bye")
+                    return
+                else:
+                    reply("250 ok")
+
+    socketserver.ThreadingTCPServer.allow_reuse_address = True
+    server, port = _start(socketserver.ThreadingTCPServer(("127.0.0.1", 0), SMTPHandler))
+    return server, port, received
+
+
+# --- Measurement ---------------------------------------------------------------------------------
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))]
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def measure(name: str, op: Callable[[], int], repeat: int, unit: str) -> Dict[str, Any]:
+    """
+    Runs op once under tracemalloc (untimed warm-up), then repeat timed times.
+
+    op returns how many items (articles, messages, reports) it processed.
+    The timers recorded through metrics.py during the timed runs are
+    summarized alongside.
+    """
+    import metrics
+
+    tracemalloc.start()
+    op()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    metrics.REGISTRY.reset()
+    latencies = []
+    items = 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        op_started = time.perf_counter()
+        items += op()
+        latencies.append(time.perf_counter() - op_started)
+    elapsed = time.perf_counter() - started
+
+    result = {
+        "ops": repeat, "items": items, "unit": unit, "seconds": round(elapsed, 4),
+        "throughput_per_s": round(items / elapsed, 2) if elapsed else None,
+        "p50_ms": _ms(percentile(latencies, 0.5)), "p99_ms": _ms(percentile(latencies, 0.99)),
+        "peak_traced_mb": round(peak / 2 ** 20, 2),
+        "timers": _timers(),
+    }
+    # Progress line per scenario; the full table is printed at the end
+    print(f"{name}: {items} {unit} in {elapsed:.2f}s ({result['throughput_per_s']}/s, "
+          f"p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms)", flush=True)
+    return result
+
+
+def _timers() -> Dict[str, Dict[str, Any]]:
+    import metrics
+
+    timers = {}
+    for metric in metrics.REGISTRY.metrics():
+        if isinstance(metric, metrics.Histogram):
+            count = sum(count for count, _ in metric.summary().values())
+            if count:
+                timers[metric.name[len(metrics.PREFIX):]] = {
+                    "count": count, "p50_ms": _ms(metric.quantile(0.5)), "p99_ms": _ms(metric.quantile(0.99)),
+                }
+    return timers
+
+
+def hammer(base_url: str, make_path: Callable, dates: List[str], seconds: float, clients: int) -> Dict[str, Any]:
+    """Concurrent keep-alive clients for `seconds`; per-request latencies give p50/p99."""
+    deadline = time.monotonic() + seconds
+    latencies: List[List[float]] = [[] for _ in range(clients)]
+    errors = [0] * clients
+
+    def worker(idx):
+        session = requests.Session()
+        rng = random.Random(idx)
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            response = session.get(base_url + make_path(dates, rng))
+            response.content
+            latencies[idx].append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors[idx] += 1
+        session.close()
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        list(executor.map(worker, range(clients)))
+    elapsed = time.monotonic() - started
+    flat = [value for values in latencies for value in values]
+    return {
+        "ops": len(flat), "items": len(flat), "unit": "requests", "seconds": round(elapsed, 4),
+        "throughput_per_s": round(len(flat) / elapsed, 2) if elapsed else None,
+        "p50_ms": _ms(percentile(flat, 0.5)), "p99_ms": _ms(percentile(flat, 0.99)),
+        "errors": sum(errors),
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                  text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return f"{revision}-dirty" if dirty else revision
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1)
+
+
+def print_results(results: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    old = (baseline or {}).get("scenarios", {})
+    header = f"{'scenario':40} {'throughput/s':>13} {'p50 ms':>10} {'p99 ms':>10} {'peak MB':>8}"
+    if baseline:
+        header += f"  vs {baseline.get('revision') or 'baseline'}"
+    print(header)
+    for name, row in results["scenarios"].items():
+        line = (f"{name:40} {str(row['throughput_per_s']):>13} {str(row['p50_ms']):>10} {str(row['p99_ms']):>10} "
+                f"{str(row.get('peak_traced_mb', '-')):>8}")
+        before = old.get(name)
+        if before and before.get("throughput_per_s") and row["throughput_per_s"] and before.get("p50_ms"):
+            line += (f"  throughput x{row['throughput_per_s'] / before['throughput_per_s']:.2f}, "
+                     f"p50 x{row['p50_ms'] / before['p50_ms']:.2f}")
+        print(line)
+    print(f"peak RSS: {results['peak_rss_mb']} MB")
+
+
+# --- Scenarios -----------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--feeds", type=int, default=100, help="Synthetic feeds served")
+    parser.add_argument("--items-per-feed", type=int, default=100, help="Entries per feed (100 x 100 = 10k articles)")
+    parser.add_argument("--feed-latency-ms", type=float, default=50, help="Delay before each feed response")
+    parser.add_argument("--llm-latency-ms", type=float, default=100, help="Delay before the fake LLM's first byte")
+    parser.add_argument("--llm-chunk-delay-ms", type=float, default=2, help="Delay between streamed chunks")
+    parser.add_argument("--llm-chunk-chars", type=int, default=24, help="Characters per streamed chunk")
+    parser.add_argument("--recipients", type=int, default=200, help="Email recipients per notify run")
+    parser.add_argument("--telegram-chats", type=int, default=20, help="Telegram chats per notify run")
+    parser.add_argument("--report-days", type=int, default=3 * 365, help="Days of report history to ingest and serve")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per scenario")
+    parser.add_argument("--server-seconds", type=float, default=5.0, help="Load duration per endpoint")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent keep-alive HTTP clients")
+    parser.add_argument("--output", default="e2e-results.json", help="Where to write the JSON results")
+    parser.add_argument("--compare", help="Earlier results JSON to print ratios against")
+    parser.add_argument("--keep-workdir", action="store_true", help="Do not delete the temporary working directory")
+    args = parser.parse_args()
+
+    selected = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = sorted(set(selected) - set(SCENARIOS))
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+    output = os.path.abspath(args.output)
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    feed_server, feed_urls = start_feed_server(args.feeds, args.items_per_feed, args.feed_latency_ms / 1000)
+    api_server, api_url, telegram_messages = start_api_server(
+        args.llm_latency_ms / 1000, args.llm_chunk_delay_ms / 1000, args.llm_chunk_chars)
+    smtp_server, smtp_port, emails_received = start_smtp_sink()
+
+    # The analyzer and notifier read their endpoints from the environment
+    os.environ.update({
+        "DEEPSEEK_API_KEY": "bench", "DEEPSEEK_BASE_URL": f"{api_url}/v1",
+        "SMTP_SERVER": "127.0.0.1", "SMTP_PORT": str(smtp_port), "SMTP_STARTTLS": "false",
+        "SMTP_USERNAME": "", "SMTP_PASSWORD": "", "SMTP_FROM": "bench@example.com",
+        "RECEIVER_EMAIL": ",".join(f"analyst{i}@example.com" for i in range(args.recipients)),
+        "TELEGRAM_BOT_TOKEN": "bench-token", "TELEGRAM_API_URL": api_url,
+        "TELEGRAM_CHAT_ID": ",".join(str(1000 + i) for i in range(args.telegram_chats)),
+    })
+
+    workdir = tempfile.mkdtemp(prefix="mycyberbot-e2e-")
+    shutil.copytree(os.path.join(ROOT, "web"), os.path.join(workdir, "web"))
+    os.chdir(workdir)
+
+    from fetcher import fetch_daily_news
+    from dedup import dedupe_articles
+    from ranker import shortlist
+    from analyzer import analyze_news
+    from lessons import generate_lessons
+    from notifier import build_email_messages, build_telegram_messages
+    from renderer import report_context
+    from outbox import enqueue, drain
+    from report_archive import ReportArchive
+    from report_catalog import record_report
+    from search_index import index_report
+    from trends import update_trends
+    # Keep the per-feed and per-request INFO lines out of the measurements; warnings and errors
+    # still go to the log, results are printed and written to the JSON file
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results: Dict[str, Any] = {
+        "revision": git_revision(), "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(), "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "scenarios": {},
+    }
+    scenarios = results["scenarios"]
+    articles: List[Dict[str, Any]] = []
+
+    def need_articles():
+        if not articles:
+            articles.extend(fetch_daily_news(feed_urls, use_cache=False))
+        return articles
+
+    try:
+        if "fetch_cold" in selected:
+            scenarios["fetch_cold"] = measure(
+                "fetch_cold", lambda: len(fetch_daily_news(feed_urls, use_cache=False)), args.repeat, "articles")
+        if "fetch_conditional" in selected:
+            cache_path = os.path.join("cache", "bench_feed_cache.json")
+            fetch_daily_news(feed_urls, cache_path=cache_path)
+            scenarios["fetch_conditional"] = measure(
+                "fetch_conditional", lambda: len(fetch_daily_news(feed_urls, cache_path=cache_path)),
+                args.repeat, "articles")
+
+        shortlisted: List[Dict[str, Any]] = []
+        if set(selected) & {"select", "analyze_stream", "analyze_chat", "lessons"}:
+            need_articles()
+            shortlisted = shortlist(dedupe_articles(articles, skip_seen=False))
+        if "select" in selected:
+            def select():
+                shortlist(dedupe_articles(articles, skip_seen=False))
+                return len(articles)
+
+            scenarios["select"] = measure("select", select, args.repeat, "articles")
+        if "analyze_stream" in selected:
+            scenarios["analyze_stream"] = measure(
+                "analyze_stream",
+                lambda: len(analyze_news(shortlisted, use_cache=False, stream=True)["top_10_attacks"]),
+                args.repeat, "attacks")
+        if "analyze_chat" in selected:
+            scenarios["analyze_chat"] = measure(
+                "analyze_chat",
+                lambda: len(analyze_news(shortlisted, use_cache=False, stream=False)["top_10_attacks"]),
+                args.repeat, "attacks")
+        if "analyze_sharded" in selected:
+            need_articles()
+
+            def analyze_sharded():
+                analyze_news(articles, use_cache=False, sharded=True)
+                return len(articles)
+
+            scenarios["analyze_sharded"] = measure("analyze_sharded", analyze_sharded, args.repeat, "articles")
+        if "lessons" in selected:
+            attacks = analyze_news(shortlisted, use_cache=False)["top_10_attacks"]
+            scenarios["lessons"] = measure(
+                "lessons", lambda: len(generate_lessons(attacks, count=len(attacks), use_cache=False)),
+                args.repeat, "lessons")
+
+        if "notify" in selected:
+            report = synthetic_report(0)
+            runs = iter(range(args.repeat + 1))
+
+            def notify():
+                # A fresh outbox per run, so the dedupe check does not skip the messages
+                path = os.path.join("cache", f"outbox-{next(runs)}.db")
+                context = report_context(report)
+                enqueue(build_email_messages(report, context) + build_telegram_messages(report, context), path)
+                return drain(path, wait=False)["sent"]
+
+            scenarios["notify"] = measure("notify", notify, args.repeat, "messages")
+            results["notify_delivered"] = {"smtp": len(emails_received), "telegram": len(telegram_messages)}
+
+        start = datetime.now().date() - timedelta(days=args.report_days)
+        dates = [(start + timedelta(days=day)).isoformat() for day in range(args.report_days)]
+        if "report_ingest" in selected or "server" in selected:
+            archive = ReportArchive()
+            pending = iter(dates)
+
+            def ingest():
+                # The same writes as main.py's save stage, one report at a time
+                date_str = next(pending, None)
+                if date_str is None:
+                    return 0
+                data = synthetic_report(int(date_str.replace("-", "")))
+                entry = archive.append(date_str, data)
+                record_report(date_str, data, entry.length)
+                index_report(date_str, data)
+                update_trends(date_str, data)
+                return 1
+
+            # Warm-up and timed runs each ingest one day; the rest of the history is ingested untimed
+            if "report_ingest" in selected:
+                scenarios["report_ingest"] = measure("report_ingest", ingest, min(args.repeat * 20, len(dates) - 1),
+                                                     "reports")
+            while ingest():
+                pass
+            archive.close()
+
+        if "server" in selected:
+            import server as app_module
+
+            http_server = serve(app_module.app, _free_port())
+            base_url = f"http://127.0.0.1:{http_server.config.port}"
+            for name, make_path in SERVER_ENDPOINTS:
+                # Warm caches (report bodies, SQLite pages) before measuring
+                hammer(base_url, make_path, dates, min(0.5, args.server_seconds), 2)
+                row = hammer(base_url, make_path, dates, args.server_seconds, args.clients)
+                scenarios[f"server {name}"] = row
+                print(f"server {name}: {row['throughput_per_s']} req/s, p50 {row['p50_ms']} ms, "
+                      f"p99 {row['p99_ms']} ms, {row['errors']} errors", flush=True)
+            http_server.should_exit = True
+    finally:
+        os.chdir(ROOT)
+        feed_server.shutdown()
+        api_server.shutdown()
+        smtp_server.shutdown()
+        if not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    results["peak_rss_mb"] = peak_rss_mb()
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    print_results(results, baseline)
+    print(f"\nResults written to {output}")
+
+
+def _free_port() -> int:
+    import socket
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Load test for the report endpoints of server.py.
+
+Writes synthetic reports into a temporary directory, then serves them twice on
+local ports: with the original handlers (open + json.load + FastAPI
+re-serialization on every hit) as "before", and with the current server.py
+(which imports them into its report archive on start) as "after". Each endpoint is hammered by concurrent keep-alive clients and the
+requests per second are printed side by side.
+
+    python benchmarks/load_test_server.py --seconds 5 --clients 16
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def build_baseline_app() -> FastAPI:
+    """The report handlers as they were before the in-memory cache."""
+    app = FastAPI()
+
+    @app.get("/api/latest")
+    def get_latest():
+        latest_path = os.path.join("reports", "latest.json")
+        if not os.path.exists(latest_path):
+            return JSONResponse(status_code=404, content={"detail": "Latest report not found"})
+        with open(latest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @app.get("/api/reports/{date_str}")
+    def get_report(date_str: str):
+        path = os.path.join("reports", f"{date_str}.json")
+        if not os.path.exists(path):
+            return JSONResponse(status_code=404, content={"detail": f"{date_str}.json not found"})
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    return app
+
+
+def write_reports(directory: str, days: int):
+    os.makedirs(os.path.join(directory, "reports"), exist_ok=True)
+    shutil.copytree(os.path.join(ROOT, "web"), os.path.join(directory, "web"))
+    rng = random.Random(7)
+    dates = []
+    for day in range(days):
+        date_str = time.strftime("%Y-%m-%d", time.gmtime(time.time() - day * 86400))
+        report = {
+            "top_10_attacks": [
+                {"rank": r, "title": f"Attack {day}-{r} " + "x" * rng.randint(20, 60), "source": "Synthetic Feed",
+                 "link": f"https://example.com/{day}/{r}", "summary": "Lorem ipsum dolor sit amet. " * 4}
+                for r in range(1, 11)
+            ],
+            "lessons": [
+                {"rank": r, "title": f"Lesson {r}", "learning_objectives": ["Objective"] * 3,
+                 "real_world_impact": "Impact text. " * 20, "mitigation_strategies": ["Strategy"] * 4,
+                 "discussion_questions": ["Question?"] * 3}
+                for r in (1, 2)
+            ],
+        }
+        with open(os.path.join(directory, "reports", f"{date_str}.json"), "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        dates.append(date_str)
+    with open(os.path.join(directory, "reports", "latest.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return dates
+
+
+def serve(app, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def hammer(base_url: str, paths, seconds: float, clients: int, headers=None) -> float:
+    """Runs `clients` keep-alive clients for `seconds` and returns requests per second."""
+    deadline = time.monotonic() + seconds
+    counts = [0] * clients
+
+    def worker(idx):
+        session = requests.Session()
+        rng = random.Random(idx)
+        while time.monotonic() < deadline:
+            response = session.get(base_url + rng.choice(paths), headers=headers)
+            response.content
+            counts[idx] += 1
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        list(executor.map(worker, range(clients)))
+    return sum(counts) / (time.monotonic() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duration of each measurement")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent keep-alive clients")
+    parser.add_argument("--days", type=int, default=30, help="Synthetic reports to serve")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="mycyberbot-load-")
+    dates = write_reports(workdir, args.days)
+    os.chdir(workdir)
+
+    import server as current
+
+    before = serve(build_baseline_app(), 8101)
+    after = serve(current.app, 8102)
+
+    scenarios = [
+        ("/api/latest", ["/api/latest"], None),
+        ("/api/reports/{date}", [f"/api/reports/{d}" for d in dates], None),
+        ("/api/reports/{date} gzip", [f"/api/reports/{d}" for d in dates], {"Accept-Encoding": "gzip"}),
+    ]
+    results = []
+    for name, paths, headers in scenarios:
+        rps_before = hammer("http://127.0.0.1:8101", paths, args.seconds, args.clients, headers)
+        rps_after = hammer("http://127.0.0.1:8102", paths, args.seconds, args.clients, headers)
+        results.append({"endpoint": name, "before_rps": round(rps_before, 1), "after_rps": round(rps_after, 1),
+                        "speedup": round(rps_after / rps_before, 2) if rps_before else None})
+
+    # Revalidation with If-None-Match only exists after the change
+    etag = requests.get(f"http://127.0.0.1:8102/api/reports/{dates[0]}").headers["ETag"]
+    rps_304 = hammer("http://127.0.0.1:8102", [f"/api/reports/{dates[0]}"], args.seconds, args.clients,
+                     {"If-None-Match": etag})
+    results.append({"endpoint": "/api/reports/{date} 304", "before_rps": None, "after_rps": round(rps_304, 1),
+                    "speedup": None})
+
+    before.should_exit = after.should_exit = True
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'endpoint':32} {'before rps':>12} {'after rps':>12} {'speedup':>8}")
+    for row in results:
+        print(f"{row['endpoint']:32} {str(row['before_rps'] or '-'):>12} {row['after_rps']:>12} "
+              f"{str(row['speedup'] or '-'):>8}")
+
+
+if __name__ == "__main__":
+    main()
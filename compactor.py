@@ -0,0 +1,168 @@
+import re
+import json
+import html
+import math
+import logging
+from typing import List, Dict, Any, Tuple
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Defaults for the prompt compaction stage
+MAX_DESCRIPTION_CHARS = 320
+TOKEN_BUDGET = 12000        # Hard cap on estimated tokens for the article payload of one request
+CHARS_PER_TOKEN = 4         # Rough ratio for English text with DeepSeek/OpenAI-style tokenizers
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_WS_RE = re.compile(r"\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate used for budgeting; avoids shipping a tokenizer."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def strip_markup(text: str) -> str:
+    """Removes HTML tags and entities and collapses whitespace."""
+    text = _TAG_RE.sub(" ", text or "")
+    return _WS_RE.sub(" ", html.unescape(text)).strip()
+
+
+def truncate(text: str, max_chars: int) -> str:
+    """Cuts text at a word boundary so it fits in max_chars."""
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(" ", 1)[0]
+    return cut.rstrip(".,;:") + "…"
+
+
+def article_value(article: Dict[str, Any]) -> Tuple[float, int, str]:
+    """
+    Sort key for how worth keeping an article is when the budget is tight.
+
+    Prefers an explicit "score" (set by an upstream ranking stage), then wider
+    coverage across outlets, then recency.
+    """
+    return (
+        float(article.get("score", 0.0)),
+        len(article.get("sources") or [article.get("source")]),
+        article.get("date", ""),
+    )
+
+
+def compact_article(article: Dict[str, Any], article_id: str, max_description_chars: int) -> Dict[str, str]:
+    """Builds the short-key record sent to the model: id, t(itle), s(ources), d(escription)."""
+    sources = article.get("sources") or [article.get("source", "")]
+    return {
+        "id": article_id,
+        "t": strip_markup(article.get("title", "")),
+        "s": ", ".join(s for s in sources if s),
+        "d": truncate(strip_markup(article.get("description", "")), max_description_chars),
+    }
+
+
+def _serialize(records: List[Dict[str, str]]) -> str:
+    # One compact JSON object per line: no indentation, no spaces after separators
+    return "\n".join(json.dumps(r, ensure_ascii=False, separators=(",", ":")) for r in records)
+
+
+def compact_articles(articles: List[Dict[str, Any]],
+                     max_description_chars: int = MAX_DESCRIPTION_CHARS,
+                     token_budget: int = TOKEN_BUDGET) -> Tuple[str, Dict[str, Dict[str, Any]], Dict[str, Any]]:
+    """
+    Compacts articles into a token-budgeted prompt payload.
+
+    Returns (payload, id_map, stats). id_map maps each short id back to its
+    original article so links and sources can be restored from the model's
+    answer. Articles are dropped lowest-value first until the payload fits
+    token_budget.
+    """
+    records = []
+    per_article = []
+    for idx, article in enumerate(articles):
+        article_id = f"a{idx + 1}"
+        record = compact_article(article, article_id, max_description_chars)
+        line = _serialize([record])
+        before = estimate_tokens(json.dumps(article, indent=2))
+        after = estimate_tokens(line) + 1
+        records.append((article_value(article), record, article, after))
+        per_article.append({"id": article_id, "title": article.get("title", ""),
+                            "tokens_before": before, "tokens_after": after})
+
+    # Keep the most valuable records that fit, then restore the original order
+    kept_ids = set()
+    used = 0
+    for _, record, _, cost in sorted(records, key=lambda r: r[0], reverse=True):
+        if used + cost > token_budget:
+            continue
+        kept_ids.add(record["id"])
+        used += cost
+
+    kept = [(record, article) for _, record, article, _ in records if record["id"] in kept_ids]
+    for entry in per_article:
+        entry["kept"] = entry["id"] in kept_ids
+    payload = _serialize([record for record, _ in kept])
+    id_map = {record["id"]: article for record, article in kept}
+
+    stats = {
+        "articles_in": len(articles),
+        "articles_kept": len(kept),
+        "tokens_before": sum(a["tokens_before"] for a in per_article),
+        "tokens_after": estimate_tokens(payload),
+        "per_article": per_article,
+    }
+    logging.info(
+        f"Compacted {stats['articles_in']} articles to {stats['articles_kept']} "
+        f"(~{stats['tokens_before']} -> ~{stats['tokens_after']} tokens, budget {token_budget})"
+    )
+    if len(kept) < len(articles):
+        logging.warning(f"Token budget dropped {len(articles) - len(kept)} lowest-value articles")
+    return payload, id_map, stats
+
+
+def format_compaction(stats: Dict[str, Any], title_chars: int = 50) -> str:
+    """A per-article table of estimated tokens before and after compaction, for --profile."""
+    lines = [f"{'id':5} {'before':>7} {'after':>6} {'kept':4} title"]
+    for entry in stats["per_article"]:
+        lines.append(f"{entry['id']:5} {entry['tokens_before']:>7} {entry['tokens_after']:>6} "
+                     f"{'yes' if entry['kept'] else 'no':4} {truncate(entry['title'], title_chars)}")
+    lines.append(f"{'total':5} {stats['tokens_before']:>7} {stats['tokens_after']:>6} "
+                 f"{stats['articles_kept']}/{stats['articles_in']}")
+    return "\n".join(lines)
+
+
+def shard_articles(articles: List[Dict[str, Any]], shard_tokens: int,
+                   max_description_chars: int = MAX_DESCRIPTION_CHARS) -> List[Tuple[str, Dict[str, Dict[str, Any]]]]:
+    """
+    Splits articles into token-bounded shards for map-reduce analysis.
+
+    Returns one (payload, id_map) pair per shard. Ids are unique across shards
+    so shortlists from different shards can be merged directly.
+    """
+    shards = []
+    records, id_map, used = [], {}, 0
+    for idx, article in enumerate(articles):
+        record = compact_article(article, f"a{idx + 1}", max_description_chars)
+        cost = estimate_tokens(_serialize([record])) + 1
+        if records and used + cost > shard_tokens:
+            shards.append((_serialize(records), id_map))
+            records, id_map, used = [], {}, 0
+        records.append(record)
+        id_map[record["id"]] = article
+        used += cost
+    if records:
+        shards.append((_serialize(records), id_map))
+    logging.info(f"Split {len(articles)} articles into {len(shards)} shards of at most ~{shard_tokens} tokens")
+    return shards
+
+
+def restore_links(items: List[Dict[str, Any]], id_map: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Replaces the short "id" in the model's answer with the original link and source."""
+    restored = []
+    for item in items:
+        item = dict(item)
+        article = id_map.get(str(item.pop("id", "")))
+        if article:
+            item["link"] = article.get("link", item.get("link", ""))
+            item.setdefault("source", ", ".join(article.get("sources") or [article.get("source", "")]))
+        restored.append(item)
+    return restored
@@ -0,0 +1,283 @@
+import os
+import re
+import html
+import sqlite3
+import hashlib
+import logging
+import datetime
+import functools
+from typing import List, Dict, Any, Iterable, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# On-disk index of links and normalized titles that earlier runs already analyzed
+SEEN_DB_PATH = os.path.join("cache", "seen.db")
+SEEN_RETENTION_DAYS = 30
+
+# MinHash / LSH parameters. Independent write-ups of one story by different outlets share
+# ~0.15-0.25 of their 2-word shingles, unrelated stories on the same vendor or actor stay
+# below ~0.1. 128 hashes in 64 bands of 2 rows make a pair at 0.15 Jaccard share a band
+# with ~77% probability and one at 0.25 with ~98%; candidates are then checked exactly.
+NUM_HASHES = 128
+BANDS = 64
+ROWS = NUM_HASHES // BANDS
+SIMILARITY_THRESHOLD = 0.15
+# Articles that name no CVE, actor or vendor need near-identical text (syndicated copies) to merge
+UNANCHORED_THRESHOLD = 0.5
+SHINGLE_SIZE = 2
+# Candidates whose signature estimate is this far below the threshold skip the exact check
+# (about 1.5 standard errors of a 128-hash estimate near the threshold)
+_ESTIMATE_MARGIN = 0.05
+_CHUNK_PAIRS = 100_000
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_NON_WORD_RE = re.compile(r"[^a-z0-9]+")
+
+
+@functools.lru_cache(maxsize=1)
+def _coefficients():
+    """Deterministic (a, b) arrays of the multiply-shift hash family used by MinHash."""
+    import numpy as np
+
+    a, b = [], []
+    for i in range(NUM_HASHES):
+        digest = hashlib.blake2b(f"minhash-{i}".encode(), digest_size=16).digest()
+        # Multiply-shift needs an odd multiplier
+        a.append(int.from_bytes(digest[:8], "big") | 1)
+        b.append(int.from_bytes(digest[8:], "big"))
+    return np.array(a, dtype=np.uint64), np.array(b, dtype=np.uint64)
+
+
+def normalize_text(text: str) -> str:
+    """Lowercases text and strips markup, entities and punctuation."""
+    text = html.unescape(_TAG_RE.sub(" ", text or ""))
+    return _NON_WORD_RE.sub(" ", text.lower()).strip()
+
+
+def _shingles(text: str) -> set:
+    words = text.split()
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _shingle_hashes(text: str) -> set:
+    return {int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big") for s in _shingles(text)}
+
+
+def _signature(hashes: set) -> "np.ndarray":
+    # Imported here like in ranker.py, so the seen-index helpers stay cheap to import
+    import numpy as np
+
+    a, b = _coefficients()
+    values = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+    # uint64 arithmetic wraps, i.e. (a * h + b) mod 2**64; the high 32 bits are the hash
+    return ((np.outer(a, values) + b[:, None]) >> np.uint64(32)).min(axis=1).astype(np.uint32)
+
+
+def minhash_signature(text: str) -> Optional[List[int]]:
+    """
+    Computes the MinHash signature of the word shingles of already normalized text.
+
+    Returns None for text without words, which is not similar to anything.
+    """
+    hashes = _shingle_hashes(text)
+    return _signature(hashes).tolist() if hashes else None
+
+
+def _candidate_pairs(signatures: "np.ndarray", min_estimate: float) -> "np.ndarray":
+    """
+    Distinct (i, j) row pairs, i < j, that agree on every row of at least one band.
+
+    Pairs whose share of equal signature values is below min_estimate are
+    dropped before they are collected, which keeps corpora with a lot of
+    common wording from piling up millions of candidates.
+    """
+    import numpy as np
+
+    found = []
+    for band in range(BANDS):
+        keys = np.zeros(len(signatures), dtype=np.uint64)
+        for column in range(band * ROWS, (band + 1) * ROWS):
+            keys = (keys << np.uint64(32)) | signatures[:, column].astype(np.uint64)
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        # Rows in one bucket are adjacent after sorting; pair each with the next 1, 2, ... members
+        distance = 1
+        while distance < len(order):
+            same = sorted_keys[distance:] == sorted_keys[:-distance]
+            if not same.any():
+                break
+            first, other = order[:-distance][same], order[distance:][same]
+            for start in range(0, len(first), _CHUNK_PAIRS):
+                a, b = first[start:start + _CHUNK_PAIRS], other[start:start + _CHUNK_PAIRS]
+                keep = (signatures[a] == signatures[b]).mean(axis=1) >= min_estimate
+                found.append(np.stack([np.minimum(a, b)[keep], np.maximum(a, b)[keep]], axis=1))
+            distance += 1
+    if not found:
+        return np.zeros((0, 2), dtype=np.int64)
+    pairs = np.concatenate(found).astype(np.int64)
+    # Pairs found in several bands are kept once; a flat key is much faster to unique than rows
+    keys = np.unique(pairs[:, 0] * len(signatures) + pairs[:, 1])
+    return np.stack([keys // len(signatures), keys % len(signatures)], axis=1)
+
+
+def _entities(article: Dict[str, Any]) -> set:
+    """CVE ids, threat actors and vendors / products the article names."""
+    from ranker import extract_cves, extract_actors, extract_vendors
+
+    text = f"{article.get('title', '')} {article.get('description', '')}"
+    return {*extract_cves(text), *extract_actors(text), *extract_vendors(text)}
+
+
+def cluster_articles(articles: List[Dict[str, Any]], threshold: float = SIMILARITY_THRESHOLD,
+                     unanchored_threshold: float = UNANCHORED_THRESHOLD) -> List[List[int]]:
+    """
+    Groups near-duplicate articles using MinHash over title + description.
+
+    Candidate pairs come from LSH band buckets, so only articles sharing a band
+    are compared, by the exact Jaccard similarity of their shingles. Security
+    news reuses headline templates ("Critical <product> flaw exploited in
+    attacks"), so similar wording alone is not enough: two articles merge at
+    threshold only when they name a common CVE, actor or vendor, never when
+    each names entities the other lacks, and at unanchored_threshold when one
+    of them names none. An article joins a cluster only if it matches the
+    cluster's leader, so stories are never chained together through members.
+    Articles without any text are never clustered. Returns clusters as lists
+    of indexes into articles.
+    """
+    import numpy as np
+
+    shingles = [_shingle_hashes(normalize_text(f"{a.get('title', '')} {a.get('description', '')}"))
+                for a in articles]
+    entities: Dict[int, set] = {}
+
+    def same_story(a: int, b: int) -> bool:
+        union = len(shingles[a] | shingles[b])
+        similarity = len(shingles[a] & shingles[b]) / union
+        if similarity < threshold:
+            return False
+        for idx in (a, b):
+            if idx not in entities:
+                entities[idx] = _entities(articles[idx])
+        if entities[a] and entities[b]:
+            return bool(entities[a] & entities[b])
+        return similarity >= unanchored_threshold
+
+    # Each article's cluster leader (the article the others were compared with) and cluster sizes
+    leader = list(range(len(articles)))
+    size = [1] * len(articles)
+    with_text = [idx for idx, hashes in enumerate(shingles) if hashes]
+    if len(with_text) > 1:
+        signatures = np.stack([_signature(shingles[idx]) for idx in with_text])
+        pairs = _candidate_pairs(signatures, threshold - _ESTIMATE_MARGIN)
+        # Closest pairs first, so an article joins the cluster it resembles most
+        estimates = np.concatenate([
+            (signatures[chunk[:, 0]] == signatures[chunk[:, 1]]).sum(axis=1)
+            for chunk in np.array_split(pairs, max(1, len(pairs) // _CHUNK_PAIRS))
+        ]) if len(pairs) else np.zeros(0)
+        for row_a, row_b in pairs[np.argsort(-estimates, kind="stable")].tolist():
+            a, b = with_text[row_a], with_text[row_b]
+            if size[leader[a]] > 1 and size[leader[b]] > 1:
+                # Both already belong to clusters; merging those would chain stories together
+                continue
+            # The article still on its own joins the other one's cluster, if its leader agrees
+            if size[leader[b]] > 1:
+                a, b = b, a
+            head = leader[a]
+            if head != b and same_story(head, b):
+                leader[b] = head
+                size[head] += 1
+
+    clusters: Dict[int, List[int]] = {}
+    for idx in range(len(articles)):
+        clusters.setdefault(leader[idx], []).append(idx)
+    return list(clusters.values())
+
+
+def _seen_keys(article: Dict[str, Any]) -> List[str]:
+    keys = []
+    # A merged story also covers the other outlets' copies it stands for
+    for copy in [article, *article.get("duplicates", [])]:
+        if copy.get("link"):
+            keys.append(f"link:{copy['link']}")
+        title = normalize_text(copy.get("title", ""))
+        if title:
+            keys.append(f"title:{title}")
+    return keys
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE IF NOT EXISTS seen (key TEXT PRIMARY KEY, first_seen TEXT NOT NULL)")
+    return conn
+
+
+def filter_unseen(articles: List[Dict[str, Any]], path: str = SEEN_DB_PATH) -> List[Dict[str, Any]]:
+    """Drops articles whose link or normalized title was marked seen by an earlier run."""
+    if not articles:
+        return []
+    conn = _connect(path)
+    try:
+        seen = set()
+        keys = [k for a in articles for k in _seen_keys(a)]
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = conn.execute(f"SELECT key FROM seen WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+            seen.update(row[0] for row in rows)
+    finally:
+        conn.close()
+    return [a for a in articles if not any(k in seen for k in _seen_keys(a))]
+
+
+def mark_seen(articles: Iterable[Dict[str, Any]], path: str = SEEN_DB_PATH,
+              retention_days: int = SEEN_RETENTION_DAYS):
+    """Records the articles (and their merged duplicates) as analyzed and forgets entries older than retention_days."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    rows = [(k, now.isoformat()) for a in articles for k in _seen_keys(a)]
+    conn = _connect(path)
+    try:
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO seen (key, first_seen) VALUES (?, ?)", rows)
+            conn.execute("DELETE FROM seen WHERE first_seen < ?",
+                         ((now - datetime.timedelta(days=retention_days)).isoformat(),))
+    finally:
+        conn.close()
+
+
+def dedupe_articles(articles: List[Dict[str, Any]], skip_seen: bool = True,
+                    path: str = SEEN_DB_PATH) -> List[Dict[str, Any]]:
+    """
+    Dedup stage between the fetcher and the analyzer.
+
+    Drops articles analyzed by earlier runs (when skip_seen is set), then
+    collapses near-duplicate coverage of the same story into one article.
+    The representative keeps the longest description and gains a "sources"
+    list naming every outlet that covered it, plus the link and title of the
+    other copies as "duplicates", so mark_seen() retires the whole story.
+    """
+    fresh = filter_unseen(articles, path) if skip_seen else list(articles)
+    clusters = cluster_articles(fresh)
+
+    deduped = []
+    for members in clusters:
+        group = [fresh[i] for i in members]
+        best = max(group, key=lambda a: len(a.get("description", "")))
+        representative = dict(best)
+        sources = []
+        for article in group:
+            if article.get("source") and article["source"] not in sources:
+                sources.append(article["source"])
+        representative["sources"] = sources
+        if len(group) > 1:
+            representative["duplicates"] = [{"link": a.get("link", ""), "title": a.get("title", "")}
+                                            for a in group if a is not best]
+        deduped.append(representative)
+
+    logging.info(f"Dedup: {len(articles)} fetched, {len(fresh)} unseen, {len(deduped)} unique stories")
+    return deduped
@@ -1,7 +1,18 @@
-import feedparser
 import datetime
+import json
 import logging
-from typing import List, Dict
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future, as_completed, TimeoutError as FuturesTimeoutError
+from typing import List, Dict, Optional, Any, Tuple, TYPE_CHECKING
+import metrics
+
+# feedparser and requests are imported on first download, so reading constants
+# and the feed cache (ingest.py, main.py --from-store) stays cheap
+if TYPE_CHECKING:
+    import requests
 
 # Set up basic logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -15,36 +26,262 @@ RSS_FEEDS = [
     "https://www.darkreading.com/rss.xml"
 ]
 
-def fetch_daily_news() -> List[Dict[str, str]]:
-    """Fetches articles from RSS feeds published in the last 24 hours."""
+# Concurrency and deadlines for the fetch stage
+MAX_WORKERS = 16           # Upper bound on feeds downloaded at the same time
+FEED_TIMEOUT = 15          # Seconds allowed for a single feed (connect + read)
+OVERALL_DEADLINE = 45      # Seconds allowed for the whole fetch stage
+USER_AGENT = "mycyberbot/1.0 (+https://github.com/Rcacoder/mycyberbot)"
+
+FEED_SECONDS = metrics.histogram("feed_fetch_seconds", "Download and parse time per feed")
+FEED_RESULTS = metrics.counter("feed_fetches", "Feed polls by outcome (ok, not_modified, error)")
+ARTICLES_FETCHED = metrics.counter("articles_fetched", "Articles from the last 24 hours returned by the fetch stage")
+
+# Per-feed conditional-GET cache (ETag / Last-Modified validators plus the last parsed entries)
+FEED_CACHE_PATH = os.path.join("cache", "feed_cache.json")
+
+
+def create_session(pool_size: int = MAX_WORKERS) -> "requests.Session":
+    """Creates a shared HTTP session with a connection pool sized for the worker count."""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"User-Agent": USER_AGENT})
+    return session
+
+
+def load_feed_cache(path: str = FEED_CACHE_PATH) -> Dict[str, Dict[str, Any]]:
+    """Loads the per-feed cache, keyed by feed URL. A missing or corrupt file yields an empty cache."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable feed cache {path}: {e}")
+        return {}
+
+
+def save_feed_cache(cache: Dict[str, Dict[str, Any]], path: str = FEED_CACHE_PATH):
+    """Writes the per-feed cache atomically so an interrupted run cannot corrupt it."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, path)
+
+
+def _download_feed(session: "requests.Session", feed_url: str, timeout: float,
+                   cached: Optional[Dict[str, Any]] = None) -> Tuple[Optional[bytes], Dict[str, str]]:
+    """
+    Downloads the raw feed body, enforcing a deadline on the whole transfer.
+
+    Sends the cached validators as a conditional request. Returns (None, validators)
+    when the server answers 304 Not Modified.
+    """
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("modified"):
+            headers["If-Modified-Since"] = cached["modified"]
+
+    started = time.monotonic()
+    chunks = []
+    with session.get(feed_url, timeout=timeout, stream=True, headers=headers) as response:
+        if response.status_code == 304:
+            return None, {"etag": cached.get("etag"), "modified": cached.get("modified")}
+        response.raise_for_status()
+        validators = {
+            "etag": response.headers.get("ETag"),
+            "modified": response.headers.get("Last-Modified"),
+        }
+        # read1 returns whatever one socket read delivers, so a server trickling
+        # bytes is checked against the deadline instead of filling a 64 KB buffer
+        # (iter_content would block until the buffer or the whole body arrives)
+        for chunk in iter(lambda: response.raw.read1(64 * 1024, decode_content=True), b""):
+            chunks.append(chunk)
+            if time.monotonic() - started > timeout:
+                raise TimeoutError(f"read exceeded {timeout}s")
+    return b"".join(chunks), validators
+
+
+def parse_entries(feed, feed_url: str, cutoff_time: Optional[datetime.datetime] = None) -> List[Dict[str, str]]:
+    """Converts parsed feed entries (published after cutoff_time, if given) into article dicts."""
+    articles = []
+    for entry in feed.entries:
+        # Some feeds might not have a published_parsed attribute, fall back to updated_parsed
+        entry_date_parsed = entry.get('published_parsed') or entry.get('updated_parsed')
+
+        if entry_date_parsed:
+            # Convert time.struct_time to datetime
+            entry_date = datetime.datetime(*entry_date_parsed[:6], tzinfo=datetime.timezone.utc)
+
+            if cutoff_time is None or entry_date >= cutoff_time:
+                articles.append({
+                    "title": entry.get("title", ""),
+                    "link": entry.get("link", ""),
+                    "description": entry.get("summary", "") or entry.get("description", ""),
+                    "source": feed.feed.get("title", feed_url),
+                    "date": entry_date.isoformat()
+                })
+    return articles
+
+
+def filter_since(articles: List[Dict[str, str]], cutoff_time: datetime.datetime) -> List[Dict[str, str]]:
+    """Keeps the articles whose ISO date is at or after cutoff_time."""
+    return [a for a in articles if datetime.datetime.fromisoformat(a["date"]) >= cutoff_time]
+
+
+def fetch_feed(session: "requests.Session", feed_url: str,
+               timeout: float = FEED_TIMEOUT,
+               cached: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Downloads and parses a single feed. Runs inside a worker thread.
+
+    Returns a cache entry holding the validators and every parsed entry. On a 304
+    response the cached entries are reused and nothing is parsed.
+    """
+    logging.info(f"Fetching from {feed_url}")
+    with FEED_SECONDS.time(feed=feed_url):
+        try:
+            body, validators = _download_feed(session, feed_url, timeout, cached)
+        except Exception:
+            FEED_RESULTS.inc(feed=feed_url, outcome="error")
+            raise
+        if body is None:
+            logging.info(f"Not modified since last poll: {feed_url}")
+            FEED_RESULTS.inc(feed=feed_url, outcome="not_modified")
+            return {**validators, "entries": cached.get("entries", [])}
+        import feedparser
+
+        feed = feedparser.parse(body)
+        entries = parse_entries(feed, feed_url)
+    FEED_RESULTS.inc(feed=feed_url, outcome="ok")
+    return {**validators, "entries": entries}
+
+
+def _submit_daemon(fn, calls: List[Tuple], workers: int) -> List[Future]:
+    """
+    Runs fn(*args) for each tuple in calls on `workers` daemon threads.
+
+    Unlike ThreadPoolExecutor, whose workers are joined at interpreter exit, a
+    worker still blocked on a slow socket never keeps the process alive after
+    its result has been abandoned. Futures not yet started can be cancelled.
+    """
+    pending = queue.Queue()
+    futures = []
+    for args in calls:
+        future = Future()
+        pending.put((future, args))
+        futures.append(future)
+
+    def worker():
+        while True:
+            try:
+                future, args = pending.get_nowait()
+            except queue.Empty:
+                return
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+    for i in range(workers):
+        threading.Thread(target=worker, name=f"fetcher-{i}", daemon=True).start()
+    return futures
+
+
+def fetch_feeds(feeds: List[str],
+                cache: Optional[Dict[str, Dict[str, Any]]] = None,
+                session: Optional["requests.Session"] = None,
+                max_workers: int = MAX_WORKERS,
+                feed_timeout: float = FEED_TIMEOUT,
+                overall_deadline: float = OVERALL_DEADLINE) -> Dict[str, Dict[str, Any]]:
+    """
+    Downloads and parses feeds concurrently, returning a cache entry per feed URL.
+
+    Feeds that fail, exceed feed_timeout or are still running when
+    overall_deadline expires are logged and left out of the result. Pass a
+    long-lived session to keep its connection pool warm between calls.
+    """
+    cache = cache or {}
+    if not feeds:
+        return {}
+
+    workers = min(max_workers, len(feeds))
+    own_session = session is None
+    if own_session:
+        session = create_session(workers)
+    calls = [(session, url, feed_timeout, cache.get(url)) for url in feeds]
+    futures = dict(zip(_submit_daemon(fetch_feed, calls, workers), feeds))
+    results = {}
+    try:
+        for future in as_completed(futures, timeout=overall_deadline):
+            feed_url = futures[future]
+            try:
+                results[feed_url] = future.result()
+            except Exception as e:
+                logging.error(f"Error fetching from {feed_url}: {e}")
+    except FuturesTimeoutError:
+        for future, feed_url in futures.items():
+            if not future.done():
+                logging.error(f"Error fetching from {feed_url}: overall deadline of {overall_deadline}s exceeded")
+    finally:
+        # Do not wait for stragglers: feeds not yet started are cancelled, and running
+        # ones are on daemon threads bounded by feed_timeout that cannot block exit
+        for future in futures:
+            future.cancel()
+        if own_session:
+            session.close()
+    return results
+
+
+def fetch_daily_news(feeds: Optional[List[str]] = None,
+                     max_workers: int = MAX_WORKERS,
+                     feed_timeout: float = FEED_TIMEOUT,
+                     overall_deadline: float = OVERALL_DEADLINE,
+                     use_cache: bool = True,
+                     cache_path: str = FEED_CACHE_PATH) -> List[Dict[str, str]]:
+    """
+    Fetches articles from RSS feeds published in the last 24 hours.
+
+    Feeds are downloaded and parsed concurrently over one pooled HTTP session.
+    A feed that exceeds feed_timeout is skipped, and feeds still running when
+    overall_deadline expires are abandoned, so a slow host cannot stall the run.
+    With use_cache, feeds are polled with conditional requests and unchanged
+    feeds are served from the cache at cache_path without re-parsing.
+    """
+    feeds = RSS_FEEDS if feeds is None else feeds
     articles = []
-    
+    if not feeds:
+        return articles
+
     # Calculate cutoff time: 24 hours ago
     cutoff_time = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=1)
-    
-    for feed_url in RSS_FEEDS:
-        logging.info(f"Fetching from {feed_url}")
+    cache = load_feed_cache(cache_path) if use_cache else {}
+
+    results = fetch_feeds(feeds, cache, max_workers=max_workers,
+                          feed_timeout=feed_timeout, overall_deadline=overall_deadline)
+
+    # Keep the feed order stable so downstream output does not depend on which host answered first
+    for feed_url in feeds:
+        if feed_url in results:
+            articles.extend(filter_since(results[feed_url]["entries"], cutoff_time))
+
+    if use_cache and results:
+        cache.update(results)
         try:
-            feed = feedparser.parse(feed_url)
-            for entry in feed.entries:
-                # Some feeds might not have a published_parsed attribute, fall back to updated_parsed
-                entry_date_parsed = entry.get('published_parsed') or entry.get('updated_parsed')
-                
-                if entry_date_parsed:
-                    # Convert time.struct_time to datetime
-                    entry_date = datetime.datetime(*entry_date_parsed[:6], tzinfo=datetime.timezone.utc)
-                    
-                    if entry_date >= cutoff_time:
-                        articles.append({
-                            "title": entry.get("title", ""),
-                            "link": entry.get("link", ""),
-                            "description": entry.get("summary", "") or entry.get("description", ""),
-                            "source": feed.feed.get("title", feed_url),
-                            "date": entry_date.isoformat()
-                        })
-        except Exception as e:
-            logging.error(f"Error fetching from {feed_url}: {e}")
-            
+            save_feed_cache(cache, cache_path)
+        except OSError as e:
+            logging.warning(f"Could not save feed cache {cache_path}: {e}")
+
+    ARTICLES_FETCHED.inc(len(articles))
     logging.info(f"Total articles fetched from last 24 hours: {len(articles)}")
     return articles
 
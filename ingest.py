@@ -0,0 +1,183 @@
+import os
+import time
+import sqlite3
+import logging
+import argparse
+import datetime
+import statistics
+from typing import List, Dict, Any, Optional
+
+from fetcher import RSS_FEEDS, MAX_WORKERS, create_session, fetch_feeds, load_feed_cache, save_feed_cache
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Local rolling-window article store filled by the ingestion daemon
+ARTICLE_STORE_PATH = os.path.join("cache", "articles.db")
+STORE_WINDOW_HOURS = 72
+
+# Bounds for the adaptive per-feed polling interval, in seconds
+MIN_POLL_INTERVAL = 5 * 60
+MAX_POLL_INTERVAL = 2 * 60 * 60
+DEFAULT_POLL_INTERVAL = 15 * 60
+# Poll a feed this many times per typical gap between its posts
+POLLS_PER_POST = 2
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS articles (
+            link TEXT PRIMARY KEY,
+            title TEXT NOT NULL,
+            description TEXT NOT NULL,
+            source TEXT NOT NULL,
+            date TEXT NOT NULL,
+            feed_url TEXT NOT NULL,
+            ingested_at TEXT NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS articles_date ON articles (date)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS feed_schedule (
+            feed_url TEXT PRIMARY KEY,
+            interval REAL NOT NULL,
+            next_poll REAL NOT NULL
+        )
+    """)
+    return conn
+
+
+def store_articles(conn: sqlite3.Connection, feed_url: str, articles: List[Dict[str, str]]) -> int:
+    """Appends articles not yet in the store. Returns how many were new."""
+    now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    before = conn.total_changes
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO articles (link, title, description, source, date, feed_url, ingested_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(a["link"] or f"{feed_url}#{a['title']}", a["title"], a["description"], a["source"], a["date"], feed_url, now)
+             for a in articles]
+        )
+    return conn.total_changes - before
+
+
+def evict_expired(conn: sqlite3.Connection, window_hours: float = STORE_WINDOW_HOURS) -> int:
+    """Drops articles published before the rolling window. Returns how many were removed."""
+    cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=window_hours)
+    with conn:
+        cursor = conn.execute("DELETE FROM articles WHERE date < ?", (cutoff.isoformat(),))
+    return cursor.rowcount
+
+
+def load_recent_articles(hours: float = 24, path: str = ARTICLE_STORE_PATH) -> List[Dict[str, str]]:
+    """Reads the articles published in the last `hours` from the store, without any network I/O."""
+    if not os.path.exists(path):
+        logging.warning(f"Article store {path} does not exist yet. Is the ingestion daemon running?")
+        return []
+    cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=hours)
+    conn = _connect(path)
+    try:
+        rows = conn.execute(
+            "SELECT title, link, description, source, date FROM articles WHERE date >= ? ORDER BY date DESC",
+            (cutoff.isoformat(),)
+        ).fetchall()
+    finally:
+        conn.close()
+    articles = [
+        {"title": title, "link": link, "description": description, "source": source, "date": date}
+        for title, link, description, source, date in rows
+    ]
+    logging.info(f"Loaded {len(articles)} articles from the last {hours:g} hours out of {path}")
+    return articles
+
+
+def adaptive_interval(entries: List[Dict[str, str]]) -> float:
+    """
+    Picks a polling interval from how often the feed actually publishes.
+
+    Uses the median gap between the feed's recent entries so a single burst or
+    quiet weekend does not swing the schedule, then polls POLLS_PER_POST times
+    per gap, clamped to [MIN_POLL_INTERVAL, MAX_POLL_INTERVAL].
+    """
+    stamps = sorted(datetime.datetime.fromisoformat(e["date"]).timestamp() for e in entries)
+    gaps = [b - a for a, b in zip(stamps, stamps[1:]) if b > a]
+    if not gaps:
+        return DEFAULT_POLL_INTERVAL
+    interval = statistics.median(gaps) / POLLS_PER_POST
+    return max(MIN_POLL_INTERVAL, min(MAX_POLL_INTERVAL, interval))
+
+
+def _due_feeds(conn: sqlite3.Connection, feeds: List[str], now: float) -> List[str]:
+    schedule = dict(conn.execute("SELECT feed_url, next_poll FROM feed_schedule").fetchall())
+    return [url for url in feeds if schedule.get(url, 0) <= now]
+
+
+def _reschedule(conn: sqlite3.Connection, feed_url: str, interval: float, now: float):
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO feed_schedule (feed_url, interval, next_poll) VALUES (?, ?, ?)",
+            (feed_url, interval, now + interval)
+        )
+
+
+def poll_once(conn: sqlite3.Connection, feeds: List[str], cache: Dict[str, Dict[str, Any]], session=None,
+              window_hours: float = STORE_WINDOW_HOURS) -> float:
+    """
+    Polls the feeds that are due, stores their new entries and reschedules them.
+
+    Returns the number of seconds until the next feed is due.
+    """
+    now = time.time()
+    due = _due_feeds(conn, feeds, now)
+    if due:
+        results = fetch_feeds(due, cache, session=session)
+        window_start = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=window_hours)
+        for feed_url in due:
+            if feed_url not in results:
+                # Failed polls back off to the default interval instead of hammering the host
+                _reschedule(conn, feed_url, DEFAULT_POLL_INTERVAL, now)
+                continue
+            entries = results[feed_url]["entries"]
+            in_window = [e for e in entries if datetime.datetime.fromisoformat(e["date"]) >= window_start]
+            added = store_articles(conn, feed_url, in_window)
+            interval = adaptive_interval(entries)
+            _reschedule(conn, feed_url, interval, now)
+            logging.info(f"{feed_url}: {added} new articles, next poll in {interval / 60:.0f} min")
+        cache.update(results)
+        save_feed_cache(cache)
+        evicted = evict_expired(conn, window_hours)
+        if evicted:
+            logging.info(f"Evicted {evicted} articles older than {window_hours:g} hours")
+
+    next_due = conn.execute("SELECT MIN(next_poll) FROM feed_schedule").fetchone()[0]
+    return max(1.0, (next_due or now + DEFAULT_POLL_INTERVAL) - time.time())
+
+
+def run_daemon(feeds: Optional[List[str]] = None, path: str = ARTICLE_STORE_PATH,
+               window_hours: float = STORE_WINDOW_HOURS, once: bool = False):
+    """Runs the ingestion loop until interrupted (or a single pass when once is set)."""
+    feeds = RSS_FEEDS if feeds is None else feeds
+    conn = _connect(path)
+    cache = load_feed_cache()
+    session = create_session(min(MAX_WORKERS, len(feeds)))
+    logging.info(f"Ingestion daemon watching {len(feeds)} feeds, store at {path}")
+    try:
+        while True:
+            sleep_for = poll_once(conn, feeds, cache, session, window_hours)
+            if once:
+                break
+            time.sleep(sleep_for)
+    except KeyboardInterrupt:
+        logging.info("Ingestion daemon stopped.")
+    finally:
+        session.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incremental RSS ingestion into the local article store")
+    parser.add_argument("--once", action="store_true", help="Poll every due feed once and exit")
+    parser.add_argument("--window-hours", type=float, default=STORE_WINDOW_HOURS, help="How long articles stay in the store")
+    args = parser.parse_args()
+    run_daemon(window_hours=args.window_hours, once=args.once)
@@ -0,0 +1,109 @@
+import json
+import logging
+from typing import List, Dict, Any, Iterable, Tuple, Optional
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class IncrementalJSONParser:
+    """
+    Incremental parser for the analyzer's streamed JSON answer.
+
+    Text is fed in arbitrary chunks as it arrives. Every object inside one of
+    the watched top-level arrays (e.g. "top_10_attacks") is returned by feed()
+    as soon as its closing brace arrives, so consumers can start before the
+    rest of the answer is generated. Markdown fences or prose around the JSON
+    are ignored, and result() salvages whatever was complete if the stream
+    was cut off.
+    """
+
+    def __init__(self, array_keys: Iterable[str] = ("top_10_attacks", "lessons")):
+        self.array_keys = set(array_keys)
+        self.items: Dict[str, List[Dict[str, Any]]] = {key: [] for key in self.array_keys}
+        self._data = ""
+        self._pos = 0                  # Absolute offset of the next character to scan
+        self._root_start: Optional[int] = None
+        self._root_end: Optional[int] = None
+        self._stack: List[str] = []    # Open containers, "{" or "["
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_key: Optional[str] = None
+        self._active_key: Optional[str] = None   # Watched array currently being scanned
+        self._item_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """Consumes a chunk and returns the (array_key, item) pairs it completed."""
+        completed = []
+        if self._root_end is not None or not chunk:
+            return completed
+        base = self._pos
+        self._data += chunk
+
+        for offset, ch in enumerate(chunk):
+            pos = base + offset
+            if self._root_start is None:
+                if ch == "{":
+                    self._root_start = pos
+                    self._stack.append("{")
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        # A string at root-object level is a key (or a scalar value, harmless here)
+                        self._last_key = self._data[self._string_start + 1:pos]
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = pos
+            elif ch in "{[":
+                if ch == "[" and len(self._stack) == 1 and self._last_key in self.array_keys:
+                    self._active_key = self._last_key
+                elif ch == "{" and self._active_key and len(self._stack) == 2:
+                    self._item_start = pos
+                self._stack.append(ch)
+            elif ch in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if ch == "}" and self._item_start is not None and len(self._stack) == 2:
+                    try:
+                        item = json.loads(self._data[self._item_start:pos + 1])
+                        self.items[self._active_key].append(item)
+                        completed.append((self._active_key, item))
+                    except ValueError as e:
+                        logging.warning(f"Skipping malformed {self._active_key} item in stream: {e}")
+                    self._item_start = None
+                elif ch == "]" and len(self._stack) == 1:
+                    self._active_key = None
+                elif not self._stack:
+                    self._root_end = pos + 1
+                    break
+
+        self._pos = base + len(chunk)
+        return completed
+
+    @property
+    def complete(self) -> bool:
+        """True once the root object has been closed."""
+        return self._root_end is not None
+
+    def result(self) -> Dict[str, Any]:
+        """
+        Returns the parsed answer.
+
+        If the root object closed and parses cleanly it is returned as is;
+        otherwise the items completed so far are returned under their keys.
+        """
+        if self._root_start is not None and self._root_end is not None:
+            try:
+                return json.loads(self._data[self._root_start:self._root_end])
+            except ValueError as e:
+                logging.warning(f"Streamed answer is not valid JSON, keeping completed items: {e}")
+        return {key: list(items) for key, items in self.items.items()}
@@ -0,0 +1,110 @@
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import List, Dict, Any, Optional, Tuple
+
+from analyzer import chat_json, MAX_CONCURRENT_REQUESTS
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# How many of the top-ranked attacks get a teaching lesson
+LESSON_COUNT = 2
+
+LESSON_PROMPT = """
+You are an expert cybersecurity professor.
+You will be provided with one notable cyber attack from today's news in JSON format.
+Generate a brief teaching lesson about it suitable for university students.
+
+The output MUST be valid JSON matching this exact structure:
+{
+  "title": "Title of the attack",
+  "learning_objectives": ["Objective 1", "Objective 2"],
+  "real_world_impact": "Explanation of the impact.",
+  "mitigation_strategies": ["Strategy 1", "Strategy 2"],
+  "discussion_questions": ["Question 1", "Question 2"]
+}
+Return ONLY the raw JSON format, without markdown blocks, preambles, or postscripts.
+"""
+
+
+def generate_lesson(attack: Dict[str, Any], use_cache: bool = True) -> Dict[str, Any]:
+    """Generates the teaching lesson for one ranked attack. Raises if the request keeps failing."""
+    details = {key: attack.get(key, "") for key in ("title", "source", "link", "summary")}
+    lesson = chat_json(LESSON_PROMPT, f"Attack:\n{json.dumps(details, ensure_ascii=False)}", use_cache=use_cache)
+    return {"rank": attack.get("rank"), **{k: v for k, v in lesson.items() if k != "rank"}}
+
+
+def _lesson_key(attack: Dict[str, Any]) -> Tuple[Any, str]:
+    return attack.get("rank"), attack.get("title", "")
+
+
+class EarlyLessons:
+    """
+    Starts lesson requests while the analysis is still streaming.
+
+    Pass add() as analyze_news's on_attack callback: every attack ranked
+    within the top `count` gets its lesson request submitted the moment it is
+    parsed, and generate_lessons() later picks up the running requests instead
+    of starting from scratch. Call close() when the lesson stage will not run.
+    """
+
+    def __init__(self, count: int = LESSON_COUNT, max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+                 use_cache: bool = True):
+        self.count = count
+        self.use_cache = use_cache
+        self._lock = threading.Lock()
+        self._futures: Dict[Tuple[Any, str], Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, count)),
+                                            thread_name_prefix="early-lesson")
+
+    def add(self, attack: Dict[str, Any]):
+        rank = attack.get("rank")
+        if not isinstance(rank, int) or not 0 < rank <= self.count:
+            return
+        key = _lesson_key(attack)
+        with self._lock:
+            if key in self._futures:
+                return
+            logging.info(f"Starting lesson for #{rank} while the analysis continues: {attack.get('title')}")
+            self._futures[key] = self._executor.submit(generate_lesson, attack, self.use_cache)
+
+    def take(self, attack: Dict[str, Any]) -> Optional[Future]:
+        """The request already started for this attack, if its rank and title match the final answer."""
+        with self._lock:
+            return self._futures.pop(_lesson_key(attack), None)
+
+    def close(self):
+        # Requests for attacks that did not make the final answer are dropped if not yet running
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def generate_lessons(attacks: List[Dict[str, Any]], count: int = LESSON_COUNT,
+                     max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+                     use_cache: bool = True, early: Optional[EarlyLessons] = None) -> List[Dict[str, Any]]:
+    """
+    Lesson stage: one request per selected attack, run concurrently.
+
+    Lessons are generated for the first `count` attacks (by rank) and returned
+    in rank order. Requests already started by `early` during the streamed
+    analysis are reused. A lesson whose request fails is left out instead of
+    failing the whole stage.
+    """
+    selected = sorted(attacks, key=lambda a: a.get("rank") or len(attacks))[:max(count, 0)]
+    if not selected:
+        return []
+
+    started = [early.take(attack) if early else None for attack in selected]
+    missing = sum(1 for future in started if future is None)
+    logging.info(f"Generating {len(selected)} teaching lessons ({len(selected) - missing} already started), "
+                 f"{max_concurrency} at a time...")
+    lessons = []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, missing or 1))) as executor:
+        futures = [future or executor.submit(generate_lesson, attack, use_cache)
+                   for attack, future in zip(selected, started)]
+        for attack, future in zip(selected, futures):
+            try:
+                lessons.append(future.result())
+            except Exception as e:
+                logging.error(f"Failed to generate lesson for '{attack.get('title')}': {e}")
+    return lessons
@@ -2,86 +2,296 @@ import argparse
 import logging
 import json
 import os
+import sys
+import time
 from datetime import datetime
-from fetcher import fetch_daily_news
+from typing import List
+from dedup import dedupe_articles, mark_seen
+from ranker import shortlist, SHORTLIST_SIZE
 from analyzer import analyze_news
-from notifier import generate_html_report, send_email_report, send_telegram_message
+from lessons import generate_lessons, EarlyLessons, LESSON_COUNT
+from compactor import TOKEN_BUDGET, MAX_DESCRIPTION_CHARS, format_compaction
+from report_archive import ReportArchive
+from report_catalog import record_report
+from search_index import index_report
+from trends import update_trends
+from pipeline import PipelineRunner, Stage, StopPipeline, latest_run_id, new_run_id, prune_runs, run_exists
+import metrics
+
+# The network and templating stacks (feedparser, requests, Jinja2; openai is
+# deferred inside analyzer) are imported by the stages that use them, so
+# --help, resumed runs and --from-store runs skip whatever they do not need.
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+STAGE_NAMES = ["fetch", "select", "analyze", "lessons", "render", "save", "notify"]
+
+RUN_SECONDS = metrics.gauge("pipeline_run_seconds", "Wall time of the last pipeline run")
+RUN_STATUS = metrics.gauge("pipeline_last_run_success", "1 if the last pipeline run completed (or had nothing to do), else 0")
+RUN_TIMESTAMP = metrics.gauge("pipeline_last_run_timestamp_seconds", "When the last pipeline run finished")
+
+
+def build_stages(args) -> List[Stage]:
+    """The daily flow as checkpointed stages; save and notify both only need the rendered report."""
+    # Lesson requests the analyze stage started early, handed over to the lessons stage in-process
+    early_lessons = {}
+
+    def fetch(_):
+        # Step 1: Fetch Articles
+        if args.from_store:
+            from ingest import load_recent_articles
+            articles = load_recent_articles(hours=24)
+        else:
+            from fetcher import fetch_daily_news
+            articles = fetch_daily_news(use_cache=not args.no_feed_cache)
+        if not articles:
+            raise StopPipeline("No articles found in the last 24 hours. Exiting.")
+        return articles
+
+    def select(inputs):
+        # Step 1b: Drop already-analyzed articles and collapse duplicate coverage
+        articles = dedupe_articles(inputs["fetch"], skip_seen=not args.include_seen)
+        if not articles:
+            raise StopPipeline("No new articles since the last run. Exiting.")
+        # Step 1c: Rank locally so only the strongest candidates reach the LLM
+        return shortlist(articles, top_n=args.shortlist)
+
+    def analyze(inputs):
+        # Step 2: Analyze with DeepSeek
+        logging.info("Analyzing articles with DeepSeek API...")
+        if not os.getenv("DEEPSEEK_API_KEY") or os.getenv("DEEPSEEK_API_KEY") == "your_deepseek_api_key_here":
+            logging.error("Valid DEEPSEEK_API_KEY is required to proceed.")
+            raise StopPipeline("Stopping before analysis.")
+
+        # Lessons for the top attacks start as soon as each one is streamed, not after the full answer
+        early = None
+        if not args.lazy_lessons and args.lessons > 0:
+            early = early_lessons["analyze"] = EarlyLessons(args.lessons, use_cache=not args.no_llm_cache)
+
+        def on_attack(attack):
+            logging.info(f"Ranked #{attack.get('rank', '-')}: {attack.get('title')}")
+            if early:
+                early.add(attack)
+
+        def on_compacted(stats):
+            # Per-article token counts only with --profile; the totals are always logged
+            if args.profile:
+                logging.info(f"Prompt compaction per article (estimated tokens):\n{format_compaction(stats)}")
+
+        try:
+            analysis_result = analyze_news(
+                inputs["select"],
+                max_description_chars=args.max_description_chars,
+                token_budget=args.token_budget,
+                sharded=args.sharded,
+                use_cache=not args.no_llm_cache,
+                stream=not args.no_stream,
+                on_attack=on_attack,
+                on_compacted=on_compacted,
+            )
+            if not analysis_result or not analysis_result.get("top_10_attacks"):
+                logging.warning("DeepSeek API did not return any attacks.")
+                raise StopPipeline("Exiting.")
+        except BaseException:
+            if early:
+                early_lessons.pop("analyze").close()
+            raise
+        return analysis_result
+
+    def lessons(inputs):
+        # Step 2b: Teaching lessons, one concurrent request per selected attack
+        analysis_result = dict(inputs["analyze"])
+        if args.lazy_lessons:
+            analysis_result["lazy_lessons"] = args.lessons
+            logging.info(f"Lazy lessons enabled: the top {args.lessons} lessons are generated on demand by the Web UI")
+        else:
+            # Only set when this run's analyze stage streamed them; a resumed run generates them here
+            early = early_lessons.pop("analyze", None)
+            try:
+                analysis_result["lessons"] = generate_lessons(
+                    analysis_result["top_10_attacks"], count=args.lessons, use_cache=not args.no_llm_cache,
+                    early=early
+                )
+            finally:
+                if early:
+                    early.close()
+        return analysis_result
+
+    def render_stage(inputs):
+        # Step 3: Every output format is rendered from one normalized view of the report
+        from renderer import render_report
+        rendered = render_report(inputs["lessons"], args.date)
+        return rendered._asdict()
+
+    def save(inputs):
+        # Append the report to the archive served by the Web UI; it also becomes the latest report
+        analysis_result = inputs["lessons"]
+        archive = ReportArchive()
+        entry = archive.append(args.date, analysis_result)
+        archive.close()
+        logging.info(f"Daily analysis archived for {args.date} ({entry.length} bytes compressed) for Web UI")
+        record_report(args.date, analysis_result, entry.length)
+        index_report(args.date, analysis_result)
+        update_trends(args.date, analysis_result)
+
+        from renderer import write_snapshot_html
+        snapshot_path = write_snapshot_html(args.date, inputs["render"]["snapshot_html"])
+        logging.info(f"Static dashboard snapshot saved to {snapshot_path}")
+
+        if args.save_json:
+            with open("last_report.json", "w", encoding="utf-8") as f:
+                json.dump(analysis_result, f, indent=2)
+            logging.info("Analysis also saved to last_report.json")
+        return {"date": args.date, "bytes": entry.length, "snapshot": snapshot_path}
+
+    def notify(inputs):
+        analysis_result = inputs["lessons"]
+        if args.dry_run:
+            logging.info("DRY RUN MODE ENABLED. Generating HTML but not sending email.")
+            
+            # Save HTML to a file so it can be viewed locally
+            with open("dry_run_report.html", "w", encoding="utf-8") as f:
+                f.write(inputs["render"]["email_html"])
+            logging.info("Dry run HTML report saved to dry_run_report.html")
+            
+            # Also print a summary to console
+            print("\n--- DRY RUN SUMMARY ---")
+            for idx, attack in enumerate(analysis_result.get("top_10_attacks", [])):
+                print(f"{idx+1}. {attack.get('title')}")
+            print("-----------------------")
+            return {"dry_run": True}
+
+        # Notifications go through the durable outbox; delivery and retries happen in a separate drain
+        from renderer import report_context
+        from notifier import build_email_messages, build_telegram_messages
+        from outbox import enqueue, drain, spawn_drain
+        context = report_context(analysis_result, args.date)
+        messages = build_email_messages(analysis_result, context) + build_telegram_messages(analysis_result, context)
+        queued = enqueue(messages)
+        logging.info(f"Queued {queued} notifications ({len(messages) - queued} already sent or pending)")
+
+        # Only a real run consumes the articles; a dry run can be repeated for real. Only the
+        # stories forwarded to DeepSeek count as seen, articles the shortlist dropped stay eligible
+        mark_seen(inputs["select"])
+
+        if args.wait_delivery:
+            drain()
+        else:
+            spawn_drain()
+            logging.info("Delivery continues in the background (see cache/outbox.log, or run: python outbox.py --status)")
+        return {"queued": queued, "messages": len(messages)}
+
+    llm = {"use_cache": not args.no_llm_cache}
+    return [
+        Stage("fetch", (), {"from_store": args.from_store, "feed_cache": not args.no_feed_cache}, fetch),
+        Stage("select", ("fetch",), {"include_seen": args.include_seen, "shortlist": args.shortlist}, select),
+        Stage("analyze", ("select",), {"max_description_chars": args.max_description_chars,
+                                       "token_budget": args.token_budget, "sharded": args.sharded, **llm}, analyze),
+        Stage("lessons", ("analyze",), {"lessons": args.lessons, "lazy": args.lazy_lessons, **llm}, lessons),
+        Stage("render", ("lessons",), {"date": args.date}, render_stage),
+        Stage("save", ("lessons", "render"), {"date": args.date, "save_json": args.save_json}, save),
+        Stage("notify", ("select", "lessons", "render"), {"dry_run": args.dry_run}, notify),
+    ]
+
+
 def main():
     parser = argparse.ArgumentParser(description="Daily Cyber Attack Reporter and Lesson Generator")
     parser.add_argument("--dry-run", action="store_true", help="Print the report to the console instead of emailing it")
     parser.add_argument("--save-json", action="store_true", help="Save the DeepSeek response to a local JSON file")
+    parser.add_argument("--from-store", action="store_true", help="Read the last 24 hours from the ingestion daemon's article store instead of fetching feeds")
+    parser.add_argument("--include-seen", action="store_true", help="Also analyze articles that an earlier run already reported on")
+    parser.add_argument("--shortlist", type=int, default=SHORTLIST_SIZE, help="Forward only the N best locally ranked articles to DeepSeek (0 forwards all)")
+    parser.add_argument("--sharded", action="store_true", help="Analyze large article volumes as concurrent map requests over token-bounded shards plus one reduce request")
+    parser.add_argument("--lessons", type=int, default=LESSON_COUNT, help="Number of top-ranked attacks that get a teaching lesson")
+    parser.add_argument("--lazy-lessons", action="store_true", help="Skip lesson generation; the dashboard generates each lesson the first time it is opened")
+    parser.add_argument("--no-stream", action="store_true", help="Wait for the complete DeepSeek answer instead of streaming it")
+    parser.add_argument("--no-llm-cache", action="store_true", help="Always call DeepSeek, bypassing the on-disk response cache")
+    parser.add_argument("--token-budget", type=int, default=TOKEN_BUDGET, help="Hard cap on estimated prompt tokens for the article payload")
+    parser.add_argument("--max-description-chars", type=int, default=MAX_DESCRIPTION_CHARS, help="Truncate article descriptions to this many characters")
+    parser.add_argument("--no-feed-cache", action="store_true", help="Download every feed in full, ignoring cached ETag/Last-Modified validators")
+    parser.add_argument("--wait-delivery", action="store_true", help="Deliver queued notifications before exiting instead of in a background process")
+    parser.add_argument("--resume", nargs="?", const="latest", metavar="RUN_ID", help="Continue a run from its checkpoints in runs/ (default: the most recent run), re-running only failed or changed stages")
+    parser.add_argument("--from-stage", choices=STAGE_NAMES, help="Re-run this stage and every later one, reusing earlier checkpoints of the resumed run")
+    parser.add_argument("--profile", action="store_true", help="Print a per-stage timing breakdown (feeds, DeepSeek, notifications) at the end of the run, and log the per-article token counts of prompt compaction")
+    parser.add_argument("--profile-dump", metavar="PATH", help="Also run under cProfile and write the stats to PATH (open with python -m pstats PATH); only the main thread is profiled")
     args = parser.parse_args()
 
-    # Step 1: Fetch Articles
+    from dotenv import load_dotenv
+    load_dotenv()
+
     logging.info("Starting Daily Cyber Attack Reporter")
-    articles = fetch_daily_news()
-    
-    if not articles:
-        logging.info("No articles found in the last 24 hours. Exiting.")
-        return
+    if args.resume or args.from_stage:
+        run_id = latest_run_id() if args.resume in (None, "latest") else args.resume
+        if run_id is None:
+            sys.exit("No earlier run found in runs/ to resume.")
+        # A mistyped id must not silently start a fresh run under that name
+        if not run_exists(run_id):
+            sys.exit(f"No checkpoint for run {run_id} in runs/.")
+        logging.info(f"Resuming run {run_id}")
+    else:
+        run_id = new_run_id()
+        prune_runs(exclude=run_id)
 
-    # Step 2: Analyze with DeepSeek
-    logging.info("Analyzing articles with DeepSeek API...")
-    if not os.getenv("DEEPSEEK_API_KEY") or os.getenv("DEEPSEEK_API_KEY") == "your_deepseek_api_key_here":
-        logging.error("Valid DEEPSEEK_API_KEY is required to proceed.")
-        return
-        
-    analysis_result = analyze_news(articles)
-    
-    if not analysis_result or not analysis_result.get("top_10_attacks"):
-        logging.warning("DeepSeek API did not return any attacks. Exiting.")
+    runner = PipelineRunner(run_id)
+    # A resumed run keeps its original report date, even when it finishes after midnight
+    if "date" not in runner.meta:
+        runner.set_meta(date=datetime.now().strftime("%Y-%m-%d"))
+    args.date = runner.meta["date"]
+
+    profiler = None
+    if args.profile_dump:
+        import cProfile
+        profiler = cProfile.Profile()
+    started = time.perf_counter()
+    success = False
+    try:
+        if profiler:
+            profiler.enable()
+        runner.run(build_stages(args), from_stage=args.from_stage)
+        success = True
+    except StopPipeline as e:
+        success = True
+        logging.info(str(e))
         return
+    except Exception:
+        logging.error(f"Run {run_id} failed; fix the cause and continue with: python main.py --resume {run_id}")
+        raise
+    finally:
+        if profiler:
+            profiler.disable()
+        elapsed = time.perf_counter() - started
+        RUN_SECONDS.set(elapsed)
+        RUN_STATUS.set(1 if success else 0)
+        RUN_TIMESTAMP.set(time.time())
+        try:
+            metrics.write_textfile("pipeline")
+        except OSError as e:
+            logging.warning(f"Could not save run metrics: {e}")
+        if args.profile or profiler:
+            print_profile(runner, elapsed)
+        if profiler:
+            import pstats
+            profiler.dump_stats(args.profile_dump)
+            print(f"\ncProfile stats written to {args.profile_dump}; top functions by cumulative time:")
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
 
-    # Step 3: Handle Results
-    # Save JSON Report for the Web UI everyday
-    date_str = datetime.now().strftime("%Y-%m-%d")
-    report_path = os.path.join("reports", f"{date_str}.json")    
-    
-    with open(report_path, "w", encoding="utf-8") as f:
-        json.dump(analysis_result, f, indent=2)
-    logging.info(f"Daily analysis saved to {report_path} for Web UI")
-
-    # ALSO SAVE/OVERWRITE latest.json every run (for public "latest" page)
-    latest_path = os.path.join("reports", "latest.json")
-    with open(latest_path, "w", encoding="utf-8") as f:
-        json.dump(analysis_result, f, indent=2)
-    logging.info(f"Latest analysis saved to {latest_path}")
-    
-    
-    
-    if args.save_json:
-        with open("last_report.json", "w", encoding="utf-8") as f:
-            json.dump(analysis_result, f, indent=2)
-        logging.info("Analysis also saved to last_report.json")
-
-    if args.dry_run:
-        logging.info("DRY RUN MODE ENABLED. Generating HTML but not sending email.")
-        html = generate_html_report(analysis_result)
-        
-        # Save HTML to a file so it can be viewed locally
-        with open("dry_run_report.html", "w", encoding="utf-8") as f:
-            f.write(html)
-        logging.info("Dry run HTML report saved to dry_run_report.html")
-        
-        # Also print a summary to console
-        print("\n--- DRY RUN SUMMARY ---")
-        for idx, attack in enumerate(analysis_result.get("top_10_attacks", [])):
-            print(f"{idx+1}. {attack.get('title')}")
-        print("-----------------------")
-    else:
-        logging.info("Sending email report...")
-        
-        # Replace the `send_email_report` functionality internally with the actual implementation
-        # For security, the user must update their .env variables
-        send_email_report(analysis_result)
-        
-        logging.info("Sending Telegram notification...")
-        send_telegram_message(analysis_result)
-        
     logging.info("Process completed successfully.")
 
+
+def print_profile(runner: PipelineRunner, elapsed: float):
+    """Stage breakdown followed by the timers recorded inside the stages."""
+    print("\n--- PROFILE ---")
+    # Stages that run side by side overlap, so their shares can add up to more than 100%
+    print(f"{'stage':10} {'outcome':9} {'seconds':>9} {'share':>7}")
+    for name, outcome, seconds in runner.timings:
+        print(f"{name:10} {outcome:9} {seconds:>9.3f} {seconds / elapsed if elapsed else 0:>7.1%}")
+    print(f"{'total':10} {'':9} {elapsed:>9.3f}")
+    breakdown = metrics.format_breakdown()
+    if breakdown:
+        print()
+        print(breakdown)
+    print("---------------")
+
+
 if __name__ == "__main__":
     main()
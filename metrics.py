@@ -0,0 +1,281 @@
+import os
+import glob
+import json
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Tuple
+
+PREFIX = "cyberbot_"
+# Metric snapshots written by short-lived processes (main.py, the outbox drain) for /metrics to export
+METRICS_DIR = os.path.join("cache", "metrics")
+# Seconds; covers a fast local call up to a slow feed or a long DeepSeek answer
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str):
+        self.name = PREFIX + name
+        self.help = help
+        self._lock = threading.Lock()
+        self._values: Dict[LabelKey, Any] = {}
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        raise NotImplementedError
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    """A value that only goes up (requests made, articles fetched)."""
+    type = "counter"
+
+    def __init__(self, name: str, help: str):
+        super().__init__(name, help)
+        # The text format expects the _total suffix on the family name itself
+        self.name += "_total"
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, dict(key), value) for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    """A value that is set to its current level (last run time, items pending)."""
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, dict(key), value) for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    """Observations (usually durations in seconds) counted into cumulative buckets, plus their sum."""
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0}
+            state["counts"][index] += 1
+            state["sum"] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the wall time of the with-block, also when it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def summary(self) -> Dict[LabelKey, Tuple[int, float]]:
+        """(count, sum) per label set."""
+        with self._lock:
+            return {key: (sum(state["counts"]), state["sum"]) for key, state in self._values.items()}
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimates the q-quantile over all label sets, interpolating within buckets like histogram_quantile().
+
+        Returns None without observations; values in the +Inf bucket are
+        reported as the largest finite bound.
+        """
+        with self._lock:
+            counts = [sum(column) for column in zip(*(state["counts"] for state in self._values.values()))]
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        cumulative = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, counts):
+            if count and cumulative + count >= rank:
+                return lower + (bound - lower) * (rank - cumulative) / count
+            cumulative += count
+            lower = bound
+        return self.buckets[-1]
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, state in self._values.items():
+                labels = dict(key)
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), state["counts"]):
+                    cumulative += count
+                    samples.append((self.name + "_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+                samples.append((self.name + "_sum", labels, state["sum"]))
+                samples.append((self.name + "_count", labels, cumulative))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _get(self, cls, name: str, help: str, **kwargs) -> Any:
+        with self._lock:
+            metric = self._metrics.get(PREFIX + name)
+            if metric is None:
+                metric = self._metrics[PREFIX + name] = cls(name, help, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.type}")
+            return metric
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._get(Counter, name, help)
+
+    def gauge(self, name: str, help: str) -> Gauge:
+        return self._get(Gauge, name, help)
+
+    def histogram(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, buckets=buckets)
+
+    def metrics(self) -> List[_Metric]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def collect(self, **extra_labels) -> List[Dict[str, Any]]:
+        """Every metric family with samples, as plain data that can be written to and read from JSON."""
+        families = []
+        for metric in self.metrics():
+            samples = metric.samples()
+            if samples:
+                families.append({"name": metric.name, "type": metric.type, "help": metric.help,
+                                 "samples": [[name, {**extra_labels, **labels}, value]
+                                             for name, labels, value in samples]})
+        return families
+
+    def reset(self):
+        for metric in self.metrics():
+            metric.reset()
+
+
+# Process-wide registry used by every instrumented module
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+
+def write_textfile(job: str, metrics_dir: str = METRICS_DIR, registry: Registry = REGISTRY) -> str:
+    """
+    Saves the registry's samples as <metrics_dir>/<job>.json for the server's /metrics endpoint.
+
+    Short-lived processes call this before exiting; each job overwrites its
+    own file, so the export always reflects that job's most recent run.
+    """
+    os.makedirs(metrics_dir, exist_ok=True)
+    path = os.path.join(metrics_dir, f"{job}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"job": job, "written_at": time.time(), "families": registry.collect()}, f)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_textfiles(metrics_dir: str = METRICS_DIR) -> List[Dict[str, Any]]:
+    """
+    Reads every job file, labelling its samples with process="<job>".
+
+    The label is not called "job" so it cannot clash with the scrape target's
+    own job label. Unreadable files are skipped.
+    """
+    families = []
+    for path in sorted(glob.glob(os.path.join(metrics_dir, "*.json"))):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable metrics file {path}: {e}")
+            continue
+        job = snapshot.get("job") or os.path.splitext(os.path.basename(path))[0]
+        families.append({"name": PREFIX + "metrics_written_timestamp_seconds", "type": "gauge",
+                         "help": "When the process last saved its metrics",
+                         "samples": [[PREFIX + "metrics_written_timestamp_seconds", {"process": job},
+                                      snapshot.get("written_at", 0)]]})
+        for family in snapshot.get("families", []):
+            samples = [[name, {"process": job, **labels}, value] for name, labels, value in family["samples"]]
+            families.append({**family, "samples": samples})
+    return families
+
+
+def render_prometheus(families: List[Dict[str, Any]]) -> str:
+    """Prometheus text exposition format; families with the same name (from several jobs) are merged."""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for family in families:
+        target = merged.setdefault(family["name"], {**family, "samples": []})
+        target["samples"].extend(family["samples"])
+
+    lines = []
+    for family in merged.values():
+        lines.append(f"# HELP {family['name']} {family['help']}")
+        lines.append(f"# TYPE {family['name']} {family['type']}")
+        for name, labels, value in family["samples"]:
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def format_breakdown(registry: Registry = REGISTRY) -> str:
+    """A human-readable count / total / mean table of every histogram, for --profile."""
+    rows = []
+    for metric in registry.metrics():
+        if not isinstance(metric, Histogram):
+            continue
+        for key, (count, total) in sorted(metric.summary().items()):
+            labels = ",".join(f"{name}={value}" for name, value in key)
+            rows.append((f"{metric.name[len(PREFIX):]}{{{labels}}}" if labels else metric.name[len(PREFIX):],
+                         count, total))
+    if not rows:
+        return ""
+    width = max(len(row[0]) for row in rows)
+    lines = [f"{'timer':{width}} {'count':>7} {'total s':>9} {'mean ms':>9}"]
+    for name, count, total in rows:
+        lines.append(f"{name:{width}} {count:>7} {total:>9.3f} {total / count * 1000 if count else 0:>9.1f}")
+    return "\n".join(lines)
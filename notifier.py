@@ -2,128 +2,211 @@ import os
 import smtplib
 import logging
 from email.message import EmailMessage
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+
+import metrics
+
+# renderer (and Jinja2) is imported by the functions that build messages, so the
+# outbox drain, which only sends already rendered messages, starts without it
+
 
 def generate_html_report(data: Dict[str, Any]) -> str:
     """Generates an HTML report from the DeepSeek analyzed data."""
-    if not data or not data.get("top_10_attacks"):
-        return "<p>No significant cyber attacks were found in today's news.</p>"
+    from renderer import render, report_context, EMAIL_HTML_TEMPLATE
 
-    html = "<html><body>"
-    html += "<h2>Daily Top 10 Cyber Attacks Report</h2>"
-    
-    # Top 10 Table
-    html += "<table border='1' cellpadding='5' cellspacing='0'>"
-    html += "<tr style='background-color:#f2f2f2'><th>Rank</th><th>Title</th><th>Source</th><th>Summary</th></tr>"
-    
-    for attack in data.get("top_10_attacks", []):
-        html += f"<tr>"
-        html += f"<td>{attack.get('rank', '-')}</td>"
-        html += f"<td><a href='{attack.get('link', '#')}'>{attack.get('title', 'N/A')}</a></td>"
-        html += f"<td>{attack.get('source', 'N/A')}</td>"
-        html += f"<td>{attack.get('summary', 'N/A')}</td>"
-        html += f"</tr>"
-    
-    html += "</table><br><br>"
-    
-    # Teaching Lessons
-    html += "<h2>Teaching Lessons for Top 2 Attacks</h2>"
-    for lesson in data.get("lessons", []):
-        html += f"<div style='border:1px solid #ccc; padding:10px; margin-bottom:15px;'>"
-        html += f"<h3>Rank #{lesson.get('rank', '-')} - {lesson.get('title', 'N/A')}</h3>"
-        
-        html += "<h4>Learning Objectives:</h4><ul>"
-        for obj in lesson.get("learning_objectives", []):
-            html += f"<li>{obj}</li>"
-        html += "</ul>"
-        
-        html += f"<h4>Real-World Impact:</h4><p>{lesson.get('real_world_impact', 'N/A')}</p>"
-        
-        html += "<h4>Mitigation Strategies:</h4><ul>"
-        for strategy in lesson.get("mitigation_strategies", []):
-            html += f"<li>{strategy}</li>"
-        html += "</ul>"
-        
-        html += "<h4>Discussion Questions:</h4><ul>"
-        for qs in lesson.get("discussion_questions", []):
-            html += f"<li>{qs}</li>"
-        html += "</ul>"
-        html += "</div>"
-        
-    html += "</body></html>"
-    return html
-
-def send_email_report(data: Dict[str, Any]):
-    """Sends the formatted HTML report via SMTP."""
-    smtp_server = os.getenv("SMTP_SERVER")
-    smtp_port = int(os.getenv("SMTP_PORT", "587"))
-    smtp_user = os.getenv("SMTP_USERNAME")
-    smtp_pass = os.getenv("SMTP_PASSWORD")
-    receiver_email = os.getenv("RECEIVER_EMAIL")
-    
-    if not all([smtp_server, smtp_user, smtp_pass, receiver_email]):
+    return render(EMAIL_HTML_TEMPLATE, report_context(data))
+
+
+EMAIL_SUBJECT = "Daily Cyber Attack Report & Teaching Lessons"
+SMTP_TIMEOUT = 30
+TELEGRAM_API_URL = "https://api.telegram.org"
+TELEGRAM_TIMEOUT = 15
+
+SEND_SECONDS = metrics.histogram("notification_send_seconds", "Time to hand one message to SMTP or the Telegram API")
+SENDS = metrics.counter("notification_sends", "Send attempts by channel and outcome (ok, rejected, error)")
+SMTP_CONNECT_SECONDS = metrics.histogram("smtp_connect_seconds", "SMTP connect, STARTTLS and login time")
+
+
+class PermanentDeliveryError(Exception):
+    """A message was rejected in a way that retrying cannot fix (bad recipient, bad request)."""
+
+
+def _env_list(name: str) -> List[str]:
+    return [value.strip() for value in os.getenv(name, "").split(",") if value.strip()]
+
+
+def smtp_sender() -> Optional[str]:
+    """The From address: SMTP_FROM, else SMTP_USERNAME, else None."""
+    return os.getenv("SMTP_FROM") or os.getenv("SMTP_USERNAME") or None
+
+
+def build_email_messages(data: Dict[str, Any], context: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    Returns one personalized outbox message per address in RECEIVER_EMAIL (comma separated).
+
+    Pass the report_context() already built for the report to skip normalizing it again.
+    """
+    from renderer import render_emails, report_context
+
+    recipients = _env_list("RECEIVER_EMAIL")
+    if not os.getenv("SMTP_SERVER") or not recipients:
         logging.error("Missing required SMTP environment variables. Email will not be sent.")
-        return
-        
-    html_content = generate_html_report(data)
-    
-    msg = EmailMessage()
-    msg['Subject'] = "Daily Cyber Attack Report & Teaching Lessons"
-    msg['From'] = smtp_user
-    msg['To'] = receiver_email
-    
-    msg.add_alternative(html_content, subtype='html')
-    
-    try:
-        logging.info(f"Connecting to SMTP server {smtp_server}:{smtp_port}...")
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(smtp_user, smtp_pass)
-            server.send_message(msg)
-        logging.info(f"Report successfully sent to {receiver_email}")
-    except Exception as e:
-        logging.error(f"Failed to send email: {e}")
-
-def send_telegram_message(data: Dict[str, Any]):
-    """Sends a summary report via Telegram Bot."""
-    import requests
+        return []
+    if not smtp_sender():
+        logging.warning("Neither SMTP_FROM nor SMTP_USERNAME is set, so there is no sender address. Email will not be sent.")
+        return []
+
+    emails = render_emails(context or report_context(data), recipients)
+    return [{"channel": "email", "recipient": recipient, "subject": EMAIL_SUBJECT,
+             "body": email["html"], "text_body": email["text"]}
+            for recipient, email in emails.items()]
+
+
+def build_telegram_text(data: Dict[str, Any], context: Optional[Dict[str, Any]] = None) -> str:
+    """Creates the concise Markdown summary sent over Telegram."""
+    from renderer import render, report_context, TELEGRAM_TEMPLATE
+
+    return render(TELEGRAM_TEMPLATE, context or report_context(data))
+
+
+def build_telegram_messages(data: Dict[str, Any], context: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Returns one outbox message per chat in TELEGRAM_CHAT_ID (comma separated)."""
     bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
-    chat_id = os.getenv("TELEGRAM_CHAT_ID")
+    chat_ids = _env_list("TELEGRAM_CHAT_ID")
     
-    if not bot_token or not chat_id or bot_token == "your_telegram_bot_token_here":
+    if not bot_token or not chat_ids or bot_token == "your_telegram_bot_token_here":
         logging.error("Missing valid TELEGRAM_BOT_TOKEN or TELEGRAM_CHAT_ID. Telegram message will not be sent.")
-        return
+        return []
 
-    # Create a concise summary for Telegram
-    message = "🚨 *Daily Cyber Attack Report* 🚨\n\n"
-    
-    top_attacks = data.get("top_10_attacks", [])
-    if not top_attacks:
-        message += "No significant cyber attacks were found in today's news."
-    else:
-        message += f"Found {len(top_attacks)} critical threats today.\n\n*Top 3 Threats:*\n"
-        for i, attack in enumerate(top_attacks[:3]):
-            message += f"{i+1}. [{attack.get('title')}]({attack.get('link')})\n"
-            
-        message += "\n*Lessons Generated:* "
-        message += "Yes ✅\n" if data.get("lessons") else "No ❌\n"
-        
-        message += "\nDashboard updated. Please check the Web UI or your email for the full report and teaching lessons!"
-
-    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-    payload = {
-        "chat_id": chat_id,
-        "text": message,
-        "parse_mode": "Markdown",
-        "disable_web_page_preview": True
-    }
-    
-    try:
-        response = requests.post(url, json=payload)
-        response.raise_for_status()
-        logging.info("Telegram notification sent successfully.")
-    except Exception as e:
-        logging.error(f"Failed to send Telegram message: {e}")
+    text = build_telegram_text(data, context)
+    return [{"channel": "telegram", "recipient": chat_id, "subject": "", "body": text} for chat_id in chat_ids]
+
+
+def _measured_send(channel: str, send, message: Dict[str, Any]):
+    with SEND_SECONDS.time(channel=channel):
+        try:
+            send(message)
+        except PermanentDeliveryError:
+            SENDS.inc(channel=channel, outcome="rejected")
+            raise
+        except Exception:
+            SENDS.inc(channel=channel, outcome="error")
+            raise
+    SENDS.inc(channel=channel, outcome="ok")
+
+
+class SMTPSender:
+    """
+    One authenticated SMTP session, reused for every message sent through it.
+
+    Configured from SMTP_SERVER, SMTP_PORT, SMTP_USERNAME / SMTP_PASSWORD
+    (login is skipped when unset), SMTP_FROM (defaults to the username) and
+    SMTP_STARTTLS (default true; set to false for local test servers).
+    """
+
+    def __init__(self):
+        self.host = os.getenv("SMTP_SERVER")
+        self.port = int(os.getenv("SMTP_PORT", "587"))
+        self.username = os.getenv("SMTP_USERNAME")
+        self.password = os.getenv("SMTP_PASSWORD")
+        self.sender = smtp_sender()
+        self.starttls = os.getenv("SMTP_STARTTLS", "true").lower() not in ("0", "false", "no")
+        self._smtp = None
+
+    def _connect(self):
+        logging.info(f"Connecting to SMTP server {self.host}:{self.port}...")
+        with SMTP_CONNECT_SECONDS.time():
+            smtp = smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT)
+            try:
+                if self.starttls:
+                    smtp.starttls()
+                if self.username and self.password:
+                    smtp.login(self.username, self.password)
+            except Exception:
+                smtp.close()
+                raise
+        self._smtp = smtp
+
+    def send(self, message: Dict[str, Any]):
+        _measured_send("email", self._send, message)
+
+    def _send(self, message: Dict[str, Any]):
+        msg = EmailMessage()
+        msg['Subject'] = message["subject"]
+        msg['From'] = self.sender
+        msg['To'] = message["recipient"]
+        if message.get("text_body"):
+            msg.set_content(message["text_body"])
+        msg.add_alternative(message["body"], subtype='html')
+
+        for attempt in (1, 2):
+            if self._smtp is None:
+                self._connect()
+            try:
+                self._smtp.send_message(msg)
+                return
+            except smtplib.SMTPServerDisconnected:
+                # The server dropped an idle session; reconnect once before giving up
+                self._smtp = None
+                if attempt == 2:
+                    raise
+            except smtplib.SMTPRecipientsRefused as e:
+                # 4xx replies (mailbox busy, greylisting) are worth retrying, 5xx are not
+                if all(code >= 500 for code, _ in e.recipients.values()):
+                    raise PermanentDeliveryError(str(e))
+                raise
+            except smtplib.SMTPSenderRefused as e:
+                if e.smtp_code >= 500:
+                    raise PermanentDeliveryError(str(e))
+                raise
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                self._smtp.close()
+            self._smtp = None
+
+
+class TelegramSender:
+    """Sends Bot API messages over one keep-alive HTTP session (TELEGRAM_API_URL overrides the host)."""
+
+    def __init__(self, pool_size: int = 4):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
+        self.api_url = os.getenv("TELEGRAM_API_URL", TELEGRAM_API_URL).rstrip("/")
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def send(self, message: Dict[str, Any]):
+        _measured_send("telegram", self._send, message)
+
+    def _send(self, message: Dict[str, Any]):
+        payload = {
+            "chat_id": message["recipient"],
+            "text": message["body"],
+            "parse_mode": "Markdown",
+            "disable_web_page_preview": True
+        }
+        try:
+            response = self.session.post(f"{self.api_url}/bot{self.bot_token}/sendMessage", json=payload,
+                                         timeout=TELEGRAM_TIMEOUT)
+        except Exception as e:
+            # Request errors quote the URL, which contains the bot token
+            raise ConnectionError(str(e).replace(self.bot_token, "<token>")) from None
+        # Rate limits and server errors are worth retrying, other client errors are not
+        if 400 <= response.status_code < 500 and response.status_code != 429:
+            raise PermanentDeliveryError(f"Telegram rejected the message: {response.status_code} {response.text[:200]}")
+        if response.status_code >= 400:
+            raise ConnectionError(f"Telegram API returned {response.status_code}")
+
+    def close(self):
+        self.session.close()
 
 if __name__ == "__main__":
     # Test HTML Generation
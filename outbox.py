@@ -0,0 +1,277 @@
+import os
+import sys
+import time
+import random
+import sqlite3
+import hashlib
+import logging
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+
+from notifier import SMTPSender, TelegramSender, PermanentDeliveryError
+import metrics
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+OUTBOX_PATH = os.path.join("cache", "outbox.db")
+# Output of detached drain processes, which have no terminal to log to
+OUTBOX_LOG_PATH = os.path.join("cache", "outbox.log")
+MAX_ATTEMPTS = 6
+# Seconds before the first retry; doubles per attempt up to MAX_BACKOFF
+RETRY_BACKOFF = 30.0
+MAX_BACKOFF = 900.0
+# Authenticated SMTP sessions opened per batch; each one sends many messages
+SMTP_CONNECTIONS = 2
+TELEGRAM_CONCURRENCY = 4
+BATCH_SIZE = 100
+# A message claimed by a drain that died is handed out again after this many seconds
+CLAIM_LEASE = 300
+
+OUTBOX_MESSAGES = metrics.gauge("outbox_messages", "Outbox messages per status after the last drain")
+
+
+def connect(path: str = OUTBOX_PATH) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            channel TEXT NOT NULL,
+            recipient TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            body TEXT NOT NULL,
+            text_body TEXT NOT NULL DEFAULT '',
+            dedupe_key TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            claimed_at REAL,
+            last_error TEXT,
+            created_at REAL NOT NULL,
+            sent_at REAL
+        );
+        CREATE INDEX IF NOT EXISTS messages_due ON messages (status, next_attempt_at);
+        CREATE INDEX IF NOT EXISTS messages_dedupe ON messages (dedupe_key);
+    """)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(messages)")}
+    if "text_body" not in columns:
+        # Outboxes created before plain-text alternatives existed
+        conn.execute("ALTER TABLE messages ADD COLUMN text_body TEXT NOT NULL DEFAULT ''")
+    return conn
+
+
+def _dedupe_key(message: Dict[str, Any]) -> str:
+    digest = hashlib.sha256()
+    for field in ("channel", "recipient", "subject", "body"):
+        digest.update(message.get(field, "").encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:32]
+
+
+def enqueue(messages: List[Dict[str, Any]], path: str = OUTBOX_PATH) -> int:
+    """
+    Stores messages for delivery and returns how many were added.
+
+    Each message has channel, recipient, subject, body and optionally text_body.
+
+    A message identical to one already queued or sent is skipped, so re-running
+    the pipeline on the same report does not notify anyone twice.
+    """
+    now = time.time()
+    added = 0
+    conn = connect(path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        for message in messages:
+            key = _dedupe_key(message)
+            if conn.execute("SELECT 1 FROM messages WHERE dedupe_key = ? AND status != 'failed'", (key,)).fetchone():
+                continue
+            conn.execute(
+                "INSERT INTO messages (channel, recipient, subject, body, text_body, dedupe_key, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (message["channel"], message["recipient"], message.get("subject", ""), message["body"],
+                 message.get("text_body", ""), key, now, now)
+            )
+            added += 1
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+    return added
+
+
+def _claim(conn: sqlite3.Connection, limit: int = BATCH_SIZE) -> List[Dict[str, Any]]:
+    """Atomically takes up to limit due messages, so concurrent drains never send the same one."""
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = conn.execute(
+            "SELECT id, channel, recipient, subject, body, text_body, attempts FROM messages "
+            "WHERE (status = 'pending' AND next_attempt_at <= ?) OR (status = 'sending' AND claimed_at < ?) "
+            "ORDER BY id LIMIT ?",
+            (now, now - CLAIM_LEASE, limit)
+        ).fetchall()
+        conn.executemany("UPDATE messages SET status = 'sending', claimed_at = ? WHERE id = ?",
+                         [(now, row[0]) for row in rows])
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return [dict(zip(("id", "channel", "recipient", "subject", "body", "text_body", "attempts"), row)) for row in rows]
+
+
+def _record(conn: sqlite3.Connection, message: Dict[str, Any], error: Optional[str], permanent: bool) -> str:
+    now = time.time()
+    if error is None:
+        conn.execute("UPDATE messages SET status = 'sent', sent_at = ?, last_error = NULL WHERE id = ?",
+                     (now, message["id"]))
+        return "sent"
+
+    attempts = message["attempts"] + 1
+    if permanent or attempts >= MAX_ATTEMPTS:
+        conn.execute("UPDATE messages SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+                     (attempts, error, message["id"]))
+        logging.error(f"Giving up on {message['channel']} message to {message['recipient']}: {error}")
+        return "failed"
+
+    # Exponential backoff with jitter, so a recovering server is not hit by every message at once
+    delay = min(MAX_BACKOFF, RETRY_BACKOFF * 2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+    conn.execute("UPDATE messages SET status = 'pending', attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                 (attempts, now + delay, error, message["id"]))
+    logging.warning(f"{message['channel']} message to {message['recipient']} failed "
+                    f"(attempt {attempts}/{MAX_ATTEMPTS}), retrying in {delay:.0f}s: {error}")
+    return "retrying"
+
+
+def _send_email_chunk(messages: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], Optional[str], bool]]:
+    """Sends messages over one SMTP session. A broken session defers the rest of the chunk."""
+    results = []
+    sender = SMTPSender()
+    try:
+        for i, message in enumerate(messages):
+            try:
+                sender.send(message)
+                results.append((message, None, False))
+            except PermanentDeliveryError as e:
+                results.append((message, str(e), True))
+            except Exception as e:
+                results.extend((m, f"{type(e).__name__}: {e}", False) for m in messages[i:])
+                break
+    finally:
+        sender.close()
+    return results
+
+
+def _send_telegram(sender: TelegramSender, message: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[str], bool]:
+    try:
+        sender.send(message)
+        return message, None, False
+    except PermanentDeliveryError as e:
+        return message, str(e), True
+    except Exception as e:
+        return message, f"{type(e).__name__}: {e}", False
+
+
+def deliver(messages: List[Dict[str, Any]], smtp_connections: int = SMTP_CONNECTIONS,
+            telegram_concurrency: int = TELEGRAM_CONCURRENCY) -> List[Tuple[Dict[str, Any], Optional[str], bool]]:
+    """Sends a batch concurrently. Returns (message, error or None, permanent) per message."""
+    emails = [m for m in messages if m["channel"] == "email"]
+    telegrams = [m for m in messages if m["channel"] == "telegram"]
+    unknown = [(m, f"Unknown channel {m['channel']!r}", True) for m in messages
+               if m["channel"] not in ("email", "telegram")]
+
+    # Emails are dealt round-robin onto a few long-lived SMTP sessions
+    chunks = [emails[i::smtp_connections] for i in range(min(smtp_connections, len(emails)))]
+    telegram_sender = TelegramSender(pool_size=telegram_concurrency) if telegrams else None
+
+    results = list(unknown)
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, len(chunks) + telegram_concurrency)) as executor:
+            chunk_futures = [executor.submit(_send_email_chunk, chunk) for chunk in chunks]
+            telegram_futures = [executor.submit(_send_telegram, telegram_sender, m) for m in telegrams]
+            for future in chunk_futures:
+                results.extend(future.result())
+            results.extend(future.result() for future in telegram_futures)
+    finally:
+        if telegram_sender is not None:
+            telegram_sender.close()
+    return results
+
+
+def drain(path: str = OUTBOX_PATH, wait: bool = True) -> Dict[str, int]:
+    """
+    Delivers every due message, retrying failures with exponential backoff.
+
+    With wait=True it sleeps until scheduled retries are due and returns once
+    nothing is pending; otherwise it returns after one pass over due messages.
+    """
+    stats = {"sent": 0, "failed": 0, "retrying": 0}
+    conn = connect(path)
+    try:
+        while True:
+            batch = _claim(conn)
+            if batch:
+                results = deliver(batch)
+                conn.execute("BEGIN IMMEDIATE")
+                for message, error, permanent in results:
+                    outcome = _record(conn, message, error, permanent)
+                    if outcome != "retrying":
+                        stats[outcome] += 1
+                conn.execute("COMMIT")
+                continue
+
+            next_due = conn.execute("SELECT MIN(next_attempt_at) FROM messages WHERE status = 'pending'").fetchone()[0]
+            if next_due is None or not wait:
+                break
+            time.sleep(max(0.0, next_due - time.time()))
+        stats["retrying"] = conn.execute("SELECT COUNT(*) FROM messages WHERE status = 'pending'").fetchone()[0]
+    finally:
+        conn.close()
+
+    logging.info(f"Outbox drained: {stats['sent']} sent, {stats['failed']} failed, {stats['retrying']} awaiting retry")
+    return stats
+
+
+def spawn_drain(path: str = OUTBOX_PATH) -> subprocess.Popen:
+    """Starts a detached process that drains the outbox, so the caller can exit right away."""
+    os.makedirs(os.path.dirname(OUTBOX_LOG_PATH) or ".", exist_ok=True)
+    log = open(OUTBOX_LOG_PATH, "a", encoding="utf-8")
+    kwargs = {}
+    if os.name == "nt":
+        kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+    try:
+        return subprocess.Popen([sys.executable, os.path.abspath(__file__), "--path", path],
+                                stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT, **kwargs)
+    finally:
+        log.close()
+
+
+def outbox_status(path: str = OUTBOX_PATH) -> Dict[str, int]:
+    conn = connect(path)
+    try:
+        return dict(conn.execute("SELECT status, COUNT(*) FROM messages GROUP BY status").fetchall())
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="Deliver queued email and Telegram notifications")
+    parser.add_argument("--path", default=OUTBOX_PATH, help="Outbox database")
+    parser.add_argument("--no-wait", action="store_true", help="Make one pass over due messages instead of waiting for retries")
+    parser.add_argument("--status", action="store_true", help="Print message counts per status and exit")
+    args = parser.parse_args()
+
+    load_dotenv()
+    if args.status:
+        print(outbox_status(args.path))
+    else:
+        drain(args.path, wait=not args.no_wait)
+        for status, count in outbox_status(args.path).items():
+            OUTBOX_MESSAGES.set(count, status=status)
+        metrics.write_textfile("outbox")
@@ -0,0 +1,239 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import threading
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Callable, NamedTuple, Tuple
+import metrics
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+RUNS_DIR = "runs"
+MANIFEST_NAME = "manifest.json"
+RUN_RETENTION = 30          # Newest runs always kept in runs/
+RUN_RETENTION_DAYS = 14     # Older runs are kept while their last write is this recent
+
+STAGE_SECONDS = metrics.histogram("pipeline_stage_seconds", "Run time of each executed pipeline stage")
+STAGE_RESULTS = metrics.counter("pipeline_stages", "Stages by outcome (done, reused, stopped, failed)")
+
+
+class StopPipeline(Exception):
+    """Raised by a stage when there is nothing for later stages to do (e.g. no new articles)."""
+
+
+class Stage(NamedTuple):
+    name: str
+    # Names of the stages whose outputs this stage consumes
+    inputs: Tuple[str, ...]
+    # Settings that change the stage's output; part of its cache key
+    params: Dict[str, Any]
+    # Called with {input name: output} and returns this stage's JSON-serializable output
+    run: Callable[[Dict[str, Any]], Any]
+
+
+def content_hash(value: Any) -> str:
+    encoded = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def latest_run_id(runs_dir: str = RUNS_DIR) -> Optional[str]:
+    if not os.path.isdir(runs_dir):
+        return None
+    runs = sorted(name for name in os.listdir(runs_dir)
+                  if os.path.isfile(os.path.join(runs_dir, name, MANIFEST_NAME)))
+    return runs[-1] if runs else None
+
+
+def run_exists(run_id: str, runs_dir: str = RUNS_DIR) -> bool:
+    """Whether run_id has a manifest to resume from."""
+    return os.path.isfile(os.path.join(runs_dir, run_id, MANIFEST_NAME))
+
+
+def new_run_id() -> str:
+    return datetime.now().strftime("%Y-%m-%d-%H%M%S")
+
+
+def prune_runs(keep: int = RUN_RETENTION, retention_days: float = RUN_RETENTION_DAYS,
+               runs_dir: str = RUNS_DIR, exclude: Optional[str] = None) -> int:
+    """
+    Deletes run directories beyond the newest `keep` that were last written more than
+    retention_days ago, never touching `exclude`. Returns how many were removed.
+    """
+    if not os.path.isdir(runs_dir):
+        return 0
+    runs = sorted((name for name in os.listdir(runs_dir) if os.path.isdir(os.path.join(runs_dir, name))),
+                  reverse=True)
+    cutoff = time.time() - retention_days * 24 * 60 * 60
+    removed = 0
+    for name in runs[keep:]:
+        path = os.path.join(runs_dir, name)
+        if name == exclude or _last_write(path) >= cutoff:
+            continue
+        try:
+            shutil.rmtree(path)
+            removed += 1
+        except OSError as e:
+            logging.warning(f"Could not remove old run {path}: {e}")
+    if removed:
+        logging.info(f"Pruned {removed} old runs from {runs_dir}/")
+    return removed
+
+
+def _last_write(run_dir: str) -> float:
+    # A resumed run rewrites its manifest, so an old run id can still be in use
+    manifest_path = os.path.join(run_dir, MANIFEST_NAME)
+    return os.path.getmtime(manifest_path if os.path.exists(manifest_path) else run_dir)
+
+
+class PipelineRunner:
+    """
+    Runs stages in dependency order and checkpoints each output as a content-hashed artifact.
+
+    Every stage gets a key from its name, params and the hashes of its
+    inputs. The output is stored as runs/<run_id>/<stage>-<hash>.json and
+    recorded in the run's manifest. A stage whose key matches the manifest
+    is skipped and its artifact reused, so resuming a run only executes what
+    failed or what changed. Stages whose inputs are all ready run
+    concurrently.
+    """
+
+    def __init__(self, run_id: str, runs_dir: str = RUNS_DIR):
+        self.run_id = run_id
+        self.run_dir = os.path.join(runs_dir, run_id)
+        self.manifest_path = os.path.join(self.run_dir, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        # (stage, outcome, seconds) in completion order, for --profile
+        self.timings: List[Tuple[str, str, float]] = []
+        os.makedirs(self.run_dir, exist_ok=True)
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {"run_id": self.run_id, "created_at": datetime.now().isoformat(), "meta": {}, "stages": {}}
+
+    def _save_manifest(self):
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    @property
+    def meta(self) -> Dict[str, Any]:
+        """Run-level values (such as the report date) that must stay fixed when the run is resumed."""
+        return self.manifest["meta"]
+
+    def set_meta(self, **values):
+        with self._lock:
+            self.manifest["meta"].update(values)
+            self._save_manifest()
+
+    def _stage_key(self, stage: Stage, input_hashes: Dict[str, str]) -> str:
+        return content_hash({"stage": stage.name, "params": stage.params, "inputs": input_hashes})[:16]
+
+    def _cached(self, stage: Stage, key: str) -> Optional[Tuple[str, Any]]:
+        record = self.manifest["stages"].get(stage.name)
+        if not record or record.get("status") != "done" or record.get("key") != key:
+            return None
+        path = os.path.join(self.run_dir, record["artifact"])
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return record["output_hash"], json.load(f)
+
+    def _record(self, stage: Stage, **fields):
+        with self._lock:
+            self.manifest["stages"][stage.name] = {**self.manifest["stages"].get(stage.name, {}), **fields}
+            self._save_manifest()
+
+    def _execute(self, stage: Stage, inputs: Dict[str, Any], key: str) -> Tuple[str, Any]:
+        logging.info(f"[{stage.name}] running")
+        self._record(stage, status="running", key=key, started_at=datetime.now().isoformat(), error=None)
+        started = time.perf_counter()
+        try:
+            output = stage.run(inputs)
+        except StopPipeline as e:
+            self._finish(stage, "stopped", started, error=str(e))
+            raise
+        except Exception as e:
+            self._finish(stage, "failed", started, error=f"{type(e).__name__}: {e}")
+            raise
+
+        output_hash = content_hash(output)
+        artifact = f"{stage.name}-{output_hash[:12]}.json"
+        tmp_path = os.path.join(self.run_dir, f"{artifact}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(output, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(self.run_dir, artifact))
+        self._finish(stage, "done", started, output_hash=output_hash, artifact=artifact)
+        return output_hash, output
+
+    def _finish(self, stage: Stage, status: str, started: float, **fields):
+        seconds = time.perf_counter() - started
+        STAGE_SECONDS.observe(seconds, stage=stage.name)
+        STAGE_RESULTS.inc(stage=stage.name, outcome=status)
+        with self._lock:
+            self.timings.append((stage.name, status, seconds))
+        self._record(stage, status=status, seconds=round(seconds, 3), finished_at=datetime.now().isoformat(),
+                     **fields)
+
+    def run(self, stages: List[Stage], from_stage: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Runs the stages and returns the output of every stage.
+
+        Stages from from_stage onwards (in list order) are re-run even if
+        their key is unchanged. Raises StopPipeline when a stage ends the
+        run early, and re-raises the first stage failure.
+        """
+        names = [stage.name for stage in stages]
+        for stage in stages:
+            unknown = [name for name in stage.inputs if name not in names]
+            if unknown:
+                raise ValueError(f"Stage {stage.name} depends on unknown stages {unknown}")
+        if from_stage is not None and from_stage not in names:
+            raise ValueError(f"Unknown stage {from_stage!r}; choose one of {names}")
+        forced = set(names[names.index(from_stage):]) if from_stage else set()
+
+        hashes: Dict[str, str] = {}
+        outputs: Dict[str, Any] = {}
+        pending = list(stages)
+        while pending:
+            ready = [stage for stage in pending if all(name in outputs for name in stage.inputs)]
+            if not ready:
+                raise ValueError(f"Stages {[stage.name for stage in pending]} have unsatisfiable inputs")
+            pending = [stage for stage in pending if stage not in ready]
+
+            jobs = []
+            for stage in ready:
+                key = self._stage_key(stage, {name: hashes[name] for name in stage.inputs})
+                cached = None if stage.name in forced else self._cached(stage, key)
+                if cached is not None:
+                    logging.info(f"[{stage.name}] unchanged, reusing {self.manifest['stages'][stage.name]['artifact']}")
+                    hashes[stage.name], outputs[stage.name] = cached
+                    STAGE_RESULTS.inc(stage=stage.name, outcome="reused")
+                    self.timings.append((stage.name, "reused", 0.0))
+                else:
+                    jobs.append((stage, {name: outputs[name] for name in stage.inputs}, key))
+
+            if len(jobs) == 1:
+                stage, inputs, key = jobs[0]
+                hashes[stage.name], outputs[stage.name] = self._execute(stage, inputs, key)
+            elif jobs:
+                # Independent stages (e.g. saving and notifying) run side by side
+                with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+                    futures = [(stage, executor.submit(self._execute, stage, inputs, key))
+                               for stage, inputs, key in jobs]
+                    errors = []
+                    for stage, future in futures:
+                        try:
+                            hashes[stage.name], outputs[stage.name] = future.result()
+                        except Exception as e:
+                            errors.append(e)
+                if errors:
+                    raise errors[0]
+        return outputs
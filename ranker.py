@@ -0,0 +1,168 @@
+import re
+import logging
+from typing import List, Dict, Any, TYPE_CHECKING
+
+from compactor import strip_markup
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# How many locally ranked candidates are forwarded to DeepSeek
+SHORTLIST_SIZE = 40
+
+CVE_RE = re.compile(r"\bCVE-\d{4}-\d{4,7}\b", re.IGNORECASE)
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+
+# Named threat actors, ransomware crews and malware families (lowercase, matched on word boundaries)
+THREAT_ACTORS = [
+    "apt28", "apt29", "apt31", "apt41", "fancy bear", "cozy bear", "lazarus", "kimsuky", "andariel",
+    "sandworm", "turla", "volt typhoon", "salt typhoon", "flax typhoon", "silk typhoon", "midnight blizzard",
+    "scattered spider", "lapsus", "fin7", "fin8", "ta505", "unc3886", "muddywater", "charming kitten",
+    "lockbit", "blackcat", "alphv", "cl0p", "clop", "conti", "black basta", "akira", "play ransomware",
+    "rhysida", "royal", "blacksuit", "medusa", "bianlian", "8base", "qilin", "ransomhub", "hunters international",
+    "emotet", "qakbot", "qbot", "trickbot", "icedid", "lumma", "redline", "raccoon", "agent tesla",
+    "cobalt strike", "sliver", "mirai", "plugx", "shadowpad", "darkgate", "pikabot", "latrodectus",
+]
+
+# Vendors and products that identify what an advisory is about (lowercase, matched on word boundaries).
+# Platform-wide names (Microsoft, Windows, Linux, Android) are left out: they are shared by unrelated stories.
+VENDORS = [
+    "outlook", "sharepoint", "azure", "chrome", "safari", "cisco", "ios xe", "fortinet", "fortios", "fortigate",
+    "fortisiem", "fortimanager", "ivanti", "citrix", "netscaler", "vmware", "esxi", "vcenter",
+    "palo alto networks", "pan-os", "juniper", "sonicwall", "f5", "big-ip", "check point", "sophos", "barracuda",
+    "zyxel", "d-link", "tp-link", "netgear", "qnap", "synology", "atlassian", "confluence", "jira", "gitlab",
+    "jenkins", "log4j", "openssl", "openssh", "oracle", "sap", "adobe", "moveit", "solarwinds", "connectwise",
+    "screenconnect", "kaseya", "okta", "cloudflare", "crowdstrike", "veeam", "zimbra", "wordpress", "samsung",
+    "firefox", "xz", "trend micro", "papercut", "jetbrains", "teamcity", "snowflake",
+]
+
+# Severity keywords and their weights; multi-word entries are matched as bigrams
+SEVERITY_KEYWORDS = {
+    "zero-day": 3.0, "0-day": 3.0, "actively exploited": 3.0, "exploited": 1.5, "the wild": 2.0,
+    "remote code": 2.5, "code execution": 2.5, "rce": 2.5, "critical": 2.0, "ransomware": 2.5,
+    "supply chain": 2.5, "breach": 2.0, "data breach": 2.5, "leak": 1.5, "stolen": 1.5, "backdoor": 2.0,
+    "botnet": 1.5, "espionage": 2.0, "state-sponsored": 2.0, "nation-state": 2.0, "wiper": 2.5,
+    "ddos": 1.5, "extortion": 2.0, "infostealer": 1.5, "malware": 1.0, "vulnerability": 1.0,
+    "privilege escalation": 1.5, "authentication bypass": 2.0, "emergency": 1.5, "kev": 2.0,
+    "phishing": 1.0, "hijack": 1.5, "compromised": 1.5, "outage": 1.5,
+}
+
+# Weights of the individual signals in the final score
+WEIGHT_KEYWORDS = 1.0
+WEIGHT_CVE = 1.5
+WEIGHT_ACTOR = 2.0
+WEIGHT_COVERAGE = 1.0
+WEIGHT_CENTRALITY = 2.0
+
+_ACTOR_RE = re.compile(r"\b(" + "|".join(re.escape(a) for a in THREAT_ACTORS) + r")\b")
+_VENDOR_RE = re.compile(r"(?<![\w-])(" + "|".join(re.escape(v) for v in VENDORS) + r")(?![\w-])")
+
+
+def extract_cves(text: str) -> List[str]:
+    """Returns the distinct CVE ids mentioned in text, upper-cased, in order of appearance."""
+    return list(dict.fromkeys(m.upper() for m in CVE_RE.findall(text or "")))
+
+
+def extract_actors(text: str) -> List[str]:
+    """Returns the distinct known threat actors / malware families mentioned in text."""
+    return list(dict.fromkeys(_ACTOR_RE.findall((text or "").lower())))
+
+
+def extract_vendors(text: str) -> List[str]:
+    """Returns the distinct known vendors / products mentioned in text."""
+    return list(dict.fromkeys(_VENDOR_RE.findall((text or "").lower())))
+
+
+def _terms(text: str) -> List[str]:
+    """Unigrams plus bigrams, so multi-word keywords get their own vocabulary entries."""
+    words = _TOKEN_RE.findall(text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def score_articles(articles: List[Dict[str, Any]]) -> "np.ndarray":
+    """
+    Scores articles locally, without any API call.
+
+    Title + description (title counted twice) are turned into TF-IDF vectors
+    stored as coordinate arrays, so the work stays linear in the text size.
+    The score combines the TF-IDF weight of severity keywords, CVE and
+    threat-actor mentions, outlet coverage, and centrality (cosine similarity
+    to the day's centroid, i.e. how much the story is what everyone covers).
+    """
+    # Imported here so the CVE / actor extractors (used by trends.py and the server) stay cheap to import
+    import numpy as np
+
+    n = len(articles)
+    if n == 0:
+        return np.zeros(0)
+
+    texts = []
+    for a in articles:
+        title = strip_markup(a.get("title", ""))
+        texts.append(f"{title} {title} {strip_markup(a.get('description', ''))}")
+
+    vocab: Dict[str, int] = {}
+    rows, cols = [], []
+    for row, text in enumerate(texts):
+        for term in _terms(text):
+            rows.append(row)
+            cols.append(vocab.setdefault(term, len(vocab)))
+    if not vocab:
+        return np.zeros(n)
+
+    # Collapse duplicate (row, term) pairs into counts
+    pairs = np.unique(np.array(rows, dtype=np.int64) * len(vocab) + np.array(cols, dtype=np.int64),
+                      return_counts=True)
+    keys, counts = pairs
+    row_idx = keys // len(vocab)
+    col_idx = keys % len(vocab)
+
+    df = np.bincount(col_idx, minlength=len(vocab))
+    idf = np.log((1 + n) / (1 + df)) + 1.0
+    values = (1.0 + np.log(counts)) * idf[col_idx]
+    norms = np.sqrt(np.bincount(row_idx, weights=values ** 2, minlength=n))
+    values = values / np.maximum(norms[row_idx], 1e-12)
+
+    keyword_weights = np.zeros(len(vocab))
+    for keyword, weight in SEVERITY_KEYWORDS.items():
+        term = " ".join(_TOKEN_RE.findall(keyword))
+        if term in vocab:
+            keyword_weights[vocab[term]] = weight
+    keyword_score = np.bincount(row_idx, weights=values * keyword_weights[col_idx], minlength=n)
+    # Normalized TF-IDF dilutes keywords in long texts; also credit plain presence
+    keyword_score += np.bincount(row_idx, weights=(keyword_weights[col_idx] > 0) * 0.25, minlength=n)
+
+    centroid = np.bincount(col_idx, weights=values, minlength=len(vocab)) / n
+    centrality = np.bincount(row_idx, weights=values * centroid[col_idx], minlength=n)
+    if centrality.max() > 0:
+        centrality = centrality / centrality.max()
+
+    cves = np.array([min(len(extract_cves(t)), 3) for t in texts], dtype=float)
+    actors = np.array([min(len(extract_actors(t)), 2) for t in texts], dtype=float)
+    coverage = np.array([max(len(a.get("sources") or [a.get("source")]) - 1, 0) for a in articles], dtype=float)
+
+    return (WEIGHT_KEYWORDS * keyword_score
+            + WEIGHT_CVE * cves
+            + WEIGHT_ACTOR * actors
+            + WEIGHT_COVERAGE * coverage
+            + WEIGHT_CENTRALITY * centrality)
+
+
+def shortlist(articles: List[Dict[str, Any]], top_n: int = SHORTLIST_SIZE) -> List[Dict[str, Any]]:
+    """
+    Keeps the top_n locally highest-scoring articles, best first.
+
+    Each returned article carries its "score", which the compaction stage
+    uses to decide what to drop when the token budget is tight.
+    """
+    import numpy as np
+
+    scores = score_articles(articles)
+    # Sorted even when everything is kept, so callers can rely on the order
+    best = np.argsort(-scores, kind="stable")
+    if 0 < top_n < len(articles):
+        best = best[:top_n]
+        logging.info(f"Pre-ranking shortlisted {len(best)} of {len(articles)} articles for the LLM")
+    return [{**articles[i], "score": round(float(scores[i]), 4)} for i in best]
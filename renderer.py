@@ -0,0 +1,171 @@
+import os
+import re
+import datetime
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, NamedTuple
+
+from jinja2 import Environment, FileSystemLoader, StrictUndefined
+from markupsafe import escape
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+SNAPSHOTS_DIR = os.path.join("reports", "snapshots")
+
+EMAIL_HTML_TEMPLATE = "email.html.j2"
+EMAIL_TEXT_TEMPLATE = "email.txt.j2"
+TELEGRAM_TEMPLATE = "telegram.md.j2"
+SNAPSHOT_TEMPLATE = "snapshot.html.j2"
+
+# Stands in for the recipient while the shared part of an email is rendered; survives HTML escaping unchanged
+_RECIPIENT_MARKER = "\x00recipient\x00"
+
+# Characters with a meaning in Telegram's (legacy) Markdown parse mode
+_MARKDOWN_SPECIAL_RE = re.compile(r"([_*`\[])")
+
+
+class RenderedReport(NamedTuple):
+    email_html: str
+    email_text: str
+    telegram: str
+    snapshot_html: str
+
+
+def safe_url(url: Any) -> str:
+    """Keeps http(s) links only, so model output cannot inject javascript: or data: URLs."""
+    url = str(url or "").strip()
+    return url if url.lower().startswith(("http://", "https://")) else "#"
+
+
+def _markdown(text: Any) -> str:
+    return _MARKDOWN_SPECIAL_RE.sub(r"\\\1", str(text))
+
+
+def _markdown_label(text: Any) -> str:
+    # A ']' would end the link text early
+    return _markdown(str(text).replace("]", ")"))
+
+
+def _markdown_url(url: Any) -> str:
+    return str(url).replace(")", "%29")
+
+
+@lru_cache(maxsize=1)
+def _environment() -> Environment:
+    env = Environment(
+        loader=FileSystemLoader(TEMPLATES_DIR),
+        # Escape everything rendered into HTML; text and Markdown templates escape explicitly
+        autoescape=lambda name: name is not None and ".html" in name,
+        trim_blocks=True,
+        lstrip_blocks=True,
+        undefined=StrictUndefined,
+        auto_reload=False,
+    )
+    env.filters["md"] = _markdown
+    env.filters["md_label"] = _markdown_label
+    env.filters["md_url"] = _markdown_url
+    return env
+
+
+@lru_cache(maxsize=None)
+def _template(name: str):
+    return _environment().get_template(name)
+
+
+def report_context(data: Dict[str, Any], date_str: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Normalizes a report once into the values every template renders.
+
+    Missing fields get the same fallbacks the old string builders used, and
+    links are restricted to http(s).
+    """
+    attacks = []
+    for attack in (data or {}).get("top_10_attacks", []):
+        rank = attack.get("rank", "-")
+        attacks.append({
+            "rank": rank,
+            "title": attack.get("title") or "N/A",
+            "source": attack.get("source") or "N/A",
+            "link": safe_url(attack.get("link")),
+            "summary": attack.get("summary") or "N/A",
+            "critical": isinstance(rank, int) and rank <= 3,
+        })
+
+    lessons = [
+        {
+            "rank": lesson.get("rank", "-"),
+            "title": lesson.get("title") or "N/A",
+            "learning_objectives": lesson.get("learning_objectives", []),
+            "real_world_impact": lesson.get("real_world_impact") or "N/A",
+            "mitigation_strategies": lesson.get("mitigation_strategies", []),
+            "discussion_questions": lesson.get("discussion_questions", []),
+        }
+        for lesson in (data or {}).get("lessons", [])
+    ]
+
+    date_str = date_str or datetime.date.today().isoformat()
+    try:
+        display_date = datetime.date.fromisoformat(date_str).strftime("%A, %B %d, %Y")
+    except ValueError:
+        display_date = date_str
+
+    lazy_lessons = (data or {}).get("lazy_lessons", 0)
+    # Reports written with --lazy-lessons have no lessons yet, but the dashboard generates them on demand
+    lessons_state = "generated" if lessons else "on_demand" if lazy_lessons else "none"
+
+    return {
+        "date": date_str,
+        "display_date": display_date,
+        "attacks": attacks,
+        "top_attacks": attacks[:3],
+        "lessons": lessons,
+        "lazy_lessons": lazy_lessons,
+        "lessons_state": lessons_state,
+        "recipient": None,
+    }
+
+
+def render(name: str, context: Dict[str, Any], **overrides) -> str:
+    """Renders a cached, precompiled template with context plus per-call overrides (e.g. recipient)."""
+    return _template(name).render({**context, **overrides})
+
+
+def render_report(data: Dict[str, Any], date_str: Optional[str] = None,
+                  recipient: Optional[str] = None) -> RenderedReport:
+    """Renders every output format from a single normalization pass over the report."""
+    context = report_context(data, date_str)
+    return RenderedReport(
+        email_html=render(EMAIL_HTML_TEMPLATE, context, recipient=recipient),
+        email_text=render(EMAIL_TEXT_TEMPLATE, context, recipient=recipient),
+        telegram=render(TELEGRAM_TEMPLATE, context),
+        snapshot_html=render(SNAPSHOT_TEMPLATE, context),
+    )
+
+
+def render_emails(context: Dict[str, Any], recipients: List[str]) -> Dict[str, Dict[str, str]]:
+    """
+    Renders a personalized HTML and plain-text email per recipient from one shared context.
+
+    Each template is rendered once with a placeholder for the recipient, so
+    every further recipient only costs splicing their (escaped) address in.
+    """
+    html_parts = render(EMAIL_HTML_TEMPLATE, context, recipient=_RECIPIENT_MARKER).split(_RECIPIENT_MARKER)
+    text_parts = render(EMAIL_TEXT_TEMPLATE, context, recipient=_RECIPIENT_MARKER).split(_RECIPIENT_MARKER)
+    return {
+        recipient: {"html": str(escape(recipient)).join(html_parts), "text": recipient.join(text_parts)}
+        for recipient in recipients
+    }
+
+
+def write_snapshot(context: Dict[str, Any], snapshots_dir: str = SNAPSHOTS_DIR) -> str:
+    """Writes the static dashboard snapshot for the context's date and returns its path."""
+    return write_snapshot_html(context["date"], render(SNAPSHOT_TEMPLATE, context), snapshots_dir)
+
+
+def write_snapshot_html(date_str: str, html: str, snapshots_dir: str = SNAPSHOTS_DIR) -> str:
+    """Atomically writes an already rendered snapshot for date_str and returns its path."""
+    os.makedirs(snapshots_dir, exist_ok=True)
+    path = os.path.join(snapshots_dir, f"{date_str}.html")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(html)
+    os.replace(tmp_path, path)
+    return path
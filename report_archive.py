@@ -0,0 +1,334 @@
+import os
+import re
+import glob
+import gzip
+import json
+import mmap
+import zlib
+import struct
+import logging
+import argparse
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple, Iterator, NamedTuple
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; writers then only lock within one process
+    fcntl = None
+
+try:
+    import zstandard
+except ImportError:  # Optional: records are gzip-compressed unless zstandard is installed
+    zstandard = None
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+REPORTS_DIR = "reports"
+ARCHIVE_SUBDIR = "archive"
+INDEX_NAME = "index.bin"
+# A new segment file is started once the current one would grow past this size
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+# Seconds between stat() checks for an index replaced by another process
+REVALIDATE_AFTER = 1.0
+GZIP_LEVEL = 9
+ZSTD_LEVEL = 10
+
+DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+CODEC_GZIP = 0
+CODEC_ZSTD = 1
+
+# Index file: header (magic, latest date, entry count), then one fixed-width entry per date, sorted
+_MAGIC = b"RPTARCH1"
+_HEADER = struct.Struct("<8s10s2xI")
+_ENTRY = struct.Struct("<10sHIQII")
+
+
+class IndexEntry(NamedTuple):
+    date: str
+    codec: int
+    segment: int
+    offset: int
+    length: int
+    crc32: int
+
+
+def _compress(payload: bytes) -> Tuple[int, bytes]:
+    if zstandard is not None:
+        return CODEC_ZSTD, zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(payload)
+    return CODEC_GZIP, gzip.compress(payload, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _decompress(codec: int, data: bytes) -> bytes:
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Report was stored with zstd; install the zstandard package to read it")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class ReportArchive:
+    """
+    Append-only store of daily reports.
+
+    Each report is one compressed JSON line ({"date", "report"}) appended to a
+    segment file under reports/archive/. A fixed-width index maps every date
+    to its record and names the latest report, so "latest" is a pointer, not
+    a copy. Record bytes are fsynced before a new index is written to a temp
+    file and renamed into place, so readers only ever see complete reports.
+
+    The index is small and read whole; segments are memory-mapped for reads.
+    """
+
+    def __init__(self, reports_dir: str = REPORTS_DIR, revalidate_after: float = REVALIDATE_AFTER,
+                 migrate: bool = True):
+        self.reports_dir = reports_dir
+        self.directory = os.path.join(reports_dir, ARCHIVE_SUBDIR)
+        self.index_path = os.path.join(self.directory, INDEX_NAME)
+        self.revalidate_after = revalidate_after
+        self._lock = threading.RLock()
+        self._entries: Dict[str, IndexEntry] = {}
+        self._latest: Optional[str] = None
+        self._index_signature = None
+        self._checked = 0.0
+        self._maps: Dict[int, mmap.mmap] = {}
+
+        os.makedirs(self.directory, exist_ok=True)
+        if migrate and not os.path.exists(self.index_path):
+            migrate_json_reports(self)
+        self.reload()
+
+    # --- Reading -----------------------------------------------------------
+
+    def reload(self) -> bool:
+        """Re-reads the index if it was replaced since the last load. Returns whether it changed."""
+        with self._lock:
+            self._checked = time.monotonic()
+            try:
+                stat = os.stat(self.index_path)
+            except FileNotFoundError:
+                changed = self._index_signature is not None
+                self._entries, self._latest, self._index_signature = {}, None, None
+                return changed
+            signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if signature == self._index_signature:
+                return False
+            with open(self.index_path, "rb") as f:
+                raw = f.read()
+            self._entries, self._latest = _parse_index(raw)
+            self._index_signature = signature
+            return True
+
+    def _revalidate(self):
+        if time.monotonic() - self._checked >= self.revalidate_after:
+            self.reload()
+
+    def entry(self, date_str: str) -> Optional[IndexEntry]:
+        with self._lock:
+            self._revalidate()
+            return self._entries.get(date_str)
+
+    def latest_entry(self) -> Optional[IndexEntry]:
+        with self._lock:
+            self._revalidate()
+            return self._entries.get(self._latest) if self._latest else None
+
+    def snapshot(self) -> Tuple[Dict[str, IndexEntry], Optional[str]]:
+        """Returns (entries by date, latest date) as of the last load."""
+        with self._lock:
+            return dict(self._entries), self._latest
+
+    def dates(self) -> List[str]:
+        with self._lock:
+            self._revalidate()
+            return sorted(self._entries)
+
+    def _segment_map(self, segment: int, end: int) -> mmap.mmap:
+        mapped = self._maps.get(segment)
+        if mapped is None or len(mapped) < end:
+            # Segments only grow, so a mapping is only replaced when a record lies beyond it
+            if mapped is not None:
+                mapped.close()
+            with open(self._segment_path(segment), "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[segment] = mapped
+        return mapped
+
+    def read_entry(self, entry: IndexEntry) -> Dict[str, Any]:
+        """Decodes the report an index entry points to. Raises ValueError if the record is corrupt."""
+        with self._lock:
+            mapped = self._segment_map(entry.segment, entry.offset + entry.length)
+            data = mapped[entry.offset:entry.offset + entry.length]
+        if zlib.crc32(data) != entry.crc32:
+            raise ValueError(f"Archived report for {entry.date} failed its checksum")
+        return json.loads(_decompress(entry.codec, data))["report"]
+
+    def read(self, date_str: str) -> Optional[Dict[str, Any]]:
+        entry = self.entry(date_str)
+        return self.read_entry(entry) if entry else None
+
+    def read_latest(self) -> Optional[Dict[str, Any]]:
+        entry = self.latest_entry()
+        return self.read_entry(entry) if entry else None
+
+    def iter_reports(self) -> Iterator[Tuple[str, Dict[str, Any], int]]:
+        """Yields (date, report, stored size in bytes) for every archived report, oldest first."""
+        for date_str in self.dates():
+            entry = self.entry(date_str)
+            try:
+                report = self.read_entry(entry)
+            except (OSError, ValueError, RuntimeError) as e:
+                logging.warning(f"Skipping unreadable archived report {date_str}: {e}")
+                continue
+            yield date_str, report, entry.length
+
+    # --- Writing -----------------------------------------------------------
+
+    def append(self, date_str: str, report: Dict[str, Any], make_latest: bool = True) -> IndexEntry:
+        """Stores report for date_str (replacing an earlier one for that date) and returns its entry."""
+        return self.append_many([(date_str, report)], make_latest)[-1]
+
+    def append_many(self, reports: List[Tuple[str, Dict[str, Any]]], make_latest: bool = True) -> List[IndexEntry]:
+        """Appends several reports with a single fsync and index rewrite. The last one becomes latest."""
+        for date_str, _ in reports:
+            if not DATE_RE.match(date_str):
+                raise ValueError(f"Report date must be YYYY-MM-DD, got {date_str!r}")
+
+        with self._lock, _FileLock(os.path.join(self.directory, ".lock")):
+            # Another process may have appended since this instance last looked
+            self._index_signature = None
+            self.reload()
+            entries, latest = dict(self._entries), self._latest
+
+            segment = max((e.segment for e in entries.values()), default=0)
+            written = []
+            f = open(self._segment_path(segment), "ab")
+            try:
+                for date_str, report in reports:
+                    line = json.dumps({"date": date_str, "report": report}, ensure_ascii=False,
+                                      separators=(",", ":")) + "\n"
+                    codec, data = _compress(line.encode("utf-8"))
+                    if f.tell() and f.tell() + len(data) > SEGMENT_MAX_BYTES:
+                        f.flush()
+                        os.fsync(f.fileno())
+                        f.close()
+                        segment += 1
+                        f = open(self._segment_path(segment), "ab")
+                    entry = IndexEntry(date_str, codec, segment, f.tell(), len(data), zlib.crc32(data))
+                    f.write(data)
+                    entries[date_str] = entry
+                    written.append(entry)
+                f.flush()
+                os.fsync(f.fileno())
+            finally:
+                f.close()
+
+            if make_latest and written:
+                latest = written[-1].date
+            self._write_index(entries, latest)
+            self.reload()
+        return written
+
+    def _write_index(self, entries: Dict[str, IndexEntry], latest: Optional[str]):
+        parts = [_HEADER.pack(_MAGIC, (latest or "").encode("ascii"), len(entries))]
+        for date_str in sorted(entries):
+            e = entries[date_str]
+            parts.append(_ENTRY.pack(e.date.encode("ascii"), e.codec, e.segment, e.offset, e.length, e.crc32))
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(b"".join(parts))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.index_path)
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"segment-{segment:05d}.jsonl.z")
+
+    def close(self):
+        with self._lock:
+            for mapped in self._maps.values():
+                mapped.close()
+            self._maps.clear()
+
+
+class _FileLock:
+    """Exclusive lock between writer processes, where the platform supports flock()."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self._file = open(self.path, "a")
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+def _parse_index(raw: bytes) -> Tuple[Dict[str, IndexEntry], Optional[str]]:
+    magic, latest, count = _HEADER.unpack_from(raw, 0)
+    if magic != _MAGIC:
+        raise ValueError("Not a report archive index")
+    entries = {}
+    for i in range(count):
+        date_b, codec, segment, offset, length, crc = _ENTRY.unpack_from(raw, _HEADER.size + i * _ENTRY.size)
+        date_str = date_b.decode("ascii")
+        entries[date_str] = IndexEntry(date_str, codec, segment, offset, length, crc)
+    latest = latest.rstrip(b"\0").decode("ascii") or None
+    return entries, latest
+
+
+def migrate_json_reports(archive: ReportArchive, remove: bool = False) -> int:
+    """
+    Imports the YYYY-MM-DD.json reports of the reports directory into the archive.
+
+    Dates already archived are skipped. The newest imported report becomes
+    latest, which is what latest.json held. With remove=True the JSON files
+    (and latest.json) are deleted once they are archived.
+    """
+    paths = {}
+    for fpath in sorted(glob.glob(os.path.join(archive.reports_dir, "*.json"))):
+        date_str = os.path.basename(fpath)[:-len(".json")]
+        if DATE_RE.match(date_str):
+            paths[date_str] = fpath
+
+    pending = []
+    for date_str, fpath in paths.items():
+        if archive.entry(date_str) is not None:
+            continue
+        try:
+            with open(fpath, "r", encoding="utf-8") as f:
+                pending.append((date_str, json.load(f)))
+        except (OSError, ValueError) as e:
+            logging.warning(f"Skipping unreadable report {fpath}: {e}")
+
+    if pending:
+        archive.append_many(pending)
+        logging.info(f"Migrated {len(pending)} JSON reports into {archive.directory}")
+
+    if remove:
+        for date_str, fpath in paths.items():
+            if archive.entry(date_str) is not None:
+                os.remove(fpath)
+        latest_json = os.path.join(archive.reports_dir, "latest.json")
+        if os.path.exists(latest_json) and archive.latest_entry() is not None:
+            os.remove(latest_json)
+    return len(pending)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate JSON reports into the compressed report archive")
+    parser.add_argument("--reports-dir", default=REPORTS_DIR, help="Directory holding YYYY-MM-DD.json reports")
+    parser.add_argument("--remove-json", action="store_true", help="Delete the JSON files once they are archived")
+    args = parser.parse_args()
+
+    archive = ReportArchive(args.reports_dir, migrate=False)
+    migrate_json_reports(archive, remove=args.remove_json)
+    archive.close()
@@ -0,0 +1,133 @@
+import json
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, NamedTuple, Callable, Hashable
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:  # Optional: br is only offered when the brotli package is installed
+    brotli = None
+
+# Bounded in-memory cache of pre-serialized, pre-compressed report responses
+REPORT_CACHE_ENTRIES = 64
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+# ETag suffix per content coding; each encoded body is a different representation and needs its own strong tag
+ETAG_SUFFIXES = {"identity": "", "gzip": "-gz", "br": "-br"}
+
+
+class CachedBody(NamedTuple):
+    # Tag of the identity body; see etag_for() for the encoded ones
+    etag: str
+    identity: bytes
+    gzip: bytes
+    br: Optional[bytes]
+
+    def etag_for(self, encoding: str) -> str:
+        """Strong ETag of the body sent with the given content coding, e.g. "<hash>-gz"."""
+        return self.etag[:-1] + ETAG_SUFFIXES[encoding] + '"'
+
+    def etags(self) -> List[str]:
+        """The tags of every encoding this body can be served in."""
+        return [self.etag_for(encoding) for encoding in ETAG_SUFFIXES if encoding != "br" or self.br is not None]
+
+
+def encode_body(data: Any) -> CachedBody:
+    """Serializes data once and keeps every encoding the server may negotiate."""
+    identity = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    etag = '"' + hashlib.sha256(identity).hexdigest()[:32] + '"'
+    return CachedBody(
+        etag=etag,
+        identity=identity,
+        gzip=gzip.compress(identity, compresslevel=GZIP_LEVEL, mtime=0),
+        br=brotli.compress(identity, quality=BROTLI_QUALITY) if brotli else None,
+    )
+
+
+class ReportCache:
+    """
+    LRU cache of encoded report bodies, keyed by report and validated by a signature.
+
+    The signature identifies the stored version of a report (e.g. its archive
+    record); when it changes, the report is loaded and encoded again.
+    """
+
+    def __init__(self, max_entries: int = REPORT_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, signature: Hashable, load: Callable[[], Any]) -> CachedBody:
+        """Returns the encoded body for key, calling load() for the data only on a miss or a new signature."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["signature"] == signature:
+                self._entries.move_to_end(key)
+                return entry["body"]
+
+        body = encode_body(load())
+
+        with self._lock:
+            self._entries[key] = {"signature": signature, "body": body}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return body
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _etag_matches(if_none_match: str, etags: List[str]) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Any encoding's tag validates the cached content (a client may have switched
+    # encodings), and weak validators count too, e.g. after a proxy re-compressed it
+    return any(etag in candidates or f"W/{etag}" in candidates for etag in etags)
+
+
+def _accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+    return accepted
+
+
+def cached_json_response(request: Request, body: CachedBody) -> Response:
+    """
+    Builds the response for a cached body: 304 on a matching ETag, else the best accepted encoding.
+
+    Both carry the ETag of the negotiated encoding.
+    """
+    accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+    encoding, content = "identity", body.identity
+    if body.br is not None and accepted.get("br", 0) > 0:
+        encoding, content = "br", body.br
+    elif accepted.get("gzip", 0) > 0:
+        encoding, content = "gzip", body.gzip
+    headers = {"ETag": body.etag_for(encoding), "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, body.etags()):
+        return Response(status_code=304, headers=headers)
+
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=content, media_type="application/json", headers=headers)
@@ -0,0 +1,140 @@
+import os
+import json
+import sqlite3
+import logging
+import datetime
+from typing import List, Dict, Any, Optional, Tuple, Iterator
+
+from report_archive import REPORTS_DIR, DATE_RE, ReportArchive
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# SQLite index of the report history, kept next to the reports it describes
+REPORT_INDEX_PATH = os.path.join(REPORTS_DIR, "index.db")
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def connect(path: str = REPORT_INDEX_PATH, reports_dir: str = REPORTS_DIR) -> sqlite3.Connection:
+    """
+    Opens the report index, creating the catalog table on first use.
+
+    A newly created catalog is backfilled from the reports already archived
+    in reports_dir, so history written before the catalog existed is not lost.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path)
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'reports'").fetchone()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS reports (
+            date TEXT PRIMARY KEY,
+            attack_count INTEGER NOT NULL,
+            sources TEXT NOT NULL,
+            bytes INTEGER NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    """)
+    if not exists:
+        count = 0
+        with conn:
+            for date_str, data, size in iter_reports(reports_dir):
+                _upsert(conn, date_str, data, size)
+                count += 1
+        if count:
+            logging.info(f"Report catalog backfilled with {count} existing reports")
+    return conn
+
+
+def _sources(data: Dict[str, Any]) -> List[str]:
+    sources = []
+    for attack in data.get("top_10_attacks", []):
+        source = attack.get("source")
+        if source and source not in sources:
+            sources.append(source)
+    return sources
+
+
+def _upsert(conn: sqlite3.Connection, date_str: str, data: Dict[str, Any], size_bytes: int):
+    conn.execute(
+        "INSERT OR REPLACE INTO reports (date, attack_count, sources, bytes, updated_at) VALUES (?, ?, ?, ?, ?)",
+        (date_str, len(data.get("top_10_attacks", [])), json.dumps(_sources(data)), size_bytes,
+         datetime.datetime.now(datetime.timezone.utc).isoformat())
+    )
+
+
+def record_report(date_str: str, data: Dict[str, Any], size_bytes: int, path: str = REPORT_INDEX_PATH):
+    """Adds or replaces the catalog entry for one day's report."""
+    conn = connect(path)
+    try:
+        with conn:
+            _upsert(conn, date_str, data, size_bytes)
+    finally:
+        conn.close()
+
+
+def iter_reports(reports_dir: str = REPORTS_DIR) -> Iterator[Tuple[str, Dict[str, Any], int]]:
+    """Yields (date, report, stored size in bytes) for every report archived under reports_dir, oldest first."""
+    archive = ReportArchive(reports_dir)
+    try:
+        yield from archive.iter_reports()
+    finally:
+        archive.close()
+
+
+def rebuild_catalog(reports_dir: str = REPORTS_DIR, path: str = REPORT_INDEX_PATH) -> int:
+    """Re-indexes every report archived under reports_dir. Returns how many were indexed."""
+    conn = connect(path, reports_dir)
+    count = 0
+    try:
+        with conn:
+            for date_str, data, size in iter_reports(reports_dir):
+                _upsert(conn, date_str, data, size)
+                count += 1
+    finally:
+        conn.close()
+    logging.info(f"Report catalog rebuilt with {count} reports")
+    return count
+
+
+def list_reports(limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                 date_from: Optional[str] = None, date_to: Optional[str] = None,
+                 path: str = REPORT_INDEX_PATH) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Returns one page of catalog entries, newest first, plus the cursor for the next page.
+
+    Pagination is keyset-based on the date primary key, so a page costs the
+    same no matter how much history exists. cursor is the last date of the
+    previous page; date_from/date_to are inclusive bounds.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    clauses, params = [], []
+    if cursor:
+        clauses.append("date < ?")
+        params.append(cursor)
+    if date_from:
+        clauses.append("date >= ?")
+        params.append(date_from)
+    if date_to:
+        clauses.append("date <= ?")
+        params.append(date_to)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    conn = connect(path)
+    try:
+        rows = conn.execute(
+            f"SELECT date, attack_count, sources, bytes FROM reports {where} ORDER BY date DESC LIMIT ?",
+            (*params, limit + 1)
+        ).fetchall()
+    finally:
+        conn.close()
+
+    items = [
+        {"date": date, "attack_count": attack_count, "sources": json.loads(sources), "bytes": size}
+        for date, attack_count, sources, size in rows[:limit]
+    ]
+    next_cursor = items[-1]["date"] if len(rows) > limit else None
+    return items, next_cursor
+
+
+if __name__ == "__main__":
+    rebuild_catalog()
@@ -0,0 +1,212 @@
+import os
+import sys
+import json
+import struct
+import select
+import asyncio
+import logging
+import threading
+import ctypes
+import ctypes.util
+from typing import Dict, Any, List, Callable, Optional, Set, Tuple
+
+from report_archive import ReportArchive, INDEX_NAME
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Seconds between directory scans when inotify is unavailable
+POLL_INTERVAL = 2.0
+# Seconds between SSE comment lines, so proxies do not close idle streams
+KEEPALIVE_INTERVAL = 20.0
+# Reconnect delay suggested to EventSource clients, in milliseconds
+RETRY_MS = 5000
+# Events buffered per client; a client that falls this far behind misses the oldest ones
+CLIENT_QUEUE_SIZE = 32
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_NONBLOCK = 0x00000800
+_IN_CLOEXEC = 0x00080000
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _load_inotify():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+def changed_events(before: Tuple[Dict[str, Any], Optional[str]],
+                   after: Tuple[Dict[str, Any], Optional[str]]) -> List[Dict[str, Any]]:
+    """Compares two archive snapshots and returns the events clients should see."""
+    old_entries, old_latest = before
+    new_entries, new_latest = after
+    events = [{"type": "report", "date": date_str}
+              for date_str in sorted(new_entries) if old_entries.get(date_str) != new_entries[date_str]]
+    if new_latest and (new_latest != old_latest or old_entries.get(new_latest) != new_entries.get(new_latest)):
+        events.append({"type": "latest", "date": new_latest})
+    return events
+
+
+class ReportWatcher:
+    """
+    Watches the report archive and calls listeners with an event per stored or replaced report.
+
+    Writers commit by renaming a new index into place, so only that file is
+    watched: through inotify via libc where available, and otherwise by
+    checking it every poll_interval seconds. On a change the archive is
+    reloaded and diffed against the previous index. Listeners are called
+    from the watcher thread.
+    """
+
+    def __init__(self, archive: ReportArchive, poll_interval: float = POLL_INTERVAL):
+        self.archive = archive
+        self.poll_interval = poll_interval
+        self.mode = None
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._snapshot = None
+
+    def add_listener(self, listener: Callable[[Dict[str, Any]], None]):
+        """Registers listener(event) for every change."""
+        self._listeners.append(listener)
+
+    def start(self):
+        os.makedirs(self.archive.directory, exist_ok=True)
+        self.archive.reload()
+        self._snapshot = self.archive.snapshot()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="report-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _check(self):
+        self.archive.reload()
+        snapshot = self.archive.snapshot()
+        events = changed_events(self._snapshot, snapshot)
+        self._snapshot = snapshot
+        for event in events:
+            for listener in self._listeners:
+                try:
+                    listener(event)
+                except Exception as e:
+                    logging.warning(f"Report event listener failed: {e}")
+
+    def _run(self):
+        libc = _load_inotify()
+        fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC) if libc else -1
+        if fd >= 0 and libc.inotify_add_watch(fd, os.fsencode(self.archive.directory),
+                                              _IN_CLOSE_WRITE | _IN_MOVED_TO) >= 0:
+            self.mode = "inotify"
+            try:
+                self._watch_inotify(fd)
+            finally:
+                os.close(fd)
+        else:
+            if fd >= 0:
+                os.close(fd)
+            self.mode = "polling"
+            logging.info("inotify unavailable, polling the report archive for changes")
+            self._watch_polling()
+
+    def _watch_inotify(self, fd: int):
+        while not self._stop.is_set():
+            # Wake up periodically so stop() is honoured
+            readable, _, _ = select.select([fd], [], [], 1.0)
+            if not readable:
+                continue
+            try:
+                buf = os.read(fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            offset = 0
+            index_changed = False
+            while offset + _EVENT_HEADER.size <= len(buf):
+                _, _, _, length = _EVENT_HEADER.unpack_from(buf, offset)
+                offset += _EVENT_HEADER.size
+                name = buf[offset:offset + length].rstrip(b"\0")
+                offset += length
+                index_changed = index_changed or name == INDEX_NAME.encode()
+            if index_changed:
+                self._check()
+
+    def _watch_polling(self):
+        while not self._stop.wait(self.poll_interval):
+            self._check()
+
+
+class EventBroadcaster:
+    """
+    Fans events out to connected SSE clients.
+
+    Each client is an asyncio queue on the server's event loop, so an idle
+    connection costs one suspended coroutine rather than a thread.
+    """
+
+    def __init__(self, queue_size: int = CLIENT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._clients: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = set()
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def subscribe(self) -> Tuple[asyncio.AbstractEventLoop, asyncio.Queue]:
+        client = (asyncio.get_running_loop(), asyncio.Queue(maxsize=self.queue_size))
+        with self._lock:
+            self._clients.add(client)
+        return client
+
+    def unsubscribe(self, client: Tuple[asyncio.AbstractEventLoop, asyncio.Queue]):
+        with self._lock:
+            self._clients.discard(client)
+
+    @property
+    def client_count(self) -> int:
+        return len(self._clients)
+
+    def publish(self, event: Dict[str, Any]):
+        """Queues event for every client. Safe to call from any thread."""
+        with self._lock:
+            self._next_id += 1
+            message = format_event(event["type"], {k: v for k, v in event.items() if k != "type"}, self._next_id)
+            clients = list(self._clients)
+        for loop, queue in clients:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, message)
+            except RuntimeError:  # Loop already closed
+                self.unsubscribe((loop, queue))
+
+    async def stream(self, client: Tuple[asyncio.AbstractEventLoop, asyncio.Queue],
+                     keepalive: float = KEEPALIVE_INTERVAL):
+        """Yields SSE text for one client until it disconnects."""
+        _, queue = client
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+        finally:
+            self.unsubscribe(client)
+
+
+def _offer(queue: asyncio.Queue, message: str):
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(message)
+
+
+def format_event(name: str, data: Dict[str, Any], event_id: int) -> str:
+    return f"id: {event_id}\nevent: {name}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
@@ -0,0 +1,86 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from typing import Dict, Any, Optional
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Content-addressed cache of parsed DeepSeek answers
+RESPONSE_CACHE_DIR = os.path.join("cache", "llm")
+RESPONSE_CACHE_TTL = 24 * 60 * 60           # Seconds an answer stays valid
+RESPONSE_CACHE_MAX_ENTRIES = 500
+RESPONSE_CACHE_MAX_BYTES = 50 * 1024 * 1024
+
+
+def cache_key(model: str, system_prompt: str, temperature: float, payload: str) -> str:
+    """Hashes everything that determines the model's answer into a stable key."""
+    material = json.dumps(
+        {"model": model, "system": system_prompt.strip(), "temperature": temperature, "payload": payload.strip()},
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _entry_path(key: str, cache_dir: str) -> str:
+    return os.path.join(cache_dir, f"{key}.json")
+
+
+def get_cached(key: str, ttl: float = RESPONSE_CACHE_TTL,
+               cache_dir: str = RESPONSE_CACHE_DIR) -> Optional[Dict[str, Any]]:
+    """Returns the cached parsed answer for key, or None on a miss or an expired entry."""
+    path = _entry_path(key, cache_dir)
+    try:
+        if time.time() - os.path.getmtime(path) > ttl:
+            logging.info(f"Response cache expired: {key[:12]}")
+            os.remove(path)
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            value = json.load(f)
+    except FileNotFoundError:
+        logging.info(f"Response cache miss: {key[:12]}")
+        return None
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable response cache entry {path}: {e}")
+        return None
+    logging.info(f"Response cache hit: {key[:12]}")
+    return value
+
+
+def put_cached(key: str, value: Dict[str, Any], cache_dir: str = RESPONSE_CACHE_DIR,
+               max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+    """Stores a parsed answer atomically, then evicts the oldest entries beyond the size limits."""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _entry_path(key, cache_dir)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(value, f)
+    os.replace(tmp_path, path)
+    evict(cache_dir, max_entries, max_bytes)
+
+
+def evict(cache_dir: str = RESPONSE_CACHE_DIR, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+          max_bytes: int = RESPONSE_CACHE_MAX_BYTES) -> int:
+    """Removes least recently written entries until both limits hold. Returns how many were removed."""
+    entries = []
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+    entries.sort(reverse=True)
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    while entries and (len(entries) > max_entries or total > max_bytes):
+        _, size, path = entries.pop()
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    if removed:
+        logging.info(f"Response cache evicted {removed} entries")
+    return removed
@@ -0,0 +1,188 @@
+import re
+import html
+import sqlite3
+import logging
+from typing import List, Dict, Any, Tuple
+
+from report_catalog import REPORT_INDEX_PATH, REPORTS_DIR, iter_reports, connect as connect_index
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DEFAULT_RESULTS = 20
+MAX_RESULTS = 100
+SNIPPET_TOKENS = 16
+
+# Column weights for bm25(): title matches count most, then sources, then body text.
+# Order follows the table columns: date, kind, rank_no, title, body, source.
+_BM25_WEIGHTS = "0.0, 0.0, 0.0, 10.0, 1.0, 3.0"
+
+# Quoted phrases, or bare terms with an optional trailing * for prefix search
+_QUERY_TOKEN_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+# highlight()/snippet() wrap matches in these control characters; the text is HTML-escaped
+# before they are swapped for <mark> tags, so model and feed text never reaches the markup
+_MARK_OPEN = "\x02"
+_MARK_CLOSE = "\x03"
+
+
+def connect(path: str = REPORT_INDEX_PATH) -> Tuple[sqlite3.Connection, bool]:
+    """
+    Opens the report index and makes sure the full-text table exists.
+
+    Returns (connection, created), where created tells whether the table was
+    just created and therefore still needs a backfill.
+    """
+    conn = connect_index(path)
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'report_search'"
+    ).fetchone()
+    if not exists:
+        # '-' is a token character so ids such as CVE-2024-3400 stay one token
+        conn.execute("""
+            CREATE VIRTUAL TABLE report_search USING fts5(
+                date UNINDEXED, kind UNINDEXED, rank_no UNINDEXED, title, body, source,
+                tokenize = "unicode61 tokenchars '-'"
+            )
+        """)
+    return conn, not exists
+
+
+def _documents(date_str: str, data: Dict[str, Any]) -> List[Tuple]:
+    docs = []
+    # The highlight sentinels must not occur in the indexed text itself
+    strip = str.maketrans("", "", _MARK_OPEN + _MARK_CLOSE)
+    for attack in data.get("top_10_attacks", []):
+        docs.append((date_str, "attack", attack.get("rank"), attack.get("title", "").translate(strip),
+                     attack.get("summary", "").translate(strip), attack.get("source", "")))
+    for lesson in data.get("lessons", []):
+        body = " ".join([
+            lesson.get("real_world_impact", ""),
+            *lesson.get("learning_objectives", []),
+            *lesson.get("mitigation_strategies", []),
+            *lesson.get("discussion_questions", []),
+        ])
+        docs.append((date_str, "lesson", lesson.get("rank"), lesson.get("title", "").translate(strip),
+                     body.translate(strip), ""))
+    return docs
+
+
+def _marked(text: str) -> str:
+    """Escapes highlighted FTS5 output and turns its sentinel characters into <mark> tags."""
+    return html.escape(text or "").replace(_MARK_OPEN, "<mark>").replace(_MARK_CLOSE, "</mark>")
+
+
+def _insert_documents(conn: sqlite3.Connection, date_str: str, data: Dict[str, Any]):
+    conn.executemany(
+        "INSERT INTO report_search (date, kind, rank_no, title, body, source) VALUES (?, ?, ?, ?, ?, ?)",
+        _documents(date_str, data)
+    )
+
+
+def index_report(date_str: str, data: Dict[str, Any], path: str = REPORT_INDEX_PATH):
+    """Adds or replaces the searchable documents of one day's report."""
+    conn, created = connect(path)
+    try:
+        if created:
+            _backfill(conn)
+        with conn:
+            conn.execute("DELETE FROM report_search WHERE date = ?", (date_str,))
+            _insert_documents(conn, date_str, data)
+    finally:
+        conn.close()
+
+
+def _backfill(conn: sqlite3.Connection, reports_dir: str = REPORTS_DIR) -> int:
+    # Only called on an empty table, so documents are inserted without per-date deletes
+    count = 0
+    with conn:
+        for date_str, data, _ in iter_reports(reports_dir):
+            _insert_documents(conn, date_str, data)
+            count += 1
+    logging.info(f"Search index built from {count} reports")
+    return count
+
+
+def rebuild_search_index(reports_dir: str = REPORTS_DIR, path: str = REPORT_INDEX_PATH) -> int:
+    """Re-indexes every report in reports_dir. Returns how many reports were indexed."""
+    conn, _ = connect(path)
+    try:
+        with conn:
+            conn.execute("DELETE FROM report_search")
+        return _backfill(conn, reports_dir)
+    finally:
+        conn.close()
+
+
+def to_fts_query(query: str) -> str:
+    """
+    Translates a user query into FTS5 syntax.
+
+    "quoted text" is a phrase, a trailing * makes a prefix query, AND/OR/NOT
+    are passed through, and every other term is quoted so characters such
+    as '-' or ':' cannot break the query.
+    """
+    parts = []
+    for match in _QUERY_TOKEN_RE.finditer(query):
+        phrase, term = match.groups()
+        if phrase is not None:
+            if phrase.strip():
+                parts.append('"' + phrase.replace('"', '') + '"')
+        elif term in ("AND", "OR", "NOT"):
+            parts.append(term)
+        else:
+            prefix = term.endswith("*")
+            term = term.rstrip("*").replace('"', '')
+            if term:
+                parts.append(f'"{term}"' + ("*" if prefix else ""))
+    # Drop operators left dangling at either end
+    while parts and parts[0] in ("AND", "OR", "NOT"):
+        parts.pop(0)
+    while parts and parts[-1] in ("AND", "OR", "NOT"):
+        parts.pop()
+    return " ".join(parts)
+
+
+def search(query: str, limit: int = DEFAULT_RESULTS, offset: int = 0,
+           path: str = REPORT_INDEX_PATH) -> List[Dict[str, Any]]:
+    """
+    Runs a ranked full-text query over attack titles, summaries, sources and lesson text.
+
+    Results are ordered by bm25 relevance and carry a highlighted snippet;
+    title_highlight and snippet are HTML-escaped, with matches in <mark> tags.
+    Raises ValueError for an empty or malformed query.
+    """
+    fts_query = to_fts_query(query)
+    if not fts_query:
+        raise ValueError("Query is empty")
+
+    conn, created = connect(path)
+    try:
+        if created:
+            _backfill(conn)
+        rows = conn.execute(
+            f"""
+            SELECT date, kind, rank_no, title, source,
+                   highlight(report_search, 3, char(2), char(3)),
+                   snippet(report_search, 4, char(2), char(3), '…', {SNIPPET_TOKENS}),
+                   bm25(report_search, {_BM25_WEIGHTS}) AS score
+            FROM report_search
+            WHERE report_search MATCH ?
+            ORDER BY score
+            LIMIT ? OFFSET ?
+            """,
+            (fts_query, max(1, min(limit, MAX_RESULTS)), max(0, offset))
+        ).fetchall()
+    except sqlite3.OperationalError as e:
+        raise ValueError(f"Invalid search query: {e}")
+    finally:
+        conn.close()
+
+    return [
+        {"date": date, "kind": kind, "rank": rank_no, "title": title, "source": source,
+         "title_highlight": _marked(title_hl), "snippet": _marked(snippet), "score": round(-score, 4)}
+        for date, kind, rank_no, title, source, title_hl, snippet, score in rows
+    ]
+
+
+if __name__ == "__main__":
+    rebuild_search_index()
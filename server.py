@@ -1,12 +1,94 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse, HTMLResponse, Response
 import os
 import json
-import glob
+import time
+import datetime
+import threading
+from contextlib import asynccontextmanager
+from typing import Optional
+from report_archive import ReportArchive
+from report_cache import ReportCache, cached_json_response
+from report_events import ReportWatcher, EventBroadcaster
+import report_catalog
+import search_index
+import trends
+import metrics
 
-app = FastAPI()
+# Reports are read from the compressed archive; JSON reports from older runs are migrated on first start
+archive = ReportArchive()
+
+# Encoded report bodies, so repeat requests skip decompression and JSON encoding
+report_cache = ReportCache()
+
+# New reports are pushed to dashboards over SSE instead of being polled for
+report_watcher = ReportWatcher(archive)
+report_events = EventBroadcaster()
+report_watcher.add_listener(report_events.publish)
+
+
+REQUEST_SECONDS = metrics.histogram("http_request_seconds", "Time until the response headers are sent, per route",
+                                    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 10.0))
+REQUESTS = metrics.counter("http_requests", "Requests per route, method and status code")
+
+
+class RequestMetricsMiddleware:
+    """
+    Records latency and status per route template (e.g. /api/reports/{date_str}).
+
+    Plain ASGI rather than BaseHTTPMiddleware, so responses are not re-wrapped,
+    and timed until the headers go out, so an open event stream counts once.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        responded = False
+
+        def record(status: int):
+            route = scope.get("route")
+            if route is not None:
+                path = route.path
+            elif "endpoint" in scope:
+                # Mounted apps (the static dashboard) only leave their mount path behind
+                path = scope.get("root_path") or "/"
+            else:
+                path = "unmatched"
+            labels = {"route": path, "method": scope["method"]}
+            REQUEST_SECONDS.observe(time.perf_counter() - started, **labels)
+            REQUESTS.inc(status=status, **labels)
+
+        async def send_with_metrics(message):
+            nonlocal responded
+            if message["type"] == "http.response.start":
+                responded = True
+                record(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        except Exception:
+            if not responded:
+                record(500)
+            raise
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    report_watcher.start()
+    yield
+    report_watcher.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Allow frontend JS to call API
 app.add_middleware(
@@ -17,58 +99,171 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(RequestMetricsMiddleware)
+
 # Serve frontend
 app.mount("/app", StaticFiles(directory="web", html=True), name="web")
 
+# Lessons generated on demand for reports written with --lazy-lessons
+LESSONS_DIR = os.path.join("reports", "lessons")
+_lesson_locks = {}
+_lesson_locks_guard = threading.Lock()
 
-@app.get("/api/latest")
-def get_latest():
-    latest_path = os.path.join("reports", "latest.json")
 
-    if not os.path.exists(latest_path):
+def _report_response(request: Request, entry):
+    # The archive record identifies the stored version, so a rewritten report gets a fresh body
+    body = report_cache.get(entry.date, (entry.segment, entry.offset), lambda: archive.read_entry(entry))
+    return cached_json_response(request, body)
+
+
+@app.get("/api/latest")
+def get_latest(request: Request):
+    entry = archive.latest_entry()
+    if entry is None:
         return JSONResponse(status_code=404, content={"detail": "Latest report not found"})
 
-    with open(latest_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    return _report_response(request, entry)
+
 
-    return data
+def _invalid_dates(**params: Optional[str]) -> Optional[JSONResponse]:
+    """A 400 response for the first given parameter that is not a real YYYY-MM-DD date, else None."""
+    for name, value in params.items():
+        if not value:
+            continue
+        try:
+            if not report_catalog.DATE_RE.match(value):
+                raise ValueError(value)
+            datetime.date.fromisoformat(value)
+        except ValueError:
+            return JSONResponse(status_code=400, content={"detail": f"'{name}' must be a valid YYYY-MM-DD date"})
+    return None
 
 
 @app.get("/api/reports")
-def list_reports():
-    files = sorted(glob.glob(os.path.join("reports", "*.json")), reverse=True)
+def list_reports(limit: int = report_catalog.DEFAULT_PAGE_SIZE,
+                 cursor: Optional[str] = None,
+                 date_from: Optional[str] = Query(None, alias="from"),
+                 date_to: Optional[str] = Query(None, alias="to")):
+    error = _invalid_dates(cursor=cursor, **{"from": date_from, "to": date_to})
+    if error:
+        return error
 
-    dates = []
-    for fpath in files:
-        name = os.path.basename(fpath)
-        if name.lower() == "latest.json":
-            continue
-        if name.endswith(".json") and len(name) == len("YYYY-MM-DD.json"):
-            dates.append(name.replace(".json", ""))
+    items, next_cursor = report_catalog.list_reports(limit, cursor, date_from, date_to)
 
-    return {"reports": dates}
+    return {"reports": [item["date"] for item in items], "items": items, "next_cursor": next_cursor}
 
 
 @app.get("/api/reports/{date_str}")
-def get_report(date_str: str):
-    path = os.path.join("reports", f"{date_str}.json")
+def get_report(request: Request, date_str: str):
+    entry = archive.entry(date_str)
+    if entry is None:
+        return JSONResponse(status_code=404, content={"detail": f"Report for {date_str} not found"})
 
-    if not os.path.exists(path):
-        return JSONResponse(status_code=404, content={"detail": f"{date_str}.json not found"})
+    return _report_response(request, entry)
 
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
 
-    return data
+@app.get("/api/reports/{date_str}/lessons/{rank}")
+def get_lesson(date_str: str, rank: int):
+    """Returns the lesson for one ranked attack, generating and caching it on first request."""
+    data = archive.read(date_str)
+    if data is None:
+        return JSONResponse(status_code=404, content={"detail": f"Report for {date_str} not found"})
 
+    for lesson in data.get("lessons", []):
+        if lesson.get("rank") == rank:
+            return lesson
 
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    attack = next((a for a in data.get("top_10_attacks", []) if a.get("rank") == rank), None)
+    if attack is None or rank > data.get("lazy_lessons", 0):
+        return JSONResponse(status_code=404, content={"detail": f"No lesson available for rank {rank} on {date_str}"})
+
+    lesson_path = os.path.join(LESSONS_DIR, f"{date_str}-{rank}.json")
+    # One generation per lesson even when several dashboards ask at once
+    with _lesson_locks_guard:
+        lock = _lesson_locks.setdefault(lesson_path, threading.Lock())
+    with lock:
+        if os.path.exists(lesson_path):
+            with open(lesson_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+
+        from lessons import generate_lesson
+        try:
+            lesson = generate_lesson(attack)
+        except Exception as e:
+            return JSONResponse(status_code=502, content={"detail": f"Lesson generation failed: {e}"})
+
+        os.makedirs(LESSONS_DIR, exist_ok=True)
+        tmp_path = f"{lesson_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(lesson, f, indent=2)
+        os.replace(tmp_path, lesson_path)
+
+    return lesson
+
+
+@app.get("/api/reports/{date_str}/snapshot")
+def get_snapshot(date_str: str):
+    """Static HTML rendering of one report, written by main.py or rendered on demand for older reports."""
+    if not report_catalog.DATE_RE.match(date_str):
+        return JSONResponse(status_code=400, content={"detail": "Date must be YYYY-MM-DD"})
+
+    # Jinja2 is only loaded once a snapshot is requested, not on every server start
+    import renderer
+
+    path = os.path.join(renderer.SNAPSHOTS_DIR, f"{date_str}.html")
+    if os.path.exists(path):
+        return FileResponse(path, media_type="text/html")
+
+    data = archive.read(date_str)
+    if data is None:
+        return JSONResponse(status_code=404, content={"detail": f"Report for {date_str} not found"})
+
+    return HTMLResponse(renderer.render(renderer.SNAPSHOT_TEMPLATE, renderer.report_context(data, date_str)))
 
-    app.mount("/", StaticFiles(directory="web", html=True), name="root")
 
-    from fastapi.responses import FileResponse
+@app.get("/api/search")
+def search_reports(q: str, limit: int = search_index.DEFAULT_RESULTS, offset: int = 0):
+    """Ranked full-text search over attack titles, summaries, sources and lesson text."""
+    try:
+        results = search_index.search(q, limit, offset)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"detail": str(e)})
+
+    return {"query": q, "results": results}
+
+
+@app.get("/api/trends")
+def get_trends(date_from: Optional[str] = Query(None, alias="from"),
+               date_to: Optional[str] = Query(None, alias="to"),
+               granularity: str = "day",
+               top: int = trends.TOP_ENTRIES):
+    """Attack counts over time, source frequency and recurring threats for a date window."""
+    error = _invalid_dates(**{"from": date_from, "to": date_to})
+    if error:
+        return error
+    if granularity not in ("day", "week"):
+        return JSONResponse(status_code=400, content={"detail": "'granularity' must be 'day' or 'week'"})
+
+    return trends.get_trends(date_from, date_to, granularity, max(1, min(top, 50)))
+
+
+@app.get("/api/events")
+async def events():
+    """Server-Sent Events stream of "report" (a dated report was written) and "latest" events."""
+    client = report_events.subscribe()
+    return StreamingResponse(
+        report_events.stream(client),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus metrics: this server's request timings plus the last saved run of main.py and the outbox drain."""
+    body = metrics.render_prometheus(metrics.REGISTRY.collect(process="server") + metrics.load_textfiles())
+    return Response(body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
 
 @app.get("/favicon.ico")
 def favicon():
@@ -77,6 +272,7 @@ def favicon():
         return FileResponse(path)
     return JSONResponse(status_code=404, content={"detail": "Not found"})
 
-    <<<<<<<
-=======
->>>>>>>
\ No newline at end of file
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8001)
@@ -0,0 +1,117 @@
+"""
+Near-duplicate clustering: cross-outlet copies of one story merge, templated headlines about different stories do not.
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedup import cluster_articles, dedupe_articles  # noqa: E402
+
+# The same story as written up by two outlets
+SAME_STORY = [
+    (("Fortinet warns of critical FortiOS SSL VPN flaw exploited in attacks",
+      "Fortinet is warning that a critical remote code execution vulnerability in FortiOS SSL VPN, tracked as "
+      "CVE-2024-21762, is potentially being exploited in attacks. The flaw is an out-of-bounds write that allows "
+      "unauthenticated attackers to execute arbitrary code via specially crafted HTTP requests. Admins are urged "
+      "to upgrade or disable SSL VPN."),
+     ("Critical Fortinet FortiOS vulnerability likely exploited in the wild",
+      "Fortinet disclosed a critical out-of-bounds write vulnerability in FortiOS SSL VPN, CVE-2024-21762, that "
+      "could allow a remote unauthenticated attacker to execute arbitrary code via crafted HTTP requests. The "
+      "company says the flaw is potentially being exploited in the wild and recommends upgrading or disabling "
+      "the SSL VPN.")),
+    (("Ivanti Connect Secure zero-days exploited by Chinese hackers",
+      "Two zero-day vulnerabilities in Ivanti Connect Secure and Policy Secure gateways, CVE-2023-46805 and "
+      "CVE-2024-21887, are being chained by suspected Chinese state hackers to achieve unauthenticated remote "
+      "code execution. Ivanti released a mitigation and says patches will be available later this month."),
+     ("Ivanti warns of two Connect Secure zero-days under active exploitation",
+      "Ivanti says suspected Chinese nation-state attackers are chaining two zero-days, an authentication bypass "
+      "CVE-2023-46805 and a command injection CVE-2024-21887, in Connect Secure and Policy Secure gateways to "
+      "gain remote code execution without authentication. A mitigation is available now and patches are due "
+      "later this month.")),
+    (("LockBit claims ransomware attack on Boeing",
+      "The LockBit ransomware gang claims to have stolen a large amount of sensitive data from aerospace giant "
+      "Boeing and threatens to publish it unless the company pays a ransom before the deadline. Boeing says it "
+      "is assessing the claim."),
+     ("Boeing assessing LockBit hacking gang threat of sensitive data leak",
+      "Aerospace company Boeing said it is assessing a claim by the LockBit ransomware gang, which says it stole "
+      "a tremendous amount of sensitive data and will publish it if Boeing does not pay a ransom by the "
+      "deadline.")),
+    (("Citrix Bleed exploited to hijack NetScaler sessions",
+      "Attackers are exploiting the Citrix Bleed vulnerability, CVE-2023-4966, in NetScaler ADC and Gateway "
+      "appliances to hijack authenticated sessions and bypass multi-factor authentication. Citrix urges admins "
+      "to patch and kill all active sessions."),
+     ("Citrix urges admins to patch NetScaler Citrix Bleed flaw immediately",
+      "Citrix is urging admins to immediately patch NetScaler ADC and Gateway appliances against the actively "
+      "exploited Citrix Bleed flaw, CVE-2023-4966, which lets attackers hijack authenticated sessions and "
+      "bypass MFA, and to terminate all active and persistent sessions.")),
+]
+
+# Different stories that share a headline template and most of the surrounding wording
+TEMPLATED = [
+    (("Critical Fortinet FortiOS flaw exploited in attacks",
+      "A critical vulnerability in Fortinet FortiOS is being actively exploited in attacks, the vendor warned. "
+      "Admins are urged to apply the security updates as soon as possible."),
+     ("Critical Ivanti Connect Secure flaw exploited in attacks",
+      "A critical vulnerability in Ivanti Connect Secure is being actively exploited in attacks, the vendor "
+      "warned. Admins are urged to apply the security updates as soon as possible.")),
+    (("LockBit ransomware gang claims attack on Boeing",
+      "The LockBit ransomware gang claims attack on Boeing and threatens to leak stolen data on its dark web "
+      "leak site unless a ransom is paid."),
+     ("Play ransomware gang claims attack on City of Oakland",
+      "The Play ransomware gang claims attack on City of Oakland and threatens to leak stolen data on its dark "
+      "web leak site unless a ransom is paid.")),
+    (("CISA adds three vulnerabilities to KEV catalog",
+      "CISA adds three vulnerabilities to its Known Exploited Vulnerabilities catalog based on evidence of "
+      "active exploitation: CVE-2023-22518, CVE-2023-46604 and CVE-2023-47246. Federal agencies must patch "
+      "within three weeks."),
+     ("CISA adds Cisco IOS XE flaw to KEV catalog",
+      "CISA adds the Cisco IOS XE flaw CVE-2023-20198 to its Known Exploited Vulnerabilities catalog based on "
+      "evidence of active exploitation. Federal agencies must patch within three weeks.")),
+]
+
+
+def _articles(pair, offset=0):
+    return [{"title": title, "description": description, "link": f"https://outlet{offset + i}.example.com/story",
+             "source": f"Outlet {offset + i}"}
+            for i, (title, description) in enumerate(pair)]
+
+
+@pytest.mark.parametrize("pair", SAME_STORY, ids=lambda pair: pair[0][0][:30])
+def test_cross_outlet_copies_merge(pair):
+    assert cluster_articles(_articles(pair)) == [[0, 1]]
+
+
+@pytest.mark.parametrize("pair", TEMPLATED, ids=lambda pair: pair[0][0][:30])
+def test_templated_headlines_stay_separate(pair):
+    assert cluster_articles(_articles(pair)) == [[0], [1]]
+
+
+def test_mixed_day_keeps_every_story():
+    articles = []
+    for pair in SAME_STORY + TEMPLATED:
+        articles.extend(_articles(pair, offset=len(articles)))
+    deduped = dedupe_articles(articles, skip_seen=False)
+    assert len(deduped) == len(SAME_STORY) + 2 * len(TEMPLATED)
+
+
+def test_clusters_do_not_chain_through_members():
+    # B is close to both A and C, but A and C name different products and stay apart
+    a = ("Critical Fortinet FortiOS flaw exploited in attacks",
+         "A critical vulnerability in Fortinet FortiOS is being actively exploited in attacks, the vendor warned.")
+    b = ("Critical firewall flaw exploited in attacks",
+         "A critical vulnerability in a firewall is being actively exploited in attacks, the vendor warned.")
+    c = ("Critical Ivanti Connect Secure flaw exploited in attacks",
+         "A critical vulnerability in Ivanti Connect Secure is being actively exploited in attacks, the vendor warned.")
+    clusters = cluster_articles(_articles([a, b, c]))
+    assert not any(0 in cluster and 2 in cluster for cluster in clusters)
+
+
+def test_empty_articles_are_never_merged():
+    articles = [{"title": "", "description": ""}, {"title": "", "description": "<p></p>"},
+                {"title": "", "description": "   "}]
+    assert cluster_articles(articles) == [[0], [1], [2]]
@@ -0,0 +1,295 @@
+"""
+Outbox delivery against in-process SMTP and Telegram stand-ins: enqueue -> drain, retries and permanent failures.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import json
+import socket
+import sqlite3
+import threading
+import socketserver
+from email import message_from_bytes
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import outbox  # noqa: E402
+from notifier import build_email_messages  # noqa: E402
+
+REPORT = {
+    "top_10_attacks": [{"rank": 1, "title": "Test Exploit", "source": "Test Source",
+                        "link": "https://example.com/1", "summary": "Bad vulnerability."}],
+    "lessons": [],
+}
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """Accepts every message except for recipients mapped to a reply code in `refuse`."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, refuse=None):
+        self.refuse = refuse or {}
+        self.received = []
+        super().__init__(("127.0.0.1", 0), _SMTPHandler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        def reply(line):
+            self.wfile.write(f"{line}\r\n".encode("ascii"))
+
+        reply("220 test sink")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("utf-8", "replace").strip()
+            verb = command.upper()
+            if verb.startswith("RCPT TO:"):
+                address = command[len("RCPT TO:"):].strip().strip("<>")
+                code = self.server.refuse.get(address)
+                reply(f"{code} refused" if code else "250 ok")
+            elif verb == "DATA":
+                reply("354 end with <CRLF>.<CRLF>")
+                lines = []
+                for data in iter(self.rfile.readline, b""):
+                    if data == b".\r\n":
+                        break
+                    lines.append(data)
+                self.server.received.append(message_from_bytes(b"".join(lines)))
+                reply("250 queued")
+            elif verb == "QUIT":
+                reply("221 bye")
+                return
+            else:
+                reply("250 ok")
+
+
+class TelegramStub(ThreadingHTTPServer):
+    """Bot API stand-in that answers sendMessage with 200 unless the chat is mapped to a status in `replies`."""
+    daemon_threads = True
+
+    def __init__(self, replies=None):
+        self.replies = replies or {}
+        self.received = []
+        super().__init__(("127.0.0.1", 0), _TelegramHandler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _TelegramHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.received.append((self.path, payload))
+        status = self.server.replies.get(payload["chat_id"], 200)
+        body = json.dumps({"ok": status == 200, "error_code": status}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+TOKEN = "123456:test-token"
+
+
+@pytest.fixture
+def telegram_env(monkeypatch):
+    def configure(url):
+        monkeypatch.setenv("TELEGRAM_BOT_TOKEN", TOKEN)
+        monkeypatch.setenv("TELEGRAM_API_URL", url)
+
+    return configure
+
+
+@pytest.fixture
+def smtp_env(monkeypatch):
+    def configure(port):
+        monkeypatch.setenv("SMTP_SERVER", "127.0.0.1")
+        monkeypatch.setenv("SMTP_PORT", str(port))
+        monkeypatch.setenv("SMTP_STARTTLS", "false")
+        monkeypatch.setenv("SMTP_FROM", "bot@example.com")
+        monkeypatch.delenv("SMTP_USERNAME", raising=False)
+        monkeypatch.delenv("SMTP_PASSWORD", raising=False)
+
+    return configure
+
+
+@pytest.fixture
+def outbox_path(tmp_path):
+    return str(tmp_path / "outbox.db")
+
+
+def _message(recipient):
+    return {"channel": "email", "recipient": recipient, "subject": "Report", "body": "<p>report</p>",
+            "text_body": "report"}
+
+
+def _telegram(chat_id):
+    return {"channel": "telegram", "recipient": chat_id, "subject": "", "body": "*report*"}
+
+
+def _rows(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {recipient: (status, attempts) for recipient, status, attempts in
+                conn.execute("SELECT recipient, status, attempts FROM messages")}
+    finally:
+        conn.close()
+
+
+def _last_errors(path):
+    conn = sqlite3.connect(path)
+    try:
+        return dict(conn.execute("SELECT recipient, last_error FROM messages"))
+    finally:
+        conn.close()
+
+
+def _fast_retries(monkeypatch):
+    # Short enough for a test, long enough that one drain(wait=False) pass makes a single attempt
+    monkeypatch.setattr(outbox, "RETRY_BACKOFF", 0.1)
+    monkeypatch.setattr(outbox, "MAX_BACKOFF", 0.1)
+
+
+def _closed_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_drain_delivers_and_records_permanent_rejections(smtp_env, outbox_path):
+    sink = SMTPSink(refuse={"gone@example.com": 550})
+    smtp_env(sink.port)
+    try:
+        assert outbox.enqueue([_message("analyst@example.com"), _message("gone@example.com")], outbox_path) == 2
+        stats = outbox.drain(outbox_path, wait=False)
+    finally:
+        sink.shutdown()
+
+    assert stats == {"sent": 1, "failed": 1, "retrying": 0}
+    assert _rows(outbox_path) == {"analyst@example.com": ("sent", 0), "gone@example.com": ("failed", 1)}
+    assert len(sink.received) == 1
+    assert sink.received[0]["From"] == "bot@example.com"
+    assert sink.received[0]["To"] == "analyst@example.com"
+
+
+def test_enqueue_skips_messages_already_sent(smtp_env, outbox_path):
+    sink = SMTPSink()
+    smtp_env(sink.port)
+    try:
+        outbox.enqueue([_message("analyst@example.com")], outbox_path)
+        outbox.drain(outbox_path, wait=False)
+        assert outbox.enqueue([_message("analyst@example.com")], outbox_path) == 0
+    finally:
+        sink.shutdown()
+    assert len(sink.received) == 1
+
+
+def test_unreachable_server_is_retried_until_delivered(smtp_env, outbox_path, monkeypatch):
+    _fast_retries(monkeypatch)
+    smtp_env(_closed_port())
+    outbox.enqueue([_message("analyst@example.com")], outbox_path)
+
+    stats = outbox.drain(outbox_path, wait=False)
+    assert stats == {"sent": 0, "failed": 0, "retrying": 1}
+    assert _rows(outbox_path) == {"analyst@example.com": ("pending", 1)}
+
+    sink = SMTPSink()
+    smtp_env(sink.port)
+    try:
+        stats = outbox.drain(outbox_path, wait=True)
+    finally:
+        sink.shutdown()
+    assert stats == {"sent": 1, "failed": 0, "retrying": 0}
+    assert _rows(outbox_path) == {"analyst@example.com": ("sent", 1)}
+    assert len(sink.received) == 1
+
+
+def test_temporary_recipient_refusal_is_retried(smtp_env, outbox_path, monkeypatch):
+    _fast_retries(monkeypatch)
+    sink = SMTPSink(refuse={"busy@example.com": 451})
+    smtp_env(sink.port)
+    try:
+        outbox.enqueue([_message("busy@example.com")], outbox_path)
+        assert outbox.drain(outbox_path, wait=False)["retrying"] == 1
+
+        sink.refuse.clear()
+        assert outbox.drain(outbox_path, wait=True)["sent"] == 1
+    finally:
+        sink.shutdown()
+    assert _rows(outbox_path) == {"busy@example.com": ("sent", 1)}
+
+
+def test_retries_stop_after_max_attempts(smtp_env, outbox_path, monkeypatch):
+    _fast_retries(monkeypatch)
+    smtp_env(_closed_port())
+    outbox.enqueue([_message("analyst@example.com")], outbox_path)
+
+    stats = outbox.drain(outbox_path, wait=True)
+    assert stats == {"sent": 0, "failed": 1, "retrying": 0}
+    assert _rows(outbox_path) == {"analyst@example.com": ("failed", outbox.MAX_ATTEMPTS)}
+
+
+def test_email_needs_a_sender_address(smtp_env, monkeypatch):
+    smtp_env(25)
+    monkeypatch.setenv("RECEIVER_EMAIL", "analyst@example.com")
+    assert [m["recipient"] for m in build_email_messages(REPORT)] == ["analyst@example.com"]
+
+    monkeypatch.delenv("SMTP_FROM")
+    assert build_email_messages(REPORT) == []
+
+    monkeypatch.setenv("SMTP_USERNAME", "user@example.com")
+    assert len(build_email_messages(REPORT)) == 1
+
+
+def test_telegram_rejections_are_permanent_and_rate_limits_retried(telegram_env, outbox_path, monkeypatch):
+    _fast_retries(monkeypatch)
+    stub = TelegramStub(replies={"bad": 400, "limited": 429, "down": 500})
+    telegram_env(stub.url)
+    try:
+        outbox.enqueue([_telegram(chat) for chat in ("ok", "bad", "limited", "down")], outbox_path)
+        stats = outbox.drain(outbox_path, wait=False)
+        assert stats == {"sent": 1, "failed": 1, "retrying": 2}
+        assert _rows(outbox_path) == {"ok": ("sent", 0), "bad": ("failed", 1),
+                                      "limited": ("pending", 1), "down": ("pending", 1)}
+
+        stub.replies = {"bad": 400}
+        stats = outbox.drain(outbox_path, wait=True)
+    finally:
+        stub.shutdown()
+
+    assert stats == {"sent": 2, "failed": 0, "retrying": 0}
+    assert _rows(outbox_path) == {"ok": ("sent", 0), "bad": ("failed", 1),
+                                  "limited": ("sent", 1), "down": ("sent", 1)}
+    # The rejected message is not sent again once it has failed permanently
+    assert [payload["chat_id"] for _, payload in stub.received].count("bad") == 1
+    assert {path for path, _ in stub.received} == {f"/bot{TOKEN}/sendMessage"}
+    assert "400" in _last_errors(outbox_path)["bad"]
+
+
+def test_telegram_errors_do_not_leak_the_bot_token(telegram_env, outbox_path, monkeypatch):
+    _fast_retries(monkeypatch)
+    telegram_env(f"http://127.0.0.1:{_closed_port()}")
+    outbox.enqueue([_telegram("ok")], outbox_path)
+
+    assert outbox.drain(outbox_path, wait=False)["retrying"] == 1
+    error = _last_errors(outbox_path)["ok"]
+    assert "<token>" in error
+    assert TOKEN not in error
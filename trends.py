@@ -0,0 +1,222 @@
+import sqlite3
+import logging
+import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+from report_catalog import REPORT_INDEX_PATH, REPORTS_DIR, iter_reports, connect as connect_index
+from dedup import normalize_text
+from ranker import extract_cves, extract_actors
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DEFAULT_WINDOW_DAYS = 30
+TOP_ENTRIES = 10
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS trend_day (
+        date TEXT PRIMARY KEY,
+        attacks INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS trend_week (
+        week TEXT PRIMARY KEY,
+        attacks INTEGER NOT NULL,
+        reports INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS trend_source_day (
+        date TEXT NOT NULL,
+        source TEXT NOT NULL,
+        attacks INTEGER NOT NULL,
+        PRIMARY KEY (date, source)
+    );
+    CREATE TABLE IF NOT EXISTS trend_entity_day (
+        date TEXT NOT NULL,
+        entity TEXT NOT NULL,
+        PRIMARY KEY (date, entity)
+    );
+    CREATE INDEX IF NOT EXISTS trend_entity_day_entity ON trend_entity_day (entity, date);
+    CREATE TABLE IF NOT EXISTS trend_entity (
+        entity TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        label TEXT NOT NULL,
+        days_seen INTEGER NOT NULL,
+        first_seen TEXT NOT NULL,
+        last_seen TEXT NOT NULL,
+        current_streak INTEGER NOT NULL,
+        longest_streak INTEGER NOT NULL
+    );
+"""
+
+
+def connect(path: str = REPORT_INDEX_PATH) -> sqlite3.Connection:
+    """Opens the report index with the rollup tables, backfilling them when they are first created."""
+    conn = connect_index(path)
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'trend_day'").fetchone()
+    conn.executescript(_SCHEMA)
+    if not exists:
+        count = 0
+        for date_str, data, _ in iter_reports(REPORTS_DIR):
+            _apply_report(conn, date_str, data)
+            count += 1
+        conn.commit()
+        if count:
+            logging.info(f"Trend rollups backfilled from {count} existing reports")
+    return conn
+
+
+def iso_week(date_str: str) -> str:
+    year, week, _ = datetime.date.fromisoformat(date_str).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def report_entities(data: Dict[str, Any]) -> Dict[str, Tuple[str, str]]:
+    """
+    Extracts the entities a report mentions, keyed for cross-day matching.
+
+    Returns {key: (kind, label)} for CVE ids, known threat actors / malware
+    families and normalized attack titles.
+    """
+    entities = {}
+    for attack in data.get("top_10_attacks", []):
+        text = f"{attack.get('title', '')} {attack.get('summary', '')}"
+        for cve in extract_cves(text):
+            entities[f"cve:{cve}"] = ("cve", cve)
+        for actor in extract_actors(text):
+            entities[f"actor:{actor}"] = ("actor", actor.title())
+        title = normalize_text(attack.get("title", ""))
+        if title:
+            entities[f"title:{title}"] = ("title", attack.get("title", "").strip())
+    return entities
+
+
+def _streaks(dates: List[str]) -> Tuple[int, int]:
+    """Returns (streak ending at the last date, longest streak) of consecutive days."""
+    longest = current = 0
+    previous = None
+    for date_str in dates:
+        day = datetime.date.fromisoformat(date_str)
+        current = current + 1 if previous and (day - previous).days == 1 else 1
+        longest = max(longest, current)
+        previous = day
+    return current, longest
+
+
+def _refresh_entity(conn: sqlite3.Connection, entity: str, kind: str, label: str):
+    dates = [row[0] for row in conn.execute(
+        "SELECT date FROM trend_entity_day WHERE entity = ? ORDER BY date", (entity,))]
+    if not dates:
+        conn.execute("DELETE FROM trend_entity WHERE entity = ?", (entity,))
+        return
+    current, longest = _streaks(dates)
+    conn.execute(
+        "INSERT OR REPLACE INTO trend_entity "
+        "(entity, kind, label, days_seen, first_seen, last_seen, current_streak, longest_streak) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (entity, kind, label, len(dates), dates[0], dates[-1], current, longest)
+    )
+
+
+def _apply_report(conn: sqlite3.Connection, date_str: str, data: Dict[str, Any]):
+    """Folds one report into the rollups, first removing what an earlier version of it contributed."""
+    week = iso_week(date_str)
+    attacks = data.get("top_10_attacks", [])
+
+    previous = conn.execute("SELECT attacks FROM trend_day WHERE date = ?", (date_str,)).fetchone()
+    if previous:
+        conn.execute("UPDATE trend_week SET attacks = attacks - ?, reports = reports - 1 WHERE week = ?",
+                     (previous[0], week))
+        conn.execute("DELETE FROM trend_source_day WHERE date = ?", (date_str,))
+    stale = {row[0]: (row[1], row[2]) for row in conn.execute(
+        "SELECT d.entity, e.kind, e.label FROM trend_entity_day d JOIN trend_entity e USING (entity) "
+        "WHERE d.date = ?", (date_str,))}
+    conn.execute("DELETE FROM trend_entity_day WHERE date = ?", (date_str,))
+
+    conn.execute("INSERT OR REPLACE INTO trend_day (date, attacks) VALUES (?, ?)", (date_str, len(attacks)))
+    conn.execute(
+        "INSERT INTO trend_week (week, attacks, reports) VALUES (?, ?, 1) "
+        "ON CONFLICT (week) DO UPDATE SET attacks = attacks + excluded.attacks, reports = reports + 1",
+        (week, len(attacks))
+    )
+
+    per_source: Dict[str, int] = {}
+    for attack in attacks:
+        source = attack.get("source") or "Unknown"
+        per_source[source] = per_source.get(source, 0) + 1
+    conn.executemany("INSERT INTO trend_source_day (date, source, attacks) VALUES (?, ?, ?)",
+                     [(date_str, source, count) for source, count in per_source.items()])
+
+    entities = report_entities(data)
+    conn.executemany("INSERT INTO trend_entity_day (date, entity) VALUES (?, ?)",
+                     [(date_str, entity) for entity in entities])
+    # Only entities touched by this report need their streaks recomputed
+    for entity, (kind, label) in {**stale, **entities}.items():
+        _refresh_entity(conn, entity, kind, label)
+
+
+def update_trends(date_str: str, data: Dict[str, Any], path: str = REPORT_INDEX_PATH):
+    """Updates the rollups for one new (or rewritten) report."""
+    conn = connect(path)
+    try:
+        with conn:
+            _apply_report(conn, date_str, data)
+    finally:
+        conn.close()
+
+
+def get_trends(date_from: Optional[str] = None, date_to: Optional[str] = None,
+               granularity: str = "day", top: int = TOP_ENTRIES,
+               path: str = REPORT_INDEX_PATH) -> Dict[str, Any]:
+    """
+    Reads the rollups for a time window (inclusive dates, default the last 30 days).
+
+    Returns attack counts per day or ISO week, the most frequent sources, and
+    the entities that recur on two or more days of the window with their
+    streaks. Every query is bounded by the window, not by the history size.
+    """
+    if date_to is None:
+        date_to = datetime.date.today().isoformat()
+    if date_from is None:
+        date_from = (datetime.date.fromisoformat(date_to) - datetime.timedelta(days=DEFAULT_WINDOW_DAYS - 1)).isoformat()
+
+    conn = connect(path)
+    try:
+        if granularity == "week":
+            rows = conn.execute(
+                "SELECT week, attacks, reports FROM trend_week WHERE week BETWEEN ? AND ? ORDER BY week",
+                (iso_week(date_from), iso_week(date_to))
+            ).fetchall()
+            series = [{"period": week, "attacks": attacks, "reports": reports} for week, attacks, reports in rows]
+        else:
+            rows = conn.execute(
+                "SELECT date, attacks FROM trend_day WHERE date BETWEEN ? AND ? ORDER BY date",
+                (date_from, date_to)
+            ).fetchall()
+            series = [{"period": date, "attacks": attacks, "reports": 1} for date, attacks in rows]
+
+        sources = [
+            {"source": source, "attacks": attacks, "days": days}
+            for source, attacks, days in conn.execute(
+                "SELECT source, SUM(attacks), COUNT(*) FROM trend_source_day WHERE date BETWEEN ? AND ? "
+                "GROUP BY source ORDER BY SUM(attacks) DESC LIMIT ?",
+                (date_from, date_to, top)
+            )
+        ]
+
+        recurring = [
+            {"entity": entity, "kind": kind, "label": label, "days_in_window": days,
+             "days_seen": days_seen, "first_seen": first_seen, "last_seen": last_seen,
+             "current_streak": current_streak, "longest_streak": longest_streak}
+            for entity, days, kind, label, days_seen, first_seen, last_seen, current_streak, longest_streak
+            in conn.execute(
+                "SELECT d.entity, COUNT(*) AS days, e.kind, e.label, e.days_seen, e.first_seen, e.last_seen, "
+                "e.current_streak, e.longest_streak "
+                "FROM trend_entity_day d JOIN trend_entity e USING (entity) "
+                "WHERE d.date BETWEEN ? AND ? GROUP BY d.entity HAVING COUNT(*) >= 2 "
+                "ORDER BY days DESC, e.last_seen DESC LIMIT ?",
+                (date_from, date_to, top)
+            )
+        ]
+    finally:
+        conn.close()
+
+    return {"from": date_from, "to": date_to, "granularity": granularity,
+            "series": series, "sources": sources, "recurring": recurring}
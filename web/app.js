@@ -1,20 +1,82 @@
 document.addEventListener('DOMContentLoaded', () => {
     fetchAvailableDates();
+    subscribeToReportEvents();
+    
+    document.getElementById('trends-btn').onclick = () => loadTrends(30, 'day');
+    document.querySelectorAll('.trend-window').forEach(btn => {
+        btn.onclick = () => loadTrends(Number(btn.dataset.days), btn.dataset.granularity);
+    });
 });
 
-async function fetchAvailableDates() {
+const PAGE_SIZE = 30;
+
+// Report text comes from the model, so it is escaped before it reaches innerHTML
+function escapeHtml(value) {
+    return String(value ?? '').replace(/[&<>"']/g, ch => (
+        { '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' }[ch]
+    ));
+}
+
+function safeUrl(url) {
+    return /^https?:\/\//i.test(url || '') ? url : null;
+}
+
+// Date of the report on screen, and whether it is the newest one (so new reports replace it)
+let currentDate = null;
+let followingLatest = true;
+
+function subscribeToReportEvents() {
+    if (!window.EventSource) return;
+    
+    const source = new EventSource('/api/events');
+    let reconnecting = false;
+    
+    source.addEventListener('report', (e) => {
+        const { date } = JSON.parse(e.data);
+        const known = document.querySelector(`.date-btn[data-date="${date}"]`);
+        
+        if (!known) {
+            // Re-list so the new date lands in order; keeps the current view unless it was the newest
+            fetchAvailableDates(null, followingLatest);
+        } else if (date === currentDate && !document.getElementById('dashboard-content').classList.contains('hidden')) {
+            loadReport(date, known);
+        }
+    });
+    
+    // Events sent while disconnected are lost, so resynchronize after a reconnect
+    source.onerror = () => { reconnecting = true; };
+    source.onopen = () => {
+        if (reconnecting) {
+            reconnecting = false;
+            fetchAvailableDates(null, followingLatest);
+        }
+    };
+}
+
+
+async function fetchAvailableDates(cursor = null, autoLoad = true) {
     const listContainer = document.getElementById('date-list');
     
     try {
-        const response = await fetch('/api/reports');
+        const params = new URLSearchParams({ limit: PAGE_SIZE });
+        if (cursor) params.set('cursor', cursor);
+        
+        const response = await fetch(`/api/reports?${params}`);
         const data = await response.json();
         
-        listContainer.innerHTML = '';
+        // First page replaces the loading placeholder, later pages replace the "load more" button
+        if (cursor) {
+            const moreBtn = document.getElementById('load-more-dates');
+            if (moreBtn) moreBtn.remove();
+        } else {
+            listContainer.innerHTML = '';
+        }
         
         if (data.reports && data.reports.length > 0) {
             data.reports.forEach((dateStr, index) => {
                 const btn = document.createElement('button');
                 btn.className = 'date-btn';
+                btn.dataset.date = dateStr;
                 
                 // Format date nicely
                 const dateObj = new Date(dateStr);
@@ -26,11 +88,22 @@ async function fetchAvailableDates() {
                 listContainer.appendChild(btn);
                 
                 // Auto load the most recent report on first load
-                if (index === 0) {
+                if (index === 0 && !cursor && autoLoad) {
                     loadReport(dateStr, btn);
+                } else if (dateStr === currentDate) {
+                    btn.classList.add('active');
                 }
             });
-        } else {
+            
+            if (data.next_cursor) {
+                const moreBtn = document.createElement('button');
+                moreBtn.id = 'load-more-dates';
+                moreBtn.className = 'date-btn';
+                moreBtn.innerHTML = '<span>⏬</span> Older reports';
+                moreBtn.onclick = () => fetchAvailableDates(data.next_cursor);
+                listContainer.appendChild(moreBtn);
+            }
+        } else if (!cursor) {
             listContainer.innerHTML = '<p style="color:var(--text-muted); padding:10px;">No reports generated yet. Run main.py first.</p>';
         }
     } catch (err) {
@@ -39,6 +112,104 @@ async function fetchAvailableDates() {
     }
 }
 
+async function loadTrends(days, granularity) {
+    document.querySelectorAll('.date-btn').forEach(btn => btn.classList.remove('active'));
+    document.getElementById('trends-btn').classList.add('active');
+    currentDate = null;
+    followingLatest = false;
+    document.querySelectorAll('.trend-window').forEach(btn => {
+        btn.classList.toggle('active', Number(btn.dataset.days) === days);
+    });
+    
+    document.getElementById('empty-state').classList.add('hidden');
+    document.getElementById('dashboard-content').classList.add('hidden');
+    document.getElementById('trends-content').classList.remove('hidden');
+    document.getElementById('report-title').textContent = 'Threat Trends';
+    document.getElementById('report-subtitle').textContent = 'Attack volume, sources and recurring threats over time.';
+    
+    const to = new Date();
+    const from = new Date(to.getTime() - (days - 1) * 86400000);
+    const params = new URLSearchParams({
+        from: from.toISOString().slice(0, 10),
+        to: to.toISOString().slice(0, 10),
+        granularity: granularity
+    });
+    
+    try {
+        const response = await fetch(`/api/trends?${params}`);
+        if (!response.ok) throw new Error("Trends not available");
+        
+        const data = await response.json();
+        renderTrendChart(data.series || []);
+        renderTrendSources(data.sources || []);
+        renderRecurring(data.recurring || []);
+    } catch (err) {
+        console.error("Failed to load trends", err);
+        document.getElementById('trend-chart').innerHTML = '<p style="color:#ff0844;">Error loading trends.</p>';
+    }
+}
+
+function renderTrendChart(series) {
+    const chart = document.getElementById('trend-chart');
+    chart.innerHTML = '';
+    
+    if (series.length === 0) {
+        chart.innerHTML = '<p class="subtitle">No reports in this window.</p>';
+        return;
+    }
+    
+    const max = Math.max(...series.map(point => point.attacks), 1);
+    series.forEach(point => {
+        const bar = document.createElement('div');
+        bar.className = 'trend-bar';
+        bar.style.height = `${Math.max(4, (point.attacks / max) * 100)}%`;
+        bar.title = `${point.period}: ${point.attacks} attacks`;
+        chart.appendChild(bar);
+    });
+}
+
+function renderTrendSources(sources) {
+    const container = document.getElementById('trend-sources');
+    container.innerHTML = '';
+    
+    const max = Math.max(...sources.map(s => s.attacks), 1);
+    sources.forEach(source => {
+        const row = document.createElement('div');
+        row.className = 'trend-source-row';
+        row.innerHTML = `
+            <span class="trend-source-name">${escapeHtml(source.source)}</span>
+            <div class="trend-source-track"><div class="trend-source-fill" style="width:${(source.attacks / max) * 100}%"></div></div>
+            <span class="trend-source-count">${source.attacks}</span>
+        `;
+        container.appendChild(row);
+    });
+}
+
+function renderRecurring(recurring) {
+    const grid = document.getElementById('trend-recurring');
+    grid.innerHTML = '';
+    
+    if (recurring.length === 0) {
+        grid.innerHTML = '<p class="subtitle">No threat recurred on more than one day in this window.</p>';
+        return;
+    }
+    
+    recurring.forEach(entity => {
+        const card = document.createElement('div');
+        card.className = `attack-card ${entity.current_streak >= 3 ? 'critical' : 'high'}`;
+        card.innerHTML = `
+            <div class="card-header">
+                <span class="rank-badge">${entity.days_in_window} days</span>
+                <span class="card-source">${entity.kind.toUpperCase()}</span>
+            </div>
+            <h3 class="card-title">${escapeHtml(entity.label)}</h3>
+            <p class="card-summary">Streak: ${entity.current_streak} day(s), longest ${entity.longest_streak}.
+               Seen on ${entity.days_seen} days since ${entity.first_seen}, last on ${entity.last_seen}.</p>
+        `;
+        grid.appendChild(card);
+    });
+}
+
 async function loadReport(dateStr, btnElement) {
     // Update active state in sidebar
     document.querySelectorAll('.date-btn').forEach(btn => btn.classList.remove('active'));
@@ -46,8 +217,13 @@ async function loadReport(dateStr, btnElement) {
         btnElement.classList.add('active');
     }
     
+    currentDate = dateStr;
+    const newest = document.querySelector('.date-btn[data-date]');
+    followingLatest = !newest || newest.dataset.date === dateStr;
+    
     // Toggle views
     document.getElementById('empty-state').classList.add('hidden');
+    document.getElementById('trends-content').classList.add('hidden');
     document.getElementById('dashboard-content').classList.remove('hidden');
     
     // Fetch JSON for specific date
@@ -63,9 +239,15 @@ async function loadReport(dateStr, btnElement) {
                           dateObj.toLocaleDateString('en-US', { weekday: 'long', month: 'long', day: 'numeric', year: 'numeric' });
                           
         document.getElementById('report-title').textContent = `Intelligence: ${displayDate}`;
+        document.getElementById('report-subtitle').innerHTML =
+            `<a href="/api/reports/${dateStr}/snapshot" target="_blank">Open static snapshot</a>`;
         
         renderAttacks(data.top_10_attacks || []);
-        renderLessons(data.lessons || []);
+        
+        // Reports built with --lazy-lessons generate each lesson on first request
+        const lazyAttacks = data.lazy_lessons ?
+            (data.top_10_attacks || []).filter(a => a.rank <= data.lazy_lessons) : [];
+        renderLessons(data.lessons || [], dateStr, lazyAttacks);
         
     } catch (err) {
         console.error("Failed to load report", err);
@@ -97,23 +279,23 @@ function renderAttacks(attacks) {
         card.innerHTML = `
             <div class="card-header">
                 <span class="rank-badge">#${attack.rank || '-'}</span>
-                <span class="card-source">${attack.source || 'Unknown'}</span>
+                <span class="card-source">${escapeHtml(attack.source || 'Unknown')}</span>
             </div>
             <h3 class="card-title">
-                ${attack.link ? `<a href="${attack.link}" target="_blank">${attack.title}</a>` : attack.title}
+                ${safeUrl(attack.link) ? `<a href="${escapeHtml(safeUrl(attack.link))}" target="_blank">${escapeHtml(attack.title)}</a>` : escapeHtml(attack.title)}
             </h3>
-            <p class="card-summary">${attack.summary || 'No summary available.'}</p>
+            <p class="card-summary">${escapeHtml(attack.summary || 'No summary available.')}</p>
         `;
         
         grid.appendChild(card);
     });
 }
 
-function renderLessons(lessons) {
+function renderLessons(lessons, dateStr, lazyAttacks = []) {
     const container = document.getElementById('lessons-container');
     container.innerHTML = '';
     
-    if (lessons.length === 0) {
+    if (lessons.length === 0 && lazyAttacks.length === 0) {
          document.querySelector('.lessons-section').classList.add('hidden');
          return;
     } else {
@@ -121,50 +303,94 @@ function renderLessons(lessons) {
     }
     
     lessons.forEach((lesson, index) => {
-        const panel = document.createElement('div');
-        panel.className = 'lesson-panel';
-        
-        panel.style.animation = `fadeIn 0.6s ease forwards ${index * 0.2 + 0.3}s`;
-        panel.style.opacity = '0';
-        
-        // Build Lists safely
-        const objHtml = (lesson.learning_objectives || []).map(li => `<li>${li}</li>`).join('');
-        const mitHtml = (lesson.mitigation_strategies || []).map(li => `<li>${li}</li>`).join('');
-        const qHtml = (lesson.discussion_questions || []).map(li => `<li>${li}</li>`).join('');
+        container.appendChild(buildLessonPanel(lesson, index));
+    });
+    
+    lazyAttacks.forEach((attack, index) => {
+        container.appendChild(buildLazyLessonPanel(attack, dateStr, lessons.length + index));
+    });
+}
+
+function buildLazyLessonPanel(attack, dateStr, index) {
+    const panel = document.createElement('div');
+    panel.className = 'lesson-panel';
+    
+    panel.style.animation = `fadeIn 0.6s ease forwards ${index * 0.2 + 0.3}s`;
+    panel.style.opacity = '0';
+    
+    panel.innerHTML = `
+        <div class="lesson-title-area">
+            <span class="lesson-rank">Deep Dive Focus #${attack.rank || '-'}</span>
+            <h3>${escapeHtml(attack.title || 'Untitled Lesson')}</h3>
+        </div>
+        <button class="date-btn lesson-load-btn"><span>📖</span> Generate teaching lesson</button>
+    `;
+    
+    const btn = panel.querySelector('.lesson-load-btn');
+    btn.onclick = async () => {
+        btn.disabled = true;
+        btn.innerHTML = '<span>⏳</span> Generating lesson...';
+        try {
+            const response = await fetch(`/api/reports/${dateStr}/lessons/${attack.rank}`);
+            if (!response.ok) throw new Error("Lesson not available");
+            
+            const lesson = await response.json();
+            const lessonPanel = buildLessonPanel(lesson, 0);
+            panel.replaceWith(lessonPanel);
+        } catch (err) {
+            console.error("Failed to load lesson", err);
+            btn.disabled = false;
+            btn.innerHTML = '<span>❌</span> Could not generate lesson, try again';
+        }
+    };
+    
+    return panel;
+}
+
+function buildLessonPanel(lesson, index) {
+    const panel = document.createElement('div');
+    panel.className = 'lesson-panel';
+    
+    panel.style.animation = `fadeIn 0.6s ease forwards ${index * 0.2 + 0.3}s`;
+    panel.style.opacity = '0';
+    
+    // Build Lists safely
+    const objHtml = (lesson.learning_objectives || []).map(li => `<li>${escapeHtml(li)}</li>`).join('');
+    const mitHtml = (lesson.mitigation_strategies || []).map(li => `<li>${escapeHtml(li)}</li>`).join('');
+    const qHtml = (lesson.discussion_questions || []).map(li => `<li>${escapeHtml(li)}</li>`).join('');
+    
+    panel.innerHTML = `
+        <div class="lesson-title-area">
+            <span class="lesson-rank">Deep Dive Focus #${lesson.rank || '-'}</span>
+            <h3>${escapeHtml(lesson.title || 'Untitled Lesson')}</h3>
+        </div>
         
-        panel.innerHTML = `
-            <div class="lesson-title-area">
-                <span class="lesson-rank">Deep Dive Focus #${lesson.rank || '-'}</span>
-                <h3>${lesson.title || 'Untitled Lesson'}</h3>
+        <div class="lesson-content">
+            <div class="lesson-left">
+                <div class="lesson-block mb-4">
+                    <h4>Real-World Impact</h4>
+                    <p>${escapeHtml(lesson.real_world_impact || 'No impact analysis provided.')}</p>
+                </div>
+                <div class="lesson-block">
+                    <br>
+                    <h4>Learning Objectives</h4>
+                    <ul>${objHtml}</ul>
+                </div>
             </div>
             
-            <div class="lesson-content">
-                <div class="lesson-left">
-                    <div class="lesson-block mb-4">
-                        <h4>Real-World Impact</h4>
-                        <p>${lesson.real_world_impact || 'No impact analysis provided.'}</p>
-                    </div>
-                    <div class="lesson-block">
-                        <br>
-                        <h4>Learning Objectives</h4>
-                        <ul>${objHtml}</ul>
-                    </div>
+            <div class="lesson-right">
+                <div class="lesson-block mb-4">
+                    <h4>Mitigation Strategies</h4>
+                    <ul>${mitHtml}</ul>
                 </div>
-                
-                <div class="lesson-right">
-                    <div class="lesson-block mb-4">
-                        <h4>Mitigation Strategies</h4>
-                        <ul>${mitHtml}</ul>
-                    </div>
-                    <div class="lesson-block">
-                        <br>
-                        <h4>Classroom Discussion</h4>
-                        <ul>${qHtml}</ul>
-                    </div>
+                <div class="lesson-block">
+                    <br>
+                    <h4>Classroom Discussion</h4>
+                    <ul>${qHtml}</ul>
                 </div>
             </div>
-        `;
-        
-        container.appendChild(panel);
-    });
+        </div>
+    `;
+    
+    return panel;
 }